@@ -87,7 +87,8 @@ setup(
             'wifi-scan = wifi_survey_heatmap.scancli:main',
             'wifi-survey = wifi_survey_heatmap.ui:main',
             'wifi-heatmap = wifi_survey_heatmap.heatmap:main',
-            'wifi-heatmap-thresholds = wifi_survey_heatmap.thresholds:main'
+            'wifi-heatmap-thresholds = wifi_survey_heatmap.thresholds:main',
+            'wifi-heatmap-benchmark = wifi_survey_heatmap.benchmark:main'
         ]
     },
     zip_safe=False
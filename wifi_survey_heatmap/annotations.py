@@ -0,0 +1,224 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import numpy as np
+
+#: size of survey point markers, in points
+MARKER_SIZE = 6
+
+#: distance of labels above their survey point, in floorplan pixels
+LABEL_OFFSET = 30
+
+
+def cull_overlapping(boxes):
+    """
+    Return a mask of the boxes to keep so that no two kept boxes overlap,
+    keeping earlier boxes first. Overlaps are found with a uniform grid of
+    cells as large as the largest box, so each box is only compared with
+    the kept boxes of its own and the 8 neighboring cells.
+
+    :param boxes: array of shape ``(n, 4)`` of (x0, y0, x1, y1) boxes
+    :type boxes: numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    boxes = np.asarray(boxes, dtype=float)
+    keep = np.zeros(len(boxes), dtype=bool)
+    if len(boxes) == 0:
+        return keep
+    size = np.maximum(
+        (boxes[:, 2:] - boxes[:, :2]).max(axis=0), 1e-9
+    )
+    cells = np.floor(boxes[:, :2] / size).astype(int).tolist()
+    grid = {}
+    for idx, (cx, cy) in enumerate(cells):
+        x0, y0, x1, y1 = boxes[idx]
+        hit = False
+        for nx in (cx - 1, cx, cx + 1):
+            for ny in (cy - 1, cy, cy + 1):
+                for other in grid.get((nx, ny), ()):
+                    ox0, oy0, ox1, oy1 = boxes[other]
+                    if x0 < ox1 and ox0 < x1 and y0 < oy1 and oy0 < y1:
+                        hit = True
+                        break
+                if hit:
+                    break
+            if hit:
+                break
+        if not hit:
+            keep[idx] = True
+            grid.setdefault((cx, cy), []).append(idx)
+    return keep
+
+
+class PointAnnotations(object):
+    """
+    Markers and AP labels of the survey points, drawn on every heatmap of a
+    survey (``--show-points``).
+
+    Markers are drawn as one scatter collection colored by the metric, and
+    labels as one collection of text outlines. Labels that would overlap an
+    earlier label of a point where the metric is valid are left out. The
+    label outlines only depend on the survey and the figure layout, so they
+    are computed once and reused for every metric of the survey; the
+    culling is also done once per distinct set of valid points, which most
+    metrics share.
+
+    :param x: x coordinates of the survey points
+    :type x: numpy.ndarray
+    :param y: y coordinates of the survey points
+    :type y: numpy.ndarray
+    :param labels: label of each point, or None for no label
+    :type labels: list
+    :param fontsize: label font size, in points
+    :type fontsize: float
+    """
+
+    def __init__(self, x, y, labels, fontsize):
+        self._x = np.asarray(x, dtype=float)
+        self._y = np.asarray(y, dtype=float)
+        self._labels = labels
+        self._fontsize = fontsize
+        self._layout = None
+        #: cached (paths, offsets, point indices, boxes) of the labels; see
+        #: :py:meth:`~._label_geometry`
+        self._geometry = None
+        #: mask of the kept labels by mask of the points they are culled
+        #: among, for the cached layout
+        self._culled = {}
+
+    def _label_geometry(self, ax):
+        """
+        Return the text outline, position, point index and display
+        bounding box of each label, for the layout of ``ax``.
+        """
+        from matplotlib.textpath import TextPath
+        from matplotlib.transforms import Affine2D
+        # overlaps scale with the figure resolution, so the geometry only
+        # changes with the axes size and limits
+        layout = (
+            tuple(ax.get_position().bounds), ax.get_xlim(), ax.get_ylim(),
+            tuple(ax.figure.get_size_inches())
+        )
+        if self._geometry is not None and self._layout == layout:
+            return self._geometry
+        paths = {}
+        extents = {}
+        for label in set(self._labels):
+            if label is None:
+                continue
+            path = TextPath((0, 0), label, size=self._fontsize)
+            bounds = path.get_extents()
+            # centered horizontally on the point, with the baseline at
+            # LABEL_OFFSET pixels above it, like ax.text() did
+            paths[label] = path.transformed(
+                Affine2D().translate(-(bounds.x0 + bounds.x1) / 2.0, 0)
+            )
+            extents[label] = paths[label].get_extents()
+        idx = np.array(
+            [i for i, label in enumerate(self._labels) if label is not None],
+            dtype=int
+        )
+        offsets = np.column_stack([
+            self._x[idx], self._y[idx] - LABEL_OFFSET
+        ]) if len(idx) > 0 else np.zeros((0, 2))
+        # label boxes in display coordinates at the figure's current dpi
+        scale = ax.figure.dpi / 72.0
+        anchors = ax.transData.transform(offsets) if len(idx) > 0 \
+            else offsets
+        boxes = np.array([
+            [ext.x0, ext.y0, ext.x1, ext.y1] for ext in (
+                extents[self._labels[i]] for i in idx
+            )
+        ]).reshape((-1, 4)) * scale
+        boxes[:, [0, 2]] += anchors[:, :1]
+        boxes[:, [1, 3]] += anchors[:, 1:]
+        self._layout = layout
+        self._geometry = (
+            [paths[self._labels[i]] for i in idx], offsets, idx, boxes
+        )
+        self._culled = {}
+        return self._geometry
+
+    def _kept_labels(self, ax, valid):
+        """
+        Return the mask of the labels of :py:meth:`~._label_geometry` that
+        are drawn for a metric valid at the points of ``valid``: those of
+        valid points that don't overlap an earlier one of them.
+        """
+        _, _, idx, boxes = self._label_geometry(ax)
+        shown = np.asarray(valid, dtype=bool)[idx]
+        key = shown.tobytes()
+        if key not in self._culled:
+            keep = np.zeros(len(idx), dtype=bool)
+            keep[shown] = cull_overlapping(boxes[shown])
+            self._culled[key] = keep
+        return self._culled[key]
+
+    def draw(self, ax, valid, values, cmap, norm):
+        """
+        Draw the markers and labels of the points where a metric is valid.
+
+        :param ax: axes to draw on
+        :type ax: matplotlib.axes.Axes
+        :param valid: mask of the points where the metric was measured
+        :type valid: numpy.ndarray
+        :param values: value of the metric at each point
+        :type values: numpy.ndarray
+        :param cmap: colormap of the marker faces
+        :type cmap: matplotlib.colors.Colormap
+        :param norm: normalization of the values for ``cmap``
+        :type norm: matplotlib.colors.Normalize
+        """
+        from matplotlib.collections import PathCollection
+        from matplotlib.transforms import Affine2D
+        ax.scatter(
+            self._x[valid], self._y[valid], c=np.asarray(values)[valid],
+            cmap=cmap, norm=norm, s=MARKER_SIZE ** 2, marker='o',
+            edgecolors='black', linewidths=1, zorder=200
+        )
+        paths, offsets, _, _ = self._label_geometry(ax)
+        shown = self._kept_labels(ax, valid)
+        if not shown.any():
+            return
+        ax.add_collection(PathCollection(
+            [p for p, s in zip(paths, shown) if s], offsets=offsets[shown],
+            transOffset=ax.transData, facecolors='black',
+            edgecolors='none', zorder=200, clip_on=False,
+            # paths are in points
+            transform=Affine2D().scale(1 / 72.0) +
+            ax.figure.dpi_scale_trans
+        ))
@@ -0,0 +1,471 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import sys
+import os
+import argparse
+import logging
+import json
+import shutil
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from wifi_survey_heatmap.cache import CACHE_DIR_ENV_VAR
+from wifi_survey_heatmap.interpolation import INTERPOLATION_METHODS
+from wifi_survey_heatmap.sidecar import write_sidecar
+from wifi_survey_heatmap.survey import SurveyFile, SurveyMetrics
+from wifi_survey_heatmap.synthetic import (
+    synthetic_floorplan, synthetic_survey, write_floorplan
+)
+
+FORMAT = "[%(asctime)s %(levelname)s] %(message)s"
+logging.basicConfig(level=logging.WARNING, format=FORMAT)
+logger = logging.getLogger()
+
+#: benchmarked stages, in the order they run
+STAGES = [
+    'json_save', 'json_load', 'load_data', 'interpolate', 'plot',
+    'channel_to_signal', 'netlink_parse'
+]
+
+#: surveys with more points than this are interpolated with the ``local``
+#: method when no method is given, as ``wifi-heatmap`` users would
+AUTO_LOCAL_POINTS = 2000
+
+#: differences below these are never reported as regressions, so that
+#: timer and allocator noise on very fast stages does not fail the run
+MIN_WALL_DELTA = 0.01
+MIN_PEAK_DELTA = 1.0
+
+
+def measure(func, repeat=3, memory=True):
+    """
+    Call ``func`` ``repeat`` times and return its (last) result along with
+    its fastest wall time and, with ``memory``, the peak memory allocated
+    while it runs. The peak is measured in one additional call, so that
+    tracing does not slow down the timed calls.
+
+    :return: tuple of (result, dict with ``wall`` in seconds and, with
+      ``memory``, ``peak_mb`` in MiB)
+    :rtype: tuple
+    """
+    wall = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        wall = elapsed if wall is None else min(wall, elapsed)
+    res = {'wall': wall}
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            res['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024.0 ** 2
+        finally:
+            tracemalloc.stop()
+    return result, res
+
+
+def _scan_messages(points):
+    """
+    Build nl80211 ``NEW_SCAN_RESULTS`` messages, as sent by the kernel, for
+    the scan results of the given survey points.
+
+    :raises ImportError: if libnl is not installed
+    """
+    from libnl.attr import nla_put, nla_put_nested, nla_put_u32
+    from libnl.genl.genl import genlmsg_put
+    from libnl.msg import nlmsg_alloc
+    from libnl.nl80211 import nl80211
+    msgs = []
+    for point in points:
+        for bssid, bss in point['result'].get('scan_results', {}).items():
+            attrs = nlmsg_alloc()
+            mac = bytearray(int(b, 16) for b in bssid.split(':'))
+            nla_put(attrs, nl80211.NL80211_BSS_BSSID, len(mac), mac)
+            ssid = bss['ssid'].encode('utf-8')
+            ies = bytearray([0, len(ssid)]) + ssid
+            nla_put(
+                attrs, nl80211.NL80211_BSS_INFORMATION_ELEMENTS, len(ies), ies
+            )
+            nla_put_u32(
+                attrs, nl80211.NL80211_BSS_FREQUENCY,
+                int(bss['frequency'] / 1e6)
+            )
+            nla_put_u32(
+                attrs, nl80211.NL80211_BSS_SIGNAL_MBM,
+                int(bss['signal_mbm'] * 100) & 0xffffffff
+            )
+            msg = nlmsg_alloc()
+            genlmsg_put(
+                msg, 0, 0, 0, 0, 0, nl80211.NL80211_CMD_NEW_SCAN_RESULTS, 0
+            )
+            nla_put_nested(msg, nl80211.NL80211_ATTR_BSS, attrs)
+            msgs.append(msg)
+    return msgs
+
+
+class SurveyBenchmark(object):
+    """
+    Benchmark the stages of generating heatmaps of one synthetic survey (see
+    :py:func:`~.synthetic_survey`), in a temporary directory with its own
+    cache directory.
+    """
+
+    def __init__(self, points, bssids=0, method=None, backend='matplotlib',
+                 repeat=3, memory=True, width=1600, height=1000, seed=0):
+        """
+        :param points: number of survey points
+        :type points: int
+        :param bssids: number of BSSes in the scan results; 0 for no scans,
+          which skips the ``channel_to_signal`` and ``netlink_parse`` stages
+        :type bssids: int
+        :param method: interpolation method; by default ``rbf`` up to
+          :py:data:`~.AUTO_LOCAL_POINTS` points, ``local`` above that
+        :type method: str
+        :param backend: ``wifi-heatmap`` rendering backend
+        :type backend: str
+        :param repeat: number of timed runs of each stage
+        :type repeat: int
+        :param memory: whether to measure the peak memory of each stage
+        :type memory: bool
+        """
+        self.points = points
+        self.bssids = bssids
+        if method is None:
+            method = 'local' if points > AUTO_LOCAL_POINTS else 'rbf'
+        self.method = method
+        self.backend = backend
+        self.repeat = repeat
+        self.memory = memory
+        self.width = width
+        self.height = height
+        self.seed = seed
+
+    @property
+    def name(self):
+        """Name of the benchmark case, identifying it in baselines."""
+        return 'points=%d,bssids=%d,method=%s,backend=%s' % (
+            self.points, self.bssids, self.method, self.backend
+        )
+
+    def run(self):
+        """
+        Run every stage.
+
+        :return: dict of stage name to measurements (see :py:func:`~.measure`)
+        :rtype: collections.OrderedDict
+        """
+        cwd = os.getcwd()
+        old_cache = os.environ.get(CACHE_DIR_ENV_VAR)
+        tmpdir = tempfile.mkdtemp(prefix='wifi-heatmap-benchmark-')
+        try:
+            os.chdir(tmpdir)
+            os.environ[CACHE_DIR_ENV_VAR] = os.path.join(tmpdir, 'cache')
+            return self._run()
+        finally:
+            os.chdir(cwd)
+            if old_cache is None:
+                os.environ.pop(CACHE_DIR_ENV_VAR, None)
+            else:
+                os.environ[CACHE_DIR_ENV_VAR] = old_cache
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def _run(self):
+        from wifi_survey_heatmap.floorplan import FloorplanCache
+        from wifi_survey_heatmap.heatmap import HeatMapGenerator, _pyplot
+        from wifi_survey_heatmap.interpolation import RbfInterpolator
+        res = OrderedDict()
+
+        def stage(name, func):
+            logger.info('Benchmarking %s: %s', self.name, name)
+            result, res[name] = measure(func, self.repeat, self.memory)
+            return result
+
+        write_floorplan(
+            'bench.png', synthetic_floorplan(self.width, self.height)
+        )
+        survey = synthetic_survey(
+            self.points, self.width, self.height, bssids=self.bssids,
+            seed=self.seed, img_path='bench.png'
+        )
+        # measure the steady state: one-time imports (see
+        # :py:mod:`~.heatmap`) and decoding the floorplan into the floorplan
+        # cache are not part of any stage
+        _pyplot()
+        RbfInterpolator([0, 1, 0], [0, 0, 1], [0.0, 1.0, 2.0])([0.5], [0.5])
+        FloorplanCache().get('bench.png')
+
+        def save():
+            with open('bench.json', 'w') as fh:
+                json.dump(survey, fh, indent=2)
+
+        def load():
+            with SurveyFile('bench.json') as points:
+                return SurveyMetrics.from_points(points, points.header)
+
+        stage('json_save', save)
+        write_sidecar('bench.json', stage('json_load', load))
+
+        def load_data():
+            gen = HeatMapGenerator(
+                None, 'bench', False, 'RdYlBu_r', None, method=self.method,
+                backend=self.backend, cache=False
+            )
+            return gen, gen._prepare()
+
+        gen, a = stage('load_data', load_data)
+        num_x, num_y, gx, gy = gen._grid()
+        grids = stage('interpolate', lambda: gen._interpolate(a, gx, gy))
+        stage('plot', lambda: gen._plot(
+            a, 'signal_quality', 'bench', grids['signal_quality'],
+            num_x, num_y
+        ))
+        if self.bssids < 1:
+            return res
+        stage('channel_to_signal', gen._channel_to_signal)
+        try:
+            msgs = _scan_messages(survey['survey_points'])
+            from wifi_survey_heatmap.libnl import Scanner
+        except ImportError:
+            logger.warning('libnl is not installed; skipping netlink_parse')
+            return res
+        # parse without __init__, which lists the wireless interfaces
+        scanner = Scanner.__new__(Scanner)
+
+        def parse():
+            results = {}
+            for msg in msgs:
+                scanner._callback_dump(msg, results)
+            return results
+
+        stage('netlink_parse', parse)
+        return res
+
+
+def run_benchmarks(sizes, bssids=0, **kwargs):
+    """
+    Run a :py:class:`~.SurveyBenchmark` for each survey size.
+
+    :param sizes: numbers of survey points
+    :type sizes: list
+    :return: dict of benchmark case name to dict of stage name to
+      measurements
+    :rtype: collections.OrderedDict
+    """
+    res = OrderedDict()
+    for points in sizes:
+        bench = SurveyBenchmark(points, bssids=bssids, **kwargs)
+        res[bench.name] = bench.run()
+    return res
+
+
+def compare(results, baseline, threshold=0.25):
+    """
+    Compare benchmark results against a baseline (results of an earlier
+    run). A stage regressed if its wall time or peak memory grew by more
+    than ``threshold`` (a fraction of the baseline value), and by more than
+    :py:data:`~.MIN_WALL_DELTA` seconds or :py:data:`~.MIN_PEAK_DELTA` MiB.
+    Cases and stages missing from either side are not compared.
+
+    :return: list of regression descriptions; empty if none regressed
+    :rtype: list
+    """
+    regressions = []
+    for case, stages in results.items():
+        for name, values in stages.items():
+            base = baseline.get(case, {}).get(name)
+            if base is None:
+                continue
+            for key, min_delta in (
+                ('wall', MIN_WALL_DELTA), ('peak_mb', MIN_PEAK_DELTA)
+            ):
+                if key not in values or key not in base:
+                    continue
+                delta = values[key] - base[key]
+                if delta > min_delta and delta > base[key] * threshold:
+                    regressions.append(
+                        '%s %s: %s %.3f > baseline %.3f (%+.0f%%)' % (
+                            case, name, key, values[key], base[key],
+                            100.0 * delta / max(base[key], 1e-9)
+                        )
+                    )
+    return regressions
+
+
+def format_results(results, baseline={}):
+    """
+    Format benchmark results as a table, with the change of each value
+    relative to the baseline (if any).
+
+    :rtype: str
+    """
+    def cell(values, base, key, fmt):
+        if key not in values:
+            return '-'
+        s = fmt % values[key]
+        if base is not None and base.get(key):
+            s += ' (%+.0f%%)' % (100.0 * (values[key] / base[key] - 1))
+        return s
+
+    lines = []
+    for case, stages in results.items():
+        lines.append(case)
+        lines.append('  %-18s %20s %20s' % ('stage', 'wall [s]', 'peak [MiB]'))
+        for name, values in stages.items():
+            base = baseline.get(case, {}).get(name)
+            lines.append('  %-18s %20s %20s' % (
+                name, cell(values, base, 'wall', '%.4f'),
+                cell(values, base, 'peak_mb', '%.1f')
+            ))
+    return '\n'.join(lines)
+
+
+def parse_args(argv):
+    """
+    parse arguments/options
+
+    this uses the new argparse module instead of optparse
+    see: <https://docs.python.org/2/library/argparse.html>
+    """
+    p = argparse.ArgumentParser(
+        description='wifi survey heatmap benchmarks, on synthetic surveys'
+    )
+    p.add_argument('-v', '--verbose', dest='verbose', action='count', default=0,
+                   help='verbose output. specify twice for debug-level output.')
+    p.add_argument('-s', '--sizes', dest='sizes', action='store', type=int,
+                   nargs='+', default=[10, 100, 1000],
+                   help='Numbers of survey points to benchmark '
+                        '(default: 10 100 1000)')
+    p.add_argument('-b', '--bssids', dest='bssids', action='store', type=int,
+                   default=100,
+                   help='Number of BSSes in the scan results of each '
+                        'survey point; 0 for no scan results (default: 100)')
+    p.add_argument('-m', '--method', dest='method', action='store',
+                   choices=INTERPOLATION_METHODS, default=None,
+                   help='Interpolation method (default: rbf up to %d '
+                        'points, local above that)' % AUTO_LOCAL_POINTS)
+    p.add_argument('--backend', dest='backend', action='store',
+                   choices=['matplotlib', 'raster'], default='matplotlib',
+                   help='Rendering backend (default: matplotlib)')
+    p.add_argument('-r', '--repeat', dest='repeat', action='store', type=int,
+                   default=3,
+                   help='Number of timed runs of each stage; the fastest '
+                        'is reported (default: 3)')
+    p.add_argument('--no-memory', dest='memory', action='store_false',
+                   default=True,
+                   help='Do not measure the peak memory of each stage')
+    p.add_argument('-B', '--baseline', dest='baseline', action='store',
+                   default=None,
+                   help='Compare against the results stored in this JSON '
+                        'file, and fail on regressions')
+    p.add_argument('-t', '--threshold', dest='threshold', action='store',
+                   type=float, default=0.25,
+                   help='Relative increase of wall time or peak memory over '
+                        'the baseline considered a regression '
+                        '(default: 0.25)')
+    p.add_argument('-o', '--output', dest='output', action='store',
+                   default=None,
+                   help='Write the results to this JSON file, e.g. to use '
+                        'them as a baseline')
+    args = p.parse_args(argv)
+    if args.threshold < 0:
+        p.error('threshold must not be negative')
+    return args
+
+
+def set_log_info():
+    """set logger level to INFO"""
+    set_log_level_format(logging.INFO,
+                         '%(asctime)s %(levelname)s:%(name)s:%(message)s')
+
+
+def set_log_debug():
+    """set logger level to DEBUG, and debug-level output format"""
+    set_log_level_format(
+        logging.DEBUG,
+        "%(asctime)s [%(levelname)s %(filename)s:%(lineno)s - "
+        "%(name)s.%(funcName)s() ] %(message)s"
+    )
+
+
+def set_log_level_format(level, format):
+    """
+    Set logger level and format.
+
+    :param level: logging level; see the :py:mod:`logging` constants.
+    :type level: int
+    :param format: logging formatter format string
+    :type format: str
+    """
+    formatter = logging.Formatter(fmt=format)
+    logger.handlers[0].setFormatter(formatter)
+    logger.setLevel(level)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    # set logging level
+    if args.verbose > 1:
+        set_log_debug()
+    elif args.verbose == 1:
+        set_log_info()
+
+    baseline = {}
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as fh:
+            baseline = json.load(fh)
+    results = run_benchmarks(
+        args.sizes, bssids=args.bssids, method=args.method,
+        backend=args.backend, repeat=args.repeat, memory=args.memory
+    )
+    print(format_results(results, baseline))
+    if args.output is not None:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    regressions = compare(results, baseline, args.threshold)
+    if len(regressions) > 0:
+        for r in regressions:
+            logger.error('Regression: %s', r)
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+#: environment variable overriding the base cache directory
+CACHE_DIR_ENV_VAR = 'WIFI_HEATMAP_CACHE_DIR'
+
+
+def cache_dir(name):
+    """
+    Return (and create, if needed) the directory of the named cache.
+
+    Caches live under ``$WIFI_HEATMAP_CACHE_DIR`` if set, otherwise under
+    ``$XDG_CACHE_HOME/wifi-survey-heatmap`` (``~/.cache/wifi-survey-heatmap``).
+
+    :param name: cache name, e.g. ``floorplans``
+    :type name: str
+    :rtype: str
+    """
+    base = os.environ.get(CACHE_DIR_ENV_VAR)
+    if base is None:
+        base = os.path.join(
+            os.environ.get(
+                'XDG_CACHE_HOME',
+                os.path.join(os.path.expanduser('~'), '.cache')
+            ),
+            'wifi-survey-heatmap'
+        )
+    path = os.path.join(base, name)
+    if not os.path.exists(path):
+        os.makedirs(path)
+    return path
+
+
+def file_hash(path, blocksize=1 << 20):
+    """
+    Return the hex SHA-256 digest of a file's content.
+
+    :param path: file path
+    :type path: str
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class GridCache(object):
+    """
+    Content-addressed on-disk cache of interpolated grids.
+
+    Each grid is stored as a ``.npy`` file named after a hash of everything
+    it was computed from (see :py:meth:`~.key`), and memory-mapped when read
+    back. Reading a grid marks it as recently used; :py:meth:`~.evict` then
+    removes grids older than ``max_age`` seconds and the least recently used
+    ones until the cache is no larger than ``max_size`` bytes.
+
+    :param path: cache directory; defaults to the ``grids`` cache under
+      :py:func:`~.cache_dir`
+    :type path: str
+    :param max_size: maximum total size of the cache, in bytes
+    :type max_size: int
+    :param max_age: maximum age of unused cache entries, in seconds
+    :type max_age: float
+    """
+
+    def __init__(self, path=None, max_size=1024 ** 3, max_age=30 * 86400):
+        if path is None:
+            path = cache_dir('grids')
+        elif not os.path.exists(path):
+            os.makedirs(path)
+        self._path = path
+        self._max_size = max_size
+        self._max_age = max_age
+
+    @staticmethod
+    def key(*parts):
+        """
+        Return the cache key for a grid computed from ``parts``; arrays are
+        hashed by dtype, shape and content, everything else by its ``repr``.
+
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                part = np.ascontiguousarray(part)
+                digest.update(repr((part.dtype.str, part.shape)).encode())
+                digest.update(part.tobytes())
+            else:
+                digest.update(repr(part).encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _fpath(self, key):
+        return os.path.join(self._path, key + '.npy')
+
+    def get(self, key):
+        """
+        Return the cached grid for ``key`` (memory-mapped), or None.
+
+        :rtype: numpy.ndarray
+        """
+        fpath = self._fpath(key)
+        try:
+            res = np.load(fpath, mmap_mode='r')
+            os.utime(fpath, None)
+        except (IOError, OSError, ValueError):
+            return None
+        logger.debug('Loaded cached grid: %s', fpath)
+        return res
+
+    def put(self, key, grid):
+        """
+        Store ``grid`` under ``key``.
+
+        :type grid: numpy.ndarray
+        """
+        fd, tmpname = tempfile.mkstemp(dir=self._path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                np.save(fh, grid)
+            os.replace(tmpname, self._fpath(key))
+        except Exception:
+            os.unlink(tmpname)
+            raise
+        logger.debug('Cached grid: %s', self._fpath(key))
+
+    def evict(self):
+        """
+        Remove cache entries older than ``max_age`` and, least recently used
+        first, until the total size is at most ``max_size``.
+        """
+        entries = []
+        for fname in os.listdir(self._path):
+            if not fname.endswith('.npy'):
+                continue
+            fpath = os.path.join(self._path, fname)
+            try:
+                st = os.stat(fpath)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, fpath))
+        entries.sort()
+        total = sum(x[1] for x in entries)
+        cutoff = time.time() - self._max_age
+        for mtime, size, fpath in entries:
+            if mtime >= cutoff and total <= self._max_size:
+                break
+            try:
+                os.unlink(fpath)
+            except OSError:
+                continue
+            total -= size
+            logger.debug('Evicted cached grid: %s', fpath)
@@ -0,0 +1,418 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import numpy as np
+
+#: segments of each marching squares case, as pairs of (exit, entry) cell
+#: edges; see :py:func:`~._segment_table`
+_SEGMENTS = None
+
+#: rounding of GeoJSON coordinates, in pixels
+GEOJSON_DECIMALS = 2
+
+
+def _segment_table():
+    """
+    Return the marching squares lookup table: an array of shape (32, 2, 2)
+    of the (up to two) segments of each cell case, as (exit edge, entry
+    edge) pairs, or -1.
+
+    The corners of a cell are numbered clockwise (on the image, with y
+    pointing down) from the top left, and edge ``k`` runs from corner ``k``
+    to corner ``k + 1``. A case is the bit mask of the corners at or above
+    the level, plus 16 if the mean of all four corners is too (which only
+    matters for the two saddle cases). Segments run from an edge leaving
+    the region at or above the level to the edge entering it, so that every
+    contour line keeps that region on the same side.
+    """
+    table = np.full((32, 2, 2), -1, dtype=np.intp)
+    for case in range(16):
+        inside = [bool(case & (1 << k)) for k in range(4)]
+        exits = [k for k in range(4) if inside[k] and not inside[(k + 1) % 4]]
+        entries = [
+            k for k in range(4) if not inside[k] and inside[(k + 1) % 4]
+        ]
+        if len(exits) == 1:
+            table[case, 0] = table[case + 16, 0] = (exits[0], entries[0])
+    # saddles: the center decides which corners are connected
+    table[5] = [(0, 3), (2, 1)]
+    table[5 + 16] = [(0, 1), (2, 3)]
+    table[10] = [(1, 0), (3, 2)]
+    table[10 + 16] = [(3, 0), (1, 2)]
+    return table
+
+
+def contour_levels(z, count):
+    """
+    Return about ``count`` evenly spaced, round contour levels within the
+    range of grid ``z``, as ``matplotlib`` chooses them for ``contour()``
+    with an integer number of levels: the ticks of a
+    :py:class:`matplotlib.ticker.MaxNLocator` over the range, less those
+    at or beyond its ends.
+
+    :param z: grid; NaN values are ignored
+    :type z: numpy.ndarray
+    :param count: number of levels
+    :type count: int
+    :rtype: numpy.ndarray
+    """
+    finite = np.asarray(z)[np.isfinite(z)]
+    if len(finite) == 0 or count < 1:
+        return np.zeros(0)
+    low, high = float(finite.min()), float(finite.max())
+    if low == high:
+        return np.zeros(0)
+    from matplotlib.ticker import MaxNLocator
+    levels = np.asarray(
+        MaxNLocator(count + 1, min_n_ticks=1).tick_values(low, high),
+        dtype=float
+    )
+    return levels[(levels > low) & (levels < high)]
+
+
+def _crossings(z, x, y, level):
+    """
+    Return the points where the level crosses each edge of grid ``z`` (only
+    meaningful for the crossed edges), first the horizontal edges row by
+    row, then the vertical ones. Crossings of edges with a non-finite end
+    are placed on their finite end.
+    """
+    def interpolate(a, b):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = (level - a) / (b - a)
+        t = np.where(np.isfinite(a), t, 1.0)
+        return np.where(np.isfinite(b), t, 0.0)
+
+    t = interpolate(z[:, :-1], z[:, 1:])
+    hx = x[:-1] + t * np.diff(x)
+    hy = np.broadcast_to(y[:, None], t.shape)
+    t = interpolate(z[:-1], z[1:])
+    vx = np.broadcast_to(x, t.shape)
+    vy = y[:-1, None] + t * np.diff(y)[:, None]
+    return np.concatenate([
+        np.column_stack([hx.ravel(), hy.ravel()]),
+        np.column_stack([vx.ravel(), vy.ravel()])
+    ])
+
+
+def _segments(z, level):
+    """
+    Return the contour segments of ``level`` on grid ``z`` as arrays of
+    (from, to) edge indices (see :py:func:`~._crossings`). Cells with a NaN
+    corner have no segments.
+    """
+    global _SEGMENTS
+    if _SEGMENTS is None:
+        _SEGMENTS = _segment_table()
+    ny, nx = z.shape
+    with np.errstate(invalid='ignore'):
+        above = z >= level
+    c0, c1 = above[:-1, :-1], above[:-1, 1:]
+    c2, c3 = above[1:, 1:], above[1:, :-1]
+    case = (
+        c0.astype(np.intp) | (c1 << 1) | (c2 << 2) | (c3 << 3)
+    ).ravel()
+    crossed = (case > 0) & (case < 15)
+    nan = np.isnan(z)
+    if nan.any():
+        crossed &= ~(
+            nan[:-1, :-1] | nan[:-1, 1:] | nan[1:, 1:] | nan[1:, :-1]
+        ).ravel()
+    cells = np.flatnonzero(crossed)
+    case = case[cells]
+    saddle = (case == 5) | (case == 10)
+    if saddle.any():
+        corners = np.stack([
+            z[:-1, :-1].ravel()[cells[saddle]],
+            z[:-1, 1:].ravel()[cells[saddle]],
+            z[1:, 1:].ravel()[cells[saddle]],
+            z[1:, :-1].ravel()[cells[saddle]]
+        ])
+        with np.errstate(invalid='ignore'):
+            case[saddle] += 16 * (corners.mean(axis=0) >= level)
+    # edge indices of the top, right, bottom and left edge of each cell
+    row, col = np.divmod(cells, nx - 1)
+    horizontal = ny * (nx - 1)
+    edges = np.column_stack([
+        row * (nx - 1) + col,
+        horizontal + row * nx + col + 1,
+        (row + 1) * (nx - 1) + col,
+        horizontal + row * nx + col
+    ])
+    segs = _SEGMENTS[case]
+    res = []
+    for slot in range(2):
+        ok = segs[:, slot, 0] >= 0
+        res.append(np.column_stack([
+            edges[ok, segs[ok, slot, 0]], edges[ok, segs[ok, slot, 1]]
+        ]))
+    res = np.concatenate(res)
+    return res[:, 0], res[:, 1]
+
+
+def _stitch(frm, to, points):
+    """
+    Join contour segments into lines; each is an ``(n, 2)`` array, closed
+    lines ending with their first point.
+    """
+    nxt = {}
+    nxt.update(zip(frm.tolist(), to.tolist()))
+    has_prev = set(to.tolist())
+    starts = [e for e in frm.tolist() if e not in has_prev]
+    lines = []
+    for start in starts + frm.tolist():
+        if start not in nxt:
+            continue
+        chain = [start]
+        e = nxt.pop(start)
+        while True:
+            chain.append(e)
+            if e not in nxt:
+                break
+            e = nxt.pop(e)
+        line = points[chain]
+        # crossings at grid points appear twice in a row
+        keep = np.ones(len(line), dtype=bool)
+        keep[1:] = (np.diff(line, axis=0) != 0).any(axis=1)
+        line = line[keep]
+        if len(line) > 1:
+            lines.append(line)
+    return lines
+
+
+def contour_lines(z, x, y, level):
+    """
+    Return the contour lines of ``level`` on grid ``z`` with column
+    coordinates ``x`` and row coordinates ``y``. Lines keep the values at or
+    above the level on their right (on the image, with y pointing down);
+    infinite values count as below or above every level, and NaN values
+    are masked: lines stop at the cells around them.
+
+    :return: list of ``(n, 2)`` arrays of (x, y) points; closed lines end
+      with their first point
+    :rtype: list
+    """
+    z = np.asarray(z, dtype=float)
+    if z.shape[0] < 2 or z.shape[1] < 2:
+        return []
+    frm, to = _segments(z, level)
+    if len(frm) == 0:
+        return []
+    return _stitch(frm, to, _crossings(z, x, y, level))
+
+
+def _signed_area(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * (np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))
+
+
+def _contains(ring, point):
+    """Whether ``point`` is inside closed ring ``ring`` (even-odd rule)."""
+    x0, y0 = ring[:-1, 0], ring[:-1, 1]
+    x1, y1 = ring[1:, 0], ring[1:, 1]
+    px, py = point
+    crosses = (y0 > py) != (y1 > py)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        xs = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+    return bool(np.count_nonzero(crosses & (px < xs)) % 2)
+
+
+def contour_polygons(z, x, y, level):
+    """
+    Return the polygons covering the region of grid ``z`` at or above
+    ``level`` (see :py:func:`~.contour_lines`), clipped to the grid. NaN
+    values count as below every level, so polygons are also clipped to the
+    cells that have values.
+
+    :return: list of polygons, each a list of closed rings: the exterior
+      (counter-clockwise in x, y) followed by any holes (clockwise)
+    :rtype: list
+    """
+    z = np.asarray(z, dtype=float)
+    if z.size == 0:
+        return []
+    # outside the grid counts as below the level, so that every line
+    # closes; padding coordinates repeat those of the border, where the
+    # crossings into the padding are placed
+    padded = np.full((z.shape[0] + 2, z.shape[1] + 2), -np.inf)
+    padded[1:-1, 1:-1] = np.where(np.isnan(z), -np.inf, z)
+    x = np.concatenate([x[:1], x, x[-1:]])
+    y = np.concatenate([y[:1], y, y[-1:]])
+    exteriors = []
+    holes = []
+    for ring in contour_lines(padded, x, y, level):
+        if len(ring) < 4:
+            continue
+        area = _signed_area(ring)
+        # lines keep the region on their right on the image, i.e. on their
+        # left in x, y: exteriors run counter-clockwise, holes clockwise
+        if area > 0:
+            exteriors.append((area, [ring]))
+        elif area < 0:
+            holes.append(ring)
+    exteriors.sort(key=lambda e: e[0])
+    for hole in holes:
+        point = (hole[0] + hole[1]) / 2.0
+        for _, rings in exteriors:
+            if _contains(rings[0], point):
+                rings.append(hole)
+                break
+    return [rings for _, rings in exteriors]
+
+
+class ContourSet(object):
+    """
+    Contour lines and polygons of one interpolated grid, at several levels.
+
+    :param levels: contour levels
+    :type levels: list
+    :param lines: for each level, the list of its contour lines (see
+      :py:func:`~.contour_lines`)
+    :type lines: list
+    :param polygons: for each level, the list of polygons of the region at
+      or above it (see :py:func:`~.contour_polygons`)
+    :type polygons: list
+    """
+
+    def __init__(self, levels, lines, polygons):
+        self.levels = [float(level) for level in levels]
+        self.lines = lines
+        self.polygons = polygons
+
+    @classmethod
+    def compute(cls, z, x, y, levels):
+        """
+        Compute the contours of grid ``z``, whose columns and rows are at
+        coordinates ``x`` and ``y``.
+
+        :rtype: ContourSet
+        """
+        z = np.asarray(z, dtype=float)
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        return cls(
+            levels, [contour_lines(z, x, y, level) for level in levels],
+            [contour_polygons(z, x, y, level) for level in levels]
+        )
+
+    def to_array(self):
+        """
+        Pack the contours into a flat float array, e.g. to store them in the
+        grid cache; see :py:meth:`~.from_array`.
+
+        :rtype: numpy.ndarray
+        """
+        parts = [[len(self.levels)], self.levels]
+
+        def add_rings(rings):
+            parts.append([len(rings)])
+            for ring in rings:
+                parts.append([len(ring)])
+                parts.append(np.asarray(ring, dtype=float).ravel())
+
+        for lines, polygons in zip(self.lines, self.polygons):
+            add_rings(lines)
+            parts.append([len(polygons)])
+            for rings in polygons:
+                add_rings(rings)
+        return np.concatenate([np.asarray(p, dtype=float) for p in parts])
+
+    @classmethod
+    def from_array(cls, data):
+        """
+        Unpack contours packed by :py:meth:`~.to_array`.
+
+        :rtype: ContourSet
+        """
+        data = np.asarray(data, dtype=float)
+        pos = [0]
+
+        def take(count):
+            res = data[pos[0]:pos[0] + count]
+            pos[0] += count
+            return res
+
+        def take_rings():
+            return [
+                np.array(take(2 * int(take(1)[0])).reshape((-1, 2)))
+                for _ in range(int(take(1)[0]))
+            ]
+
+        levels = take(int(take(1)[0])).tolist()
+        lines = []
+        polygons = []
+        for _ in levels:
+            lines.append(take_rings())
+            polygons.append([take_rings() for _ in range(int(take(1)[0]))])
+        return cls(levels, lines, polygons)
+
+    def to_geojson(self, properties={}):
+        """
+        Return the contours as a GeoJSON ``FeatureCollection`` in floorplan
+        pixel coordinates: for each level, a ``MultiLineString`` feature of
+        its contour lines and a ``MultiPolygon`` feature of the region at or
+        above it, with ``level`` and ``kind`` (``line`` or ``area``)
+        properties in addition to ``properties``.
+
+        :param properties: properties of every feature, e.g. the metric
+        :type properties: dict
+        :rtype: dict
+        """
+        def coords(ring):
+            return np.round(ring, GEOJSON_DECIMALS).tolist()
+
+        features = []
+        for level, lines, polygons in zip(
+            self.levels, self.lines, self.polygons
+        ):
+            for kind, geometry in [
+                ('line', {
+                    'type': 'MultiLineString',
+                    'coordinates': [coords(line) for line in lines]
+                }),
+                ('area', {
+                    'type': 'MultiPolygon',
+                    'coordinates': [
+                        [coords(ring) for ring in rings] for rings in polygons
+                    ]
+                })
+            ]:
+                features.append({
+                    'type': 'Feature', 'geometry': geometry,
+                    'properties': dict(properties, level=level, kind=kind)
+                })
+        return {'type': 'FeatureCollection', 'features': features}
@@ -0,0 +1,193 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from wifi_survey_heatmap.cache import cache_dir, file_hash
+from wifi_survey_heatmap.raster import _to_rgba8, halve
+
+logger = logging.getLogger(__name__)
+
+#: version of the on-disk floorplan cache format
+CACHE_VERSION = 1
+
+
+class Floorplan(object):
+    """
+    A decoded floorplan image, as uint8 RGBA arrays at full resolution and at
+    several downscaled levels (each half the size of the previous one).
+
+    :param levels: list of uint8 RGBA arrays, full resolution first
+    :type levels: list
+    :param digest: SHA-256 digest of the image file
+    :type digest: str
+    """
+
+    def __init__(self, levels, digest):
+        self.levels = levels
+        self.digest = digest
+
+    @property
+    def width(self):
+        return self.levels[0].shape[1]
+
+    @property
+    def height(self):
+        return self.levels[0].shape[0]
+
+    def level_for(self, width, height):
+        """
+        Return the smallest level that is at least ``width`` by ``height``
+        pixels, or the full resolution image if it is smaller.
+        """
+        for level in reversed(self.levels):
+            if level.shape[1] >= width and level.shape[0] >= height:
+                return level
+        return self.levels[0]
+
+
+class FloorplanCache(object):
+    """
+    Cache of decoded floorplan images, shared by ``wifi-survey`` and
+    ``wifi-heatmap``.
+
+    Each image is decoded once into uint8 RGBA (a quarter of the size of the
+    float32 arrays returned by ``imread`` for PNGs), together with downscaled
+    levels down to ``min_size`` pixels, and stored as ``.npy`` files keyed by
+    the SHA-256 of the image file. Later runs memory-map those files instead
+    of decoding the image again.
+
+    :param path: cache directory; defaults to the ``floorplans`` cache under
+      :py:func:`~wifi_survey_heatmap.cache.cache_dir`
+    :type path: str
+    :param min_size: stop adding levels once both sides fit in this size
+    :type min_size: int
+    """
+
+    def __init__(self, path=None, min_size=256):
+        self._path = path
+        self._min_size = min_size
+
+    def _cache_path(self):
+        if self._path is None:
+            self._path = cache_dir('floorplans')
+        elif not os.path.exists(self._path):
+            os.makedirs(self._path)
+        return self._path
+
+    def get(self, img_path):
+        """
+        Return the :py:class:`~.Floorplan` for an image file, decoding and
+        caching it if it isn't cached yet.
+
+        :param img_path: path to the floorplan image
+        :type img_path: str
+        :rtype: Floorplan
+        """
+        digest = file_hash(img_path)
+        try:
+            entry = os.path.join(self._cache_path(), digest)
+            floorplan = self._load(entry, digest)
+        except (IOError, OSError, ValueError):
+            logger.warning(
+                'Unable to use floorplan cache', exc_info=True
+            )
+            return Floorplan(self._decode(img_path), digest)
+        if floorplan is not None:
+            logger.debug('Loaded floorplan %s from cache: %s', img_path, entry)
+            return floorplan
+        levels = self._decode(img_path)
+        try:
+            self._store(entry, levels)
+        except (IOError, OSError):
+            logger.warning(
+                'Unable to write floorplan cache: %s', entry, exc_info=True
+            )
+            return Floorplan(levels, digest)
+        return self._load(entry, digest)
+
+    def _decode(self, img_path):
+        from matplotlib.image import imread
+        logger.debug('Decoding floorplan: %s', img_path)
+        levels = [_to_rgba8(imread(img_path))]
+        while max(levels[-1].shape[:2]) > self._min_size:
+            levels.append(halve(levels[-1]))
+        return levels
+
+    def _load(self, entry, digest):
+        fpath = os.path.join(entry, 'meta.json')
+        if not os.path.exists(fpath):
+            return None
+        with open(fpath, 'r') as fh:
+            meta = json.loads(fh.read())
+        if meta.get('version') != CACHE_VERSION:
+            return None
+        levels = [
+            np.load(os.path.join(entry, 'level%d.npy' % idx), mmap_mode='r')
+            for idx in range(meta['levels'])
+        ]
+        return Floorplan(levels, digest)
+
+    def _store(self, entry, levels):
+        tmpdir = tempfile.mkdtemp(dir=self._cache_path())
+        try:
+            for idx, level in enumerate(levels):
+                np.save(os.path.join(tmpdir, 'level%d.npy' % idx), level)
+            with open(os.path.join(tmpdir, 'meta.json'), 'w') as fh:
+                fh.write(json.dumps({
+                    'version': CACHE_VERSION, 'levels': len(levels)
+                }))
+            if os.path.exists(entry):
+                # entry of an older cache version
+                shutil.rmtree(entry, ignore_errors=True)
+            os.rename(tmpdir, entry)
+        except OSError:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            if os.path.exists(os.path.join(entry, 'meta.json')):
+                # another process cached the same image concurrently
+                return
+            raise
+        except Exception:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            raise
+        logger.debug('Cached floorplan as %s', entry)
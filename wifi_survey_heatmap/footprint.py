@@ -0,0 +1,198 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import logging
+
+import numpy as np
+
+from wifi_survey_heatmap.cache import GridCache
+from wifi_survey_heatmap.raster import _to_rgba8
+
+logger = logging.getLogger(__name__)
+
+#: largest difference of any channel from the background color for a pixel
+#: to count as background
+BACKGROUND_TOLERANCE = 16
+
+#: gaps in the outline of the building (e.g. outside doors) up to about this
+#: fraction of the longer side of the floorplan are closed before finding
+#: the outside
+OUTLINE_GAP = 0.04
+
+#: alpha below which a pixel is transparent
+ALPHA_THRESHOLD = 128
+
+
+def _background_color(img):
+    """Return the most common color of uint8 RGBA image ``img``."""
+    packed = np.ascontiguousarray(img).view(np.uint32).ravel()
+    colors, counts = np.unique(packed, return_counts=True)
+    return np.array([colors[np.argmax(counts)]], dtype=np.uint32).view(
+        np.uint8
+    )
+
+
+def _outside(background, gap):
+    """
+    Return the background pixels connected to the border of the image
+    without passing through gaps of up to ``gap`` pixels between the other
+    pixels: the flood fill runs with those thickened by half the gap, then
+    grows back into the background by as much.
+    """
+    from scipy import ndimage
+    steps = int(gap) // 2
+    walls = ~background
+    if steps > 0:
+        walls = ndimage.binary_dilation(walls, iterations=steps)
+    labels, _ = ndimage.label(~walls)
+    border = np.unique(np.concatenate([
+        labels[0], labels[-1], labels[:, 0], labels[:, -1]
+    ]))
+    outside = np.isin(labels, border[border > 0])
+    if steps > 0:
+        outside = ndimage.binary_dilation(
+            outside, iterations=steps
+        ) & background
+    return outside
+
+
+class Footprint(object):
+    """
+    The area of a floorplan covered by the building, as a boolean mask over
+    the floorplan image (possibly at a lower resolution). Heatmaps are only
+    interpolated inside it; see :py:meth:`~.grid`.
+
+    :param mask: boolean array of shape ``(rows, cols)``, True inside
+    :type mask: numpy.ndarray
+    :param width: width of the floorplan the mask spans, in pixels
+    :type width: int
+    :param height: height of the floorplan the mask spans, in pixels
+    :type height: int
+    """
+
+    def __init__(self, mask, width, height):
+        self.mask = np.asarray(mask, dtype=bool)
+        self.width = width
+        self.height = height
+        #: content hash of the mask, for cache keys
+        self.digest = GridCache.key(self.mask, width, height)
+
+    @classmethod
+    def from_floorplan(cls, img, width=None, height=None,
+                       tolerance=BACKGROUND_TOLERANCE, gap=OUTLINE_GAP):
+        """
+        Derive the footprint from a floorplan image. If the image has
+        transparent pixels, the footprint is its opaque part. Otherwise it is
+        everything but the background (pixels of the most common color of
+        the image) reachable from the image border; rooms enclosed by walls
+        are inside, even if they have the background color.
+
+        :param img: floorplan image as read by ``imread``, or a downscaled
+          level of it
+        :type img: numpy.ndarray
+        :param width: width of the full floorplan, if ``img`` is downscaled
+        :type width: int
+        :param height: height of the full floorplan, if ``img`` is downscaled
+        :type height: int
+        :param tolerance: see :py:const:`~.BACKGROUND_TOLERANCE`
+        :type tolerance: int
+        :param gap: see :py:const:`~.OUTLINE_GAP`
+        :type gap: float
+        :rtype: Footprint
+        """
+        img = _to_rgba8(img)
+        width = img.shape[1] if width is None else width
+        height = img.shape[0] if height is None else height
+        alpha = img[..., 3]
+        if (alpha < ALPHA_THRESHOLD).any():
+            logger.debug('Using floorplan transparency as footprint')
+            return cls(alpha >= ALPHA_THRESHOLD, width, height)
+        color = _background_color(img)
+        background = (
+            np.abs(img.astype(np.int16) - color).max(axis=2) <= tolerance
+        )
+        logger.debug('Floorplan background color: %s', color)
+        gap = gap * max(img.shape[:2])
+        return cls(~_outside(background, gap), width, height)
+
+    @classmethod
+    def from_image(cls, path, width, height):
+        """
+        Load the footprint of a ``width`` by ``height`` floorplan from a mask
+        image of the same aspect ratio, whose white (or, if it has
+        transparency, opaque) pixels are inside.
+
+        :param path: path to the mask image
+        :type path: str
+        :rtype: Footprint
+        """
+        from matplotlib.image import imread
+        img = _to_rgba8(imread(path))
+        alpha = img[..., 3]
+        if (alpha < ALPHA_THRESHOLD).any():
+            return cls(alpha >= ALPHA_THRESHOLD, width, height)
+        return cls(img[..., :3].mean(axis=2) >= 128, width, height)
+
+    @property
+    def coverage(self):
+        """Fraction of the floorplan inside the footprint."""
+        return float(self.mask.mean())
+
+    def grid(self, num_x, num_y, extent_x, extent_y):
+        """
+        Return the flat mask of the cells to interpolate of a ``num_x`` by
+        ``num_y`` grid spread over ``[0, extent_x] x [0, extent_y]``
+        floorplan pixels (see
+        :py:meth:`~wifi_survey_heatmap.heatmap.HeatMapGenerator._grid`).
+        Cells are sampled at the mask pixel they fall in, and the cells next
+        to the footprint are kept too, so that the upsampled heatmap reaches
+        its edges.
+
+        :rtype: numpy.ndarray
+        """
+        rows, cols = self.mask.shape
+        x = np.linspace(0, extent_x, num_x) * cols / max(self.width, 1)
+        y = np.linspace(0, extent_y, num_y) * rows / max(self.height, 1)
+        x = np.clip(np.floor(x).astype(int), 0, cols - 1)
+        y = np.clip(np.floor(y).astype(int), 0, rows - 1)
+        inside = self.mask[y[:, None], x[None, :]]
+        padded = np.pad(inside, 1)
+        grown = np.zeros_like(inside)
+        for dy in range(3):
+            for dx in range(3):
+                grown |= padded[dy:dy + num_y, dx:dx + num_x]
+        return grown.ravel()
@@ -0,0 +1,326 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import logging
+
+import numpy as np
+
+from wifi_survey_heatmap.cache import GridCache
+from wifi_survey_heatmap.raster import _to_rgba8
+
+# SciPy is imported where it is used, so that entry points which don't
+# interpolate anything (e.g. ``--help``) start quickly
+
+logger = logging.getLogger(__name__)
+
+#: bump to invalidate cached distance fields when their computation changes
+FIELD_CACHE_VERSION = 1
+
+#: spacing of the distance field nodes, in floorplan pixels
+NODE_SPACING = 8
+
+#: opaque pixels darker than this (0-255) are walls
+WALL_THRESHOLD = 128
+
+#: cost of moving through a wall node, relative to open space; high enough
+#: that distances go around walls through nearby doors, but finite so that
+#: closed rooms are still reachable
+WALL_COST = 50.0
+
+#: kernel length of :py:class:`~.GeodesicInterpolator`, in multiples of
+#: the median distance between neighboring measurements
+LENGTH_SCALE = 5.0
+
+#: number of distance fields solved at once, bounding the memory of the
+#: solver's output
+FIELD_BATCH = 64
+
+
+def wall_mask(img, threshold=WALL_THRESHOLD):
+    """
+    Return the mask of wall pixels of a floorplan: opaque pixels darker than
+    ``threshold``.
+
+    :param img: floorplan image as read by ``imread``
+    :type img: numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    img = _to_rgba8(img)
+    luminance = np.dot(img[..., :3], [0.299, 0.587, 0.114])
+    return (luminance < threshold) & (img[..., 3] >= 128)
+
+
+class GeodesicFields(object):
+    """
+    Geodesic distance fields around the walls of a floorplan.
+
+    The floorplan is covered by nodes every ``spacing`` pixels, each at the
+    center of a ``spacing`` by ``spacing`` block and a wall node if any pixel
+    of its block is a wall. The field of a node holds the length of the
+    shortest path from it to every other node, through the 8-connected node
+    graph, with wall nodes :py:const:`~.WALL_COST` times as costly to cross
+    as open space. Fields of many sources are solved together with SciPy's
+    Dijkstra, and each is cached by floorplan digest and source node, so
+    that re-renders, other metrics and surveys of the same floorplan reuse
+    them.
+
+    :param walls: wall mask of the floorplan (see :py:func:`~.wall_mask`)
+    :type walls: numpy.ndarray
+    :param digest: digest of the floorplan, for cache keys
+    :type digest: str
+    :param spacing: node spacing, in pixels
+    :type spacing: int
+    :param cache: grid cache to keep fields in, if any
+    :type cache: wifi_survey_heatmap.cache.GridCache
+    """
+
+    def __init__(self, walls, digest, spacing=NODE_SPACING, cache=None):
+        rows, cols = walls.shape
+        self._spacing = spacing
+        self._shape = (-(-rows // spacing), -(-cols // spacing))
+        padded = np.zeros(
+            (self._shape[0] * spacing, self._shape[1] * spacing), dtype=bool
+        )
+        padded[:rows, :cols] = walls
+        self.walls = padded.reshape(
+            self._shape[0], spacing, self._shape[1], spacing
+        ).any(axis=(1, 3))
+        self._cache = cache
+        self._key = (
+            FIELD_CACHE_VERSION, 'geodesic', digest, spacing, WALL_COST,
+            self.walls.shape
+        )
+        self._graph = None
+        #: fields by source node, as flat float32 arrays
+        self._fields = {}
+
+    @property
+    def shape(self):
+        """Shape (rows, columns) of the node grid."""
+        return self._shape
+
+    def _build_graph(self):
+        from scipy.sparse import coo_matrix
+        rows, cols = self._shape
+        idx = np.arange(rows * cols).reshape(self._shape)
+        cost = np.where(self.walls, WALL_COST, 1.0)
+        frm, to, weight = [], [], []
+        # right, down and both diagonals down; the graph is undirected
+        for dy, dx in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            a = (slice(0, rows - dy), slice(max(-dx, 0), cols - max(dx, 0)))
+            b = (slice(dy, rows), slice(max(dx, 0), cols - max(-dx, 0)))
+            frm.append(idx[a].ravel())
+            to.append(idx[b].ravel())
+            weight.append((
+                (cost[a] + cost[b]) * 0.5 * np.hypot(dx, dy) * self._spacing
+            ).ravel())
+        return coo_matrix(
+            (np.concatenate(weight),
+             (np.concatenate(frm), np.concatenate(to))),
+            shape=(rows * cols, rows * cols)
+        ).tocsr()
+
+    def nodes(self, x, y):
+        """
+        Return the flat indices of the nodes nearest to points ``(x, y)``,
+        i.e. those whose fields :py:meth:`~.fields` returns.
+
+        :rtype: numpy.ndarray
+        """
+        row = np.clip(
+            (np.asarray(y, dtype=float) // self._spacing).astype(int),
+            0, self._shape[0] - 1
+        )
+        col = np.clip(
+            (np.asarray(x, dtype=float) // self._spacing).astype(int),
+            0, self._shape[1] - 1
+        )
+        return row * self._shape[1] + col
+
+    def _cache_key(self, node):
+        return GridCache.key(*(self._key + (int(node),)))
+
+    def _solve(self, nodes):
+        """Compute and cache the fields of the given source nodes."""
+        from scipy.sparse.csgraph import dijkstra
+        if self._graph is None:
+            self._graph = self._build_graph()
+        logger.debug('Computing %d geodesic distance fields', len(nodes))
+        for start in range(0, len(nodes), FIELD_BATCH):
+            batch = nodes[start:start + FIELD_BATCH]
+            dist = dijkstra(self._graph, directed=False, indices=batch)
+            for node, field in zip(batch, dist.astype(np.float32)):
+                self._fields[node] = field
+                if self._cache is None:
+                    continue
+                try:
+                    self._cache.put(self._cache_key(node), field)
+                except (IOError, OSError):
+                    logger.warning(
+                        'Unable to write grid cache', exc_info=True
+                    )
+
+    def fields(self, x, y):
+        """
+        Return the distance fields of the nodes nearest to points
+        ``(x, y)`` (see :py:meth:`~.nodes`), computing only those neither in
+        memory nor cached.
+
+        :return: float32 array of shape ``(rows * columns, len(x))``: one
+          column per point, one row per node
+        :rtype: numpy.ndarray
+        """
+        nodes = self.nodes(x, y).tolist()
+        missing = []
+        for node in sorted(set(nodes)):
+            if node in self._fields:
+                continue
+            field = None
+            if self._cache is not None:
+                field = self._cache.get(self._cache_key(node))
+            if field is not None and field.shape == (self.walls.size,):
+                self._fields[node] = field
+            else:
+                missing.append(node)
+        if len(missing) > 0:
+            self._solve(missing)
+        return np.stack([self._fields[node] for node in nodes], axis=1)
+
+    def distances(self, fields, x, y):
+        """
+        Return the distances from points ``(x, y)`` to the sources of
+        ``fields`` (as returned by :py:meth:`~.fields`): the shortest
+        distance through one of the four nodes around each point, so that
+        points next to a wall are not given the distances of the wall's
+        nodes.
+
+        :return: float32 array of shape ``(len(x), fields.shape[1])``
+        :rtype: numpy.ndarray
+        """
+        rows, cols = self._shape
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        # node centers are half a spacing into their blocks
+        c0 = np.clip(
+            np.floor(x / self._spacing - 0.5).astype(int), 0,
+            max(cols - 2, 0)
+        )
+        r0 = np.clip(
+            np.floor(y / self._spacing - 0.5).astype(int), 0,
+            max(rows - 2, 0)
+        )
+        res = None
+        for r in (r0, np.minimum(r0 + 1, rows - 1)):
+            for c in (c0, np.minimum(c0 + 1, cols - 1)):
+                offset = np.hypot(
+                    x - (c + 0.5) * self._spacing,
+                    y - (r + 0.5) * self._spacing
+                ).astype(np.float32)
+                dist = fields[r * cols + c] + offset[:, None]
+                res = dist if res is None else np.minimum(res, dist)
+        return res
+
+
+class GeodesicInterpolator(object):
+    """
+    Interpolates measurements over geodesic distances around the walls of
+    a floorplan instead of straight-line distances, so that they don't
+    "leak" through walls.
+
+    This is a radial basis function interpolation with an exponential
+    kernel ``exp(-d / length)`` around the mean of the values, where
+    ``length`` is :py:const:`~.LENGTH_SCALE` times the median geodesic
+    distance between neighboring measurements. Unlike the linear kernel of
+    :py:class:`~wifi_survey_heatmap.interpolation.RbfInterpolator`, this
+    kernel stays well-conditioned with the non-Euclidean distances around
+    walls. As with the other interpolators, the kernel is factored once for
+    all columns of ``values``.
+
+    :param x: X coordinates of the measurements
+    :type x: list
+    :param y: Y coordinates of the measurements
+    :type y: list
+    :param values: measured values, either of shape ``(N,)`` or ``(N, K)``
+    :type values: numpy.ndarray
+    :param fields: distance fields of the floorplan
+    :type fields: GeodesicFields
+    :param chunk_size: maximum number of query points evaluated at once
+    :type chunk_size: int
+    """
+
+    def __init__(self, x, y, values, fields, chunk_size=4096):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if len(x) != len(values) or len(y) != len(values):
+            raise ValueError('x, y and values must have the same length')
+        self._chunk_size = chunk_size
+        self._fields = fields
+        self._field = fields.fields(x, y)
+        # computed like the distances of queries, so that the measurements
+        # are reproduced exactly
+        dist = fields.distances(self._field, x, y)
+        spacing = 1.0
+        if len(x) > 1:
+            others = dist + np.diag(np.full(len(x), np.inf))
+            spacing = max(np.median(others.min(axis=1)), 1.0)
+        self._length = LENGTH_SCALE * spacing
+        self._mean = values.mean(axis=0)
+        kernel = np.exp(-dist / self._length).astype(float)
+        try:
+            self._weights = np.linalg.solve(kernel, values - self._mean)
+        except np.linalg.LinAlgError:
+            # e.g. the same location measured twice
+            logger.debug('Singular geodesic kernel; using least squares')
+            self._weights = np.linalg.lstsq(
+                kernel, values - self._mean, rcond=None
+            )[0]
+
+    def __call__(self, gx, gy):
+        gx = np.asarray(gx, dtype=float)
+        qx = gx.ravel()
+        qy = np.asarray(gy, dtype=float).ravel()
+        res = np.empty((len(qx),) + self._weights.shape[1:], dtype=float)
+        for start in range(0, len(qx), self._chunk_size):
+            end = start + self._chunk_size
+            dist = self._fields.distances(
+                self._field, qx[start:end], qy[start:end]
+            )
+            res[start:end] = np.dot(
+                np.exp(-dist / self._length).astype(float), self._weights
+            ) + self._mean
+        return res.reshape(gx.shape + self._weights.shape[1:])
@@ -37,28 +37,71 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 
 import sys
 import argparse
+import glob
 import logging
 import json
+import multiprocessing
 import numpy
+import os
+import time
 
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 import numpy as np
-import matplotlib.cm as cm
-import matplotlib.pyplot as pp
-from mpl_toolkits.axes_grid1 import make_axes_locatable
-from scipy.interpolate import Rbf
-from pylab import imread, imshow
-from matplotlib.offsetbox import AnchoredText
-from matplotlib.patheffects import withStroke
-from matplotlib.font_manager import FontManager
-from matplotlib.colors import ListedColormap
-import matplotlib
+
+from wifi_survey_heatmap.interpolation import (
+    INTERPOLATION_METHODS, LocalKrigingInterpolator, LocalRbfInterpolator,
+    RbfInterpolator, StackedInterpolator, compare_with_exact
+)
+from wifi_survey_heatmap.raster import RasterRenderer, upsample
+from wifi_survey_heatmap.tiles import TilePyramidRenderer
+from wifi_survey_heatmap.floorplan import FloorplanCache
+from wifi_survey_heatmap.footprint import Footprint
+from wifi_survey_heatmap.geodesic import (
+    GeodesicFields, GeodesicInterpolator, wall_mask
+)
+from wifi_survey_heatmap.annotations import PointAnnotations
+from wifi_survey_heatmap.cache import GridCache
+from wifi_survey_heatmap.contours import ContourSet, contour_levels
+from wifi_survey_heatmap.sidecar import load_metrics
+from wifi_survey_heatmap.profiling import NULL_PROFILER, Profiler
 
 
 FORMAT = "[%(asctime)s %(levelname)s] %(message)s"
 logging.basicConfig(level=logging.WARNING, format=FORMAT)
 logger = logging.getLogger()
 
+#: bump to invalidate cached grids when interpolation results change
+GRID_CACHE_VERSION = 1
+
+#: bump to invalidate cached contours when contour extraction changes
+CONTOUR_CACHE_VERSION = 2
+
+#: bump to invalidate cached footprints when their derivation changes
+FOOTPRINT_CACHE_VERSION = 1
+
+#: number of contour levels exported by ``--geojson`` without ``-n``
+DEFAULT_GEOJSON_CONTOURS = 10
+
+#: signal (dBm) assumed for a BSS at survey points where it wasn't heard
+BSS_SIGNAL_FLOOR = -100.0
+
+#: suffix of the uncertainty maps of the "kriging" method, e.g.
+#: ``signal_quality_uncertainty``
+UNCERTAINTY_SUFFIX = '_uncertainty'
+
+
+def _pyplot():
+    """
+    Import and return :py:mod:`matplotlib.pyplot` with the non-interactive
+    Agg backend, as heatmaps are only ever written to files; this also works
+    without a display. Matplotlib is imported on first use rather than with
+    this module, so that e.g. ``wifi-heatmap --help`` starts quickly.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as pp
+    return pp
+
 
 WIFI_CHANNELS = {
     # center frequency to (channel, bandwidth MHz)
@@ -144,16 +187,76 @@ class HeatMapGenerator(object):
         'channel_bitrate': 'Maximum channel bandwidth [MBit/s]',
     }
 
+    #: maps computed from the per-BSS signal grids (see ``bss_maps``), rather
+    #: than interpolated from the survey points themselves
+    BSS_SUMMARY_GRAPHS = {
+        'best_server': 'Best server',
+        'ap_overlap': 'APs above {threshold:g} dBm',
+    }
+
+    #: grid divisors of the preview stages of progressive rendering; the
+    #: final stage always uses the full grid (one column per 4 pixels)
+    PROGRESSIVE_STAGES = [32, 16, 8]
+
     def __init__(
         self, image_path, title, showpoints, cname, contours, ignore_ssids=[], aps=None,
-        thresholds=None
+        thresholds=None, method='rbf', neighbors=32, check_accuracy=False,
+        jobs=1, backend='matplotlib', compression=6, encoder_thread=False,
+        output_format='png', tile_size=256, progressive=False,
+        refine_tolerance=0.0, cache=True, cache_max_size=1024 ** 3,
+        cache_max_age=30 * 86400, bss_maps=False, overlap_threshold=-67.0,
+        profile=False, geojson=False, footprint=None
     ):
+        # records the time and memory of each stage (see --profile)
+        self._profiler = Profiler() if profile else NULL_PROFILER
+        # kept so that worker processes can build an identical generator
+        self._init_args = (image_path, title, showpoints, cname, contours)
+        self._init_kwargs = dict(
+            ignore_ssids=ignore_ssids, aps=aps, thresholds=thresholds,
+            method=method, neighbors=neighbors, check_accuracy=check_accuracy,
+            backend=backend, compression=compression,
+            encoder_thread=encoder_thread, output_format=output_format,
+            tile_size=tile_size, progressive=progressive,
+            refine_tolerance=refine_tolerance, cache=cache,
+            cache_max_size=cache_max_size, cache_max_age=cache_max_age,
+            bss_maps=bss_maps, overlap_threshold=overlap_threshold,
+            profile=profile, geojson=geojson, footprint=footprint
+        )
+        self._progressive = progressive
+        self._refine_tolerance = refine_tolerance
+        self._bss_maps = bss_maps
+        self._overlap_threshold = overlap_threshold
+        # per-BSS signal metrics; set up by _add_bss_metrics()
+        self._bss_keys = []
+        self._bss_labels = []
+        # per-instance copy, as per-BSS graphs are added to it
+        self.graphs = dict(self.graphs)
+        self._preview = None
+        # 'auto', path of a mask image or boolean mask array; the footprint
+        # and its mask of each grid size are built when first needed
+        self._footprint_source = footprint
+        self._footprint = None
+        self._grid_masks = {}
+        # distance fields of the "geodesic" method; built when first needed
+        self._geodesic = None
+        # survey point markers and labels; built by the first plot
+        self._annotations = None
+        self._grid_cache = None
+        if cache:
+            try:
+                self._grid_cache = GridCache(
+                    max_size=cache_max_size, max_age=cache_max_age
+                )
+            except (IOError, OSError):
+                logger.warning('Unable to use grid cache', exc_info=True)
+        self._jobs = jobs
         self._ap_names = {}
         if aps is not None:
             with open(aps, 'r') as fh:
                 self._ap_names = {
                     x.upper(): y for x, y in json.loads(fh.read()).items()
                 }
+        self._floorplan = None
         self._layout = None
         self._image_width = 0
         self._image_height = 0
@@ -162,6 +265,23 @@ class HeatMapGenerator(object):
         self._showpoints = showpoints
         self._cmap = self.get_cmap(cname)
         self._contours = contours
+        self._geojson = geojson
+        self._method = method
+        self._neighbors = neighbors
+        self._check_accuracy = check_accuracy
+        self._backend = backend
+        self._raster = None
+        if backend == 'raster':
+            self._raster = RasterRenderer(
+                self._cmap, compression=compression,
+                encoder_thread=encoder_thread
+            )
+        self._output_format = output_format
+        self._tiles = None
+        if output_format == 'tiles':
+            self._tiles = TilePyramidRenderer(
+                self._cmap, tile_size=tile_size, compression=compression
+            )
         if not self._title.endswith('.json'):
             self._title += '.json'
         self._ignore_ssids = ignore_ssids
@@ -169,20 +289,21 @@ class HeatMapGenerator(object):
             'Initialized HeatMapGenerator; title=%s',
             self._title
         )
-        with open(self._title, 'r') as fh:
-            self._data = json.loads(fh.read())
-        if 'survey_points' not in self._data:
+        try:
+            with self._profiler.stage('load_survey'):
+                self._metrics = load_metrics(self._title)
+        except ValueError:
             logger.error('No survey points found in {}'.format(self._title))
             exit()
-        logger.info('Loaded %d survey points',
-                    len(self._data['survey_points']))
+        logger.info('Loaded %d survey points', len(self._metrics))
 
         # Try to load image from JSON if not overwritten
+        self._image_path = image_path
         if image_path is None:
-            if 'img_path' not in self._data:
+            if 'img_path' not in self._metrics.header:
                 logger.error('No image path found in {}'.format(self._title))
                 exit(1)
-            self._image_path = self._data['img_path']
+            self._image_path = self._metrics.header['img_path']
 
         self.thresholds = {}
         if thresholds is not None:
@@ -191,97 +312,445 @@ class HeatMapGenerator(object):
                 self.thresholds = json.loads(fh.read())
             logger.debug('Thresholds: %s', self.thresholds)
 
+    @property
+    def image_path(self):
+        """Path to the floorplan image of the survey."""
+        return self._image_path
+
+    @property
+    def profiler(self):
+        """
+        The :py:class:`~.Profiler` of this generator, or a
+        :py:class:`~.NullProfiler` if it was built without ``profile``.
+        """
+        return self._profiler
+
     def get_cmap(self, cname):
+        """
+        Return the colormap ``cname``, or for ``NAME//STEPS`` colormap
+        ``NAME`` with black bands at ``STEPS`` evenly spaced values.
+
+        :raises ValueError: if the colormap or number of steps is invalid
+        """
+        from matplotlib.colors import ListedColormap
+        pp = _pyplot()
         multi_string = cname.split('//')
         if len(multi_string) == 2:
             cname = multi_string[0]
             steps = int(multi_string[1])
             N = 256
-            colormap = cm.get_cmap(cname, N)
+            if not 0 < steps <= N:
+                raise ValueError(
+                    'Number of colormap steps must be between 1 and %d' % N
+                )
+            colormap = pp.get_cmap(cname, N)
             newcolors = colormap(np.linspace(0, 1, N))
             rgba = np.array([0, 0, 0, 1])
-            interval = int(N/steps) if steps > 0 else 0
+            interval = int(N/steps)
             for i in range(0,N,interval):
                 newcolors[i] = rgba
-            print(newcolors)
             return ListedColormap(newcolors)
         else:
             return pp.get_cmap(cname)
 
     def load_data(self):
-        a = defaultdict(list)
-        for row in self._data['survey_points']:
-            a['x'].append(row['x'])
-            a['y'].append(row['y'])
-            a['channel'].append(row['result']['channel'])
-            if 'tcp' in row['result']:
-                a['tcp_upload_Mbps'].append(
-                    row['result']['tcp']['received_Mbps']
-                )
-            if 'tcp-reverse' in row['result']:
-                a['tcp_download_Mbps'].append(
-                    row['result']['tcp-reverse']['received_Mbps']
-                )
-            if 'udp' in row['result']:
-                a['udp_download_Mbps'].append(row['result']['udp']['Mbps'])
-                a['jitter_download'].append(row['result']['udp']['jitter_ms'])
-            if 'udp-reverse' in row['result']:
-                a['udp_upload_Mbps'].append(
-                    row['result']['udp-reverse']['Mbps'])
-                a['jitter_upload'].append(
-                    row['result']['udp-reverse']['jitter_ms'])
-            a['tx_power'].append(row['result']['tx_power'])
-            a['frequency'].append(row['result']['frequency']*1e-3)
-            if 'bitrate' in row['result']:
-                a['channel_bitrate'].append(row['result']['bitrate'])
-            a['signal_quality'].append(row['result']['signal_mbm']+130)
-            ap = self._ap_names.get(
-                row['result']['ssid'].upper(),
-                row['result']['ssid']
-            )
-            a['ap'].append(ap + ' ({0:.1f} GHz)'.format(1e-3*int(row['result']['frequency'])))
-        return a
+        """
+        Load the survey points into columnar arrays.
+
+        :rtype: wifi_survey_heatmap.survey.SurveyData
+        """
+        return self._metrics.survey(self._ap_names)
 
-    def _load_image(self):
-        self._layout = imread(self._image_path)
+    def _load_image(self, floorplan=None):
+        if floorplan is None:
+            with self._profiler.stage('load_floorplan'):
+                floorplan = FloorplanCache().get(self._image_path)
+        self._floorplan = floorplan
+        self._layout = self._floorplan.levels[0]
         self._image_width = len(self._layout[0])
         self._image_height = len(self._layout) - 1
         self._corners = [
             (0, 0), (0, self._image_height),
             (self._image_width, 0), (self._image_width, self._image_height)
         ]
+        if self._method == 'kriging':
+            # kriging falls back to the mean away from the measurements, and
+            # its uncertainty must not count the corners as measured
+            self._corners = []
         logger.debug(
             'Loaded image with width=%d height=%d',
             self._image_width, self._image_height
         )
 
-    def generate(self):
-        self._load_image()
-        a = self.load_data()
-        for x, y in self._corners:
-            a['x'].append(x)
-            a['y'].append(y)
-            for k in a.keys():
-                if k in ['x', 'y', 'ap']:
-                    continue
-                a['ap'].append(None)
-                a[k] = [0 if x is None else x for x in a[k]]
-                a[k].append(min(a[k]))
-        self._channel_graphs()
-        num_x = int(self._image_width / 4)
-        num_y = int(num_x / (self._image_width / self._image_height))
+    def _prepare(self, floorplan=None):
+        """
+        Load the floorplan and survey data. The image corners are added to
+        each metric when it is interpolated (see
+        :py:meth:`~.SurveyData.metric`), so that the interpolation covers the
+        whole floorplan.
+
+        :param floorplan: already decoded floorplan of :py:attr:`~.image_path`
+          to use instead of getting it from the floorplan cache
+        :type floorplan: wifi_survey_heatmap.floorplan.Floorplan
+        :return: survey data, as returned by :py:meth:`~.load_data`
+        :rtype: wifi_survey_heatmap.survey.SurveyData
+        """
+        self._load_image(floorplan)
+        with self._profiler.stage('survey_data'):
+            a = self.load_data()
+            if self._bss_maps:
+                self._add_bss_metrics(a)
+        if self._method == 'kriging':
+            self._add_uncertainty_graphs()
+        return a
+
+    def _add_uncertainty_graphs(self):
+        """
+        Add the uncertainty map of every interpolated metric to
+        :py:attr:`~.graphs`, right after the metric itself, as
+        ``<metric>_uncertainty``.
+        """
+        graphs = {}
+        for key, title in self.graphs.items():
+            graphs[key] = title
+            if (
+                key in self.BSS_SUMMARY_GRAPHS or
+                self._measured_key(key) != key
+            ):
+                continue
+            graphs[key + UNCERTAINTY_SUFFIX] = 'Uncertainty of %s' % title
+        self.graphs = graphs
+
+    def _measured_key(self, key):
+        """
+        Return the name of the measured metric that ``key`` is mapped from:
+        ``key`` itself, or the metric of an uncertainty map.
+        """
+        if key.endswith(UNCERTAINTY_SUFFIX):
+            return key[:-len(UNCERTAINTY_SUFFIX)]
+        return key
+
+    def _add_bss_metrics(self, a):
+        """
+        Add the signal of each BSSID seen in the scan results to ``a`` (and
+        its heatmap to :py:attr:`~.graphs`) as a ``bss_<bssid>`` metric,
+        assuming :py:const:`~.BSS_SIGNAL_FLOOR` at the scanned points where
+        it wasn't heard. All of them are valid at the same points, so they
+        are interpolated together in one batched pass. Also add the
+        :py:attr:`~.BSS_SUMMARY_GRAPHS` metrics at each point.
+        """
+        metrics = self._metrics
+        columns = {}
+        ssids = {}
+        for col, (bssid, ssid, _) in enumerate(metrics.scan_columns):
+            if ssid in self._ignore_ssids:
+                continue
+            columns.setdefault(bssid, []).append(col)
+            ssids.setdefault(bssid, ssid)
+        if len(columns) == 0 or not metrics.scanned.any():
+            logger.warning('No scan results found; not plotting BSS maps')
+            return
+        # one column per BSSID, even if it was seen with several SSIDs or
+        # on several channels
+        signal = np.column_stack([
+            np.fmax.reduce(metrics.scan_signal[:, cols], axis=1)
+            for cols in columns.values()
+        ])
+        signal[np.isnan(signal)] = BSS_SIGNAL_FLOOR
+        signal[~np.asarray(metrics.scanned)] = np.nan
+        for idx, bssid in enumerate(columns):
+            key = 'bss_' + bssid.replace(':', '').lower()
+            label = '%s (%s)' % (
+                self._ap_names.get(bssid.upper(), ssids[bssid]), bssid
+            )
+            a.add_metric(key, signal[:, idx])
+            self.graphs[key] = 'Signal of %s [dBm]' % label
+            self._bss_keys.append(key)
+            self._bss_labels.append(label)
+        best, overlap = self._bss_summary(signal)
+        a.add_metric('best_server', best)
+        a.add_metric('ap_overlap', overlap)
+        for key, title in self.BSS_SUMMARY_GRAPHS.items():
+            self.graphs[key] = title.format(threshold=self._overlap_threshold)
+        logger.info('Plotting signal maps of %d BSSIDs', len(columns))
+
+    def _bss_summary(self, signal):
+        """
+        Return the best server (index of the strongest BSS) and the number
+        of BSSes above the overlap threshold for each row of the given
+        ``(points or cells, BSSes)`` signal matrix, as float arrays with NaN
+        for rows without signals.
+        """
+        missing = np.isnan(signal).all(axis=1)
+        best = np.argmax(np.nan_to_num(signal, nan=-np.inf), axis=1)
+        best = np.where(missing, np.nan, best)
+        overlap = (signal > self._overlap_threshold).sum(axis=1)
+        overlap = np.where(missing, np.nan, overlap)
+        return best, overlap
+
+    def _grid(self, divisor=4):
+        """
+        Return the interpolation grid with one column per ``divisor`` pixels
+        of floorplan width, as a tuple of (num_x, num_y, gx, gy) where gx and
+        gy are the flattened grid coordinates.
+        """
+        num_x = max(int(self._image_width / divisor), 2)
+        num_y = max(int(num_x / (self._image_width / self._image_height)), 2)
         x = np.linspace(0, self._image_width, num_x)
         y = np.linspace(0, self._image_height, num_y)
         gx, gy = np.meshgrid(x, y)
-        gx, gy = gx.flatten(), gy.flatten()
-        for k, ptitle in self.graphs.items():
+        return num_x, num_y, gx.flatten(), gy.flatten()
+
+    def _load_footprint(self):
+        """
+        Build the :py:class:`~.Footprint` of the floorplan from the
+        ``footprint`` option: derived from the floorplan itself for
+        ``'auto'`` (see :py:meth:`~._derive_footprint`), loaded from a mask
+        image for a path, or taken as is for a boolean mask array.
+        """
+        source = self._footprint_source
+        height, width = self._layout.shape[:2]
+        if isinstance(source, np.ndarray):
+            footprint = Footprint(source, width, height)
+        elif source == 'auto':
+            footprint = self._derive_footprint(width, height)
+        else:
+            footprint = Footprint.from_image(source, width, height)
+        logger.info(
+            'Building footprint covers %.0f%% of the floorplan',
+            100 * footprint.coverage
+        )
+        return footprint
+
+    def _derive_footprint(self, width, height):
+        """
+        Derive the :py:class:`~.Footprint` of the floorplan from the
+        smallest floorplan level at least as large as the interpolation grid,
+        caching its mask in the grid cache by floorplan digest.
+        """
+        img = self._floorplan.level_for(width // 4, height // 4)
+        key = None
+        if self._grid_cache is not None:
+            key = GridCache.key(
+                FOOTPRINT_CACHE_VERSION, 'footprint', self._floorplan.digest,
+                img.shape
+            )
+            mask = self._grid_cache.get(key)
+            if mask is not None:
+                return Footprint(mask, width, height)
+        footprint = Footprint.from_floorplan(img, width, height)
+        if key is not None:
             try:
-                self._plot(
-                    a, k, '%s - %s' % (self._title, ptitle), gx, gy, num_x, num_y
-                )
+                self._grid_cache.put(key, footprint.mask)
+            except (IOError, OSError):
+                logger.warning('Unable to write grid cache', exc_info=True)
+        return footprint
+
+    def _grid_mask(self, num_x, num_y):
+        """
+        Return the flat mask of the cells of the ``num_x`` by ``num_y`` grid
+        (see :py:meth:`~._grid`) inside the building footprint, or None if
+        every cell is interpolated.
+        """
+        if self._footprint_source is None:
+            return None
+        if self._footprint is None:
+            with self._profiler.stage('footprint'):
+                self._footprint = self._load_footprint()
+        if (num_x, num_y) not in self._grid_masks:
+            self._grid_masks[(num_x, num_y)] = self._footprint.grid(
+                num_x, num_y, self._image_width, self._image_height
+            )
+        return self._grid_masks[(num_x, num_y)]
+
+    def generate(self):
+        """
+        Generate the channel graphs and every heatmap of the survey.
+
+        :return: tuple of (number of heatmaps written, list of the names of
+          those that could not be created)
+        :rtype: tuple
+        """
+        a = self._prepare()
+        if self._jobs < 2:
+            with self._profiler.stage('channel_graphs'):
+                self._channel_graphs()
+        tasks = self._render_tasks(a)
+        if self._jobs > 1:
+            return self._generate_parallel(tasks)
+        plots = 0
+        failed = []
+        for task in tasks:
+            try:
+                with self._profiler.stage('plot', task[0]):
+                    plots += self._plot(a, *task)
             except:
                 logger.warning('Cannot create {} plot: '
-                               'insufficient data'.format(k))
+                               'insufficient data'.format(task[0]))
+                failed.append(task[0])
+        return plots, failed
+
+    def _render_tasks(self, a):
+        """
+        Interpolate the grids of every metric in ``a`` (or get them from the
+        grid cache), extract their contours if needed, and return the list of
+        :py:meth:`~._plot` tasks, i.e. tuples of (metric name, plot title,
+        grid, num_x, num_y, :py:class:`~.ContourSet` or None).
+        """
+        num_x, num_y, gx, gy = self._grid()
+        inside = self._grid_mask(num_x, num_y)
+        keys = [
+            k for k in self._metric_keys(a)
+            if k not in self.BSS_SUMMARY_GRAPHS
+        ]
+        grid_keys = keys
+        if self._method == 'kriging':
+            grid_keys = keys + [k + UNCERTAINTY_SUFFIX for k in keys]
+        with self._profiler.stage('grid_cache'):
+            grids = self._cached_grids(a, grid_keys, num_x, num_y)
+        # the uncertainty of a metric is only computed along with its values
+        missing = [
+            k for k in keys
+            if k not in grids or (
+                self._method == 'kriging' and
+                k + UNCERTAINTY_SUFFIX not in grids
+            )
+        ]
+        computed = {}
+        if len(missing) > 0:
+            with self._profiler.stage('interpolate'):
+                if self._progressive:
+                    num_x, num_y, computed = self._interpolate_progressive(
+                        a, missing
+                    )
+                else:
+                    computed = self._interpolate(a, gx, gy, missing, inside)
+            grids.update(computed)
+        with self._profiler.stage('grid_cache'):
+            self._cache_grids(a, computed, num_x, num_y)
+        if len(self._bss_keys) > 0 and all(
+            k in grids for k in self._bss_keys
+        ):
+            best, overlap = self._bss_summary(
+                np.column_stack([grids[k] for k in self._bss_keys])
+            )
+            grids['best_server'] = best
+            grids['ap_overlap'] = overlap
+        contours = {}
+        count = self._contours
+        if count is None and self._geojson:
+            count = DEFAULT_GEOJSON_CONTOURS
+        if count is not None:
+            with self._profiler.stage('contour'):
+                contours = self._contour_sets(a, grids, count, num_x, num_y)
+        return [
+            (k, '%s - %s' % (self._title, ptitle), grids.get(k), num_x, num_y,
+             contours.get(k))
+            for k, ptitle in self.graphs.items()
+        ]
+
+    def _contour_set(self, z, num_x, num_y, count):
+        """
+        Return the :py:class:`~.ContourSet` of about ``count`` levels of the
+        flat ``num_x`` by ``num_y`` grid ``z``, in floorplan pixel
+        coordinates.
+        """
+        z = np.asarray(z, dtype=float).reshape((num_y, num_x))
+        return ContourSet.compute(
+            z, np.linspace(0, self._image_width, num_x),
+            np.linspace(0, self._image_height, num_y),
+            contour_levels(z, count)
+        )
+
+    def _contour_sets(self, a, grids, count, num_x, num_y):
+        """
+        Return a dict of metric name to the :py:class:`~.ContourSet` of its
+        grid, for every plotted metric but the categorical best server map.
+        Contours are extracted once per grid and stored in the grid cache
+        alongside it.
+        """
+        res = {}
+        for k in self.graphs:
+            if grids.get(k) is None or k == 'best_server':
+                continue
+            ckey = None
+            if (
+                self._grid_cache is not None and
+                k not in self.BSS_SUMMARY_GRAPHS
+            ):
+                ckey = GridCache.key(
+                    CONTOUR_CACHE_VERSION, 'contours',
+                    self._grid_cache_key(a, k, num_x, num_y), count
+                )
+                data = self._grid_cache.get(ckey)
+                if data is not None:
+                    res[k] = ContourSet.from_array(data)
+                    continue
+            res[k] = self._contour_set(grids[k], num_x, num_y, count)
+            if ckey is None:
+                continue
+            try:
+                self._grid_cache.put(ckey, res[k].to_array())
+            except (IOError, OSError):
+                logger.warning('Unable to write grid cache', exc_info=True)
+        return res
+
+    def _contour_geojson(self, key, contours):
+        """
+        Return the contours of metric ``key`` as a GeoJSON
+        ``FeatureCollection`` in floorplan pixel coordinates, with the
+        floorplan as its bounding box.
+
+        :rtype: dict
+        """
+        data = contours.to_geojson({'metric': key, 'title': self._title})
+        data['bbox'] = [0, 0, self._layout.shape[1], self._layout.shape[0]]
+        return data
+
+    def _write_geojson(self, key, contours):
+        """Write the contours of metric ``key`` to METRIC_TITLE.geojson."""
+        fname = '%s_%s.geojson' % (key, self._title)
+        logger.info('Writing contours to: %s', fname)
+        with open(fname, 'w') as fh:
+            json.dump(self._contour_geojson(key, contours), fh)
+
+    def _generate_parallel(self, tasks):
+        """
+        Render the channel graphs and the given :py:meth:`~._plot` tasks in a
+        pool of ``self._jobs`` worker processes. Each worker builds its own
+        generator and loads the survey and floorplan once; only the
+        interpolated grids are sent along with each task.
+
+        :return: tuple of (number of heatmaps written, list of the names of
+          those that could not be created)
+        :rtype: tuple
+        """
+        logger.info(
+            'Rendering %d plots with %d worker processes',
+            len(tasks) + 1, self._jobs
+        )
+        pool = multiprocessing.Pool(
+            self._jobs, initializer=_init_worker,
+            initargs=(self._init_args, self._init_kwargs)
+        )
+        plots = 0
+        failed = []
+        try:
+            for _, key, written, error, _, records in pool.imap_unordered(
+                _render_worker,
+                [(self._title, None)] + [(self._title, t) for t in tasks]
+            ):
+                self._profiler.merge(records)
+                if error is not None:
+                    logger.warning('Cannot create {} plot: '
+                                   'insufficient data'.format(key))
+                    failed.append(key)
+                elif key != 'channels':
+                    plots += written
+        finally:
+            pool.close()
+            pool.join()
+        return plots, failed
 
     def _channel_to_signal(self):
         """
@@ -289,20 +758,21 @@ class HeatMapGenerator(object):
         for all APs seen on the given channel. This includes interpolation to
         overlapping channels based on channel width of each channel.
         """
-        # build a dict of frequency (GHz) to list of quality values
-        channels = defaultdict(list)
-        for row in self._data['survey_points']:
-            for scan in row['result']['scan_results']:
-                ssid = row['result']['scan_results'][scan]['ssid']
-                if ssid in self._ignore_ssids:
-                    continue
-                freq = row['result']['scan_results'][scan]['frequency'] / 1e6
-                channels[int(freq)].append(
-                    row['result']['scan_results'][scan]['signal_mbm'] + 100
-                )
+        metrics = self._metrics
+        if not metrics.scanned.all():
+            raise KeyError('scan_results')
+        # build dicts of frequency (GHz) to sum and count of quality values
+        sums = defaultdict(float)
+        counts = defaultdict(int)
+        for col, (_, ssid, freq) in enumerate(metrics.scan_columns):
+            if ssid in self._ignore_ssids:
+                continue
+            signal = metrics.scan_signal[:, col]
+            signal = signal[~np.isnan(signal)]
+            sums[int(freq / 1e6)] += (signal + 100).sum()
+            counts[int(freq / 1e6)] += len(signal)
         # collapse down to dict of frequency (GHz) to average quality (float)
-        for freq in channels.keys():
-            channels[freq] = sum(channels[freq]) / len(channels[freq])
+        channels = {freq: sums[freq] / counts[freq] for freq in sums}
         # build the full dict of frequency to quality for all channels
         freq_qual = {x: 0.0 for x in WIFI_CHANNELS.keys()}
         # then, update to account for full bandwidth of each channel
@@ -319,6 +789,7 @@ class HeatMapGenerator(object):
         }
 
     def _plot_channels(self, names, values, title, fname, ticks):
+        pp = _pyplot()
         pp.rcParams['figure.figsize'] = (
             self._image_width / 300, self._image_height / 300
         )
@@ -364,8 +835,10 @@ class HeatMapGenerator(object):
         )
 
     def _add_inner_title(self, ax, title, loc, size=None, **kwargs):
+        from matplotlib.offsetbox import AnchoredText
+        from matplotlib.patheffects import withStroke
         if size is None:
-            size = dict(size=pp.rcParams['legend.fontsize'])
+            size = dict(size=_pyplot().rcParams['legend.fontsize'])
         at = AnchoredText(
             title, loc=loc, prop=size, pad=0., borderpad=0.5, frameon=False,
             **kwargs
@@ -377,91 +850,774 @@ class HeatMapGenerator(object):
         )
         return at
 
-    def _plot(self, a, key, title, gx, gy, num_x, num_y):
-        if key not in a:
-            logger.info("Skipping {} due to insufficient data".format(key))
+    def _metric_keys(self, a):
+        """Return the names of the metrics measured at any point of ``a``."""
+        return [k for k in self.graphs.keys() if a.has(k)]
+
+    def _grid_cache_key(self, a, key, num_x, num_y):
+        """
+        Return the grid cache key for metric ``key``; it covers everything
+        the interpolated grid depends on, but not its styling.
+        """
+        method = [self._method]
+        if self._method in ('local', 'kriging'):
+            method.append(self._neighbors)
+        if self._progressive and self._refine_tolerance > 0:
+            method.append(('progressive', self._refine_tolerance))
+        if self._method == 'geodesic':
+            # depends on the walls of the floorplan
+            method.append(self._floorplan.digest)
+        if self._grid_mask(num_x, num_y) is not None:
+            method.append(('footprint', self._footprint.digest))
+        x, y, values = a.metric(self._measured_key(key), self._corners)
+        return GridCache.key(
+            GRID_CACHE_VERSION, key, x, y, values,
+            (num_x, num_y, self._image_width, self._image_height), method
+        )
+
+    def _cached_grids(self, a, keys, num_x, num_y):
+        """
+        Return a dict of metric name to interpolated grid for those of
+        ``keys`` found in the grid cache.
+        """
+        if self._grid_cache is None:
+            return {}
+        grids = {}
+        for k in keys:
+            z = self._grid_cache.get(self._grid_cache_key(a, k, num_x, num_y))
+            if z is not None and z.shape == (num_x * num_y,):
+                grids[k] = z
+        if len(grids) > 0:
+            logger.info(
+                'Using cached interpolation for %d metrics: %s',
+                len(grids), sorted(grids.keys())
+            )
+        return grids
+
+    def _cache_grids(self, a, grids, num_x, num_y):
+        """Store interpolated grids in the grid cache, and evict old ones."""
+        if self._grid_cache is None:
+            return
+        try:
+            for k, z in grids.items():
+                self._grid_cache.put(
+                    self._grid_cache_key(a, k, num_x, num_y), z
+                )
+        except (IOError, OSError):
+            logger.warning('Unable to write grid cache', exc_info=True)
+        try:
+            self._grid_cache.evict()
+        except (IOError, OSError):
+            logger.warning('Unable to evict from grid cache', exc_info=True)
+
+    def _interpolator(self, a, keys=None):
+        """
+        Build an interpolator for the given (by default, every measured)
+        metrics in ``a``, using the configured interpolation method. Each
+        metric is interpolated over only the points at which it was
+        measured; metrics measured at the same points share one
+        interpolator, so the kernel is only factored once for all of them.
+        With the "kriging" method, the uncertainty of each metric is
+        returned as an extra ``<metric>_uncertainty`` column.
+
+        :return: tuple of (list of metric names, interpolator returning one
+          column per metric), or (empty list, None) if there is nothing to
+          interpolate. Metrics whose interpolator cannot be built are left
+          out, with a warning.
+        :rtype: tuple
+        """
+        if keys is None:
+            keys = self._metric_keys(a)
+        groups = a.groups(keys)
+        if len(groups) == 0:
+            return [], None
+        interps = []
+        fitted = []
+        for group in groups:
+            columns = [a.metric(k, self._corners) for k in group]
+            x, y, _ = columns[0]
+            values = np.column_stack([c[2] for c in columns])
+            logger.debug(
+                'Interpolating %d metrics over %d points: %s',
+                len(group), len(x), group
+            )
+            try:
+                interps.append(self._group_interpolator(x, y, values))
+            except Exception as ex:
+                # plotting these metrics fails later, like in serial runs
+                logger.warning(
+                    'Cannot interpolate %s: %s', ', '.join(group), ex
+                )
+                continue
+            fitted.append(group)
+        groups = fitted
+        if len(groups) == 0:
+            return [], None
+        if self._method == 'kriging':
+            # each interpolator returns the uncertainties after the values
+            groups = [
+                group + [k + UNCERTAINTY_SUFFIX for k in group]
+                for group in groups
+            ]
+        keys = [k for group in groups for k in group]
+        if len(interps) == 1:
+            return keys, interps[0]
+        return keys, StackedInterpolator(interps)
+
+    def _group_interpolator(self, x, y, values):
+        """
+        Build the interpolator of the configured method for the columns of
+        ``values``, measured at points ``(x, y)``.
+        """
+        if self._method == 'local':
+            return LocalRbfInterpolator(
+                x, y, values, neighbors=self._neighbors
+            )
+        if self._method == 'kriging':
+            return LocalKrigingInterpolator(
+                x, y, values, neighbors=self._neighbors, uncertainty=True
+            )
+        if self._method == 'geodesic':
+            fields = self._geodesic_fields()
+            with self._profiler.stage('distance_fields'):
+                return GeodesicInterpolator(x, y, values, fields)
+        return RbfInterpolator(x, y, values)
+
+    def _evaluate(self, interp, gx, gy, inside, count):
+        """
+        Evaluate the ``count`` metrics of ``interp`` at the cells ``(gx, gy)``
+        of a grid that are in the ``inside`` mask (all of them if it is
+        None), leaving the others NaN.
+        """
+        if inside is None:
+            return interp(gx, gy)
+        z = np.full((len(gx), count), np.nan)
+        if inside.any():
+            z[inside] = interp(gx[inside], gy[inside])
+        return z
+
+    def _geodesic_fields(self):
+        """
+        Return the :py:class:`~.GeodesicFields` around the walls of the
+        floorplan, keeping the fields of every measurement in the grid
+        cache.
+        """
+        if self._geodesic is None:
+            self._geodesic = GeodesicFields(
+                wall_mask(self._layout), self._floorplan.digest,
+                cache=self._grid_cache
+            )
+        return self._geodesic
+
+    def _interpolate(self, a, gx, gy, keys=None, inside=None):
+        """
+        Interpolate the given (by default, every measured) metrics in ``a``
+        onto the grid ``(gx, gy)``, evaluating all metrics together in one
+        pass.
+
+        :param inside: mask of the grid cells to interpolate (see
+          :py:meth:`~._grid_mask`); the others are NaN
+        :type inside: numpy.ndarray
+        :return: dict of metric name to flat array of interpolated values
+        :rtype: dict
+        """
+        with self._profiler.stage('solve'):
+            keys, interp = self._interpolator(a, keys)
+        if interp is None:
+            return {}
+        with self._profiler.stage('evaluate'):
+            z = self._evaluate(interp, gx, gy, inside, len(keys))
+        grids = {k: z[:, idx] for idx, k in enumerate(keys)}
+        self._log_accuracy(a, gx, gy, grids)
+        return grids
+
+    def _interpolate_progressive(self, a, keys=None):
+        """
+        Interpolate the given (by default, every measured) metrics in ``a``
+        in coarse-to-fine stages,
+        writing a quick raster preview of each metric after every stage but
+        the last (see :py:attr:`~.PROGRESSIVE_STAGES`). All stages share one
+        interpolator, so the kernel is only solved once.
+
+        Each stage is first predicted by bilinearly upsampling the previous
+        one. With a non-zero refinement tolerance, only cells lying where the
+        previous stage differed from its own prediction by more than that
+        fraction of a metric's value range are evaluated again; all others
+        keep the prediction.
+
+        :return: tuple of (num_x, num_y, dict of metric name to flat array of
+          interpolated values) for the final stage
+        :rtype: tuple
+        """
+        with self._profiler.stage('solve'):
+            keys, interp = self._interpolator(a, keys)
+        stages = self.PROGRESSIVE_STAGES + [4]
+        if interp is None:
+            num_x, num_y, _, _ = self._grid()
+            return num_x, num_y, {}
+        span = np.array([
+            np.ptp(a.metric(self._measured_key(k))[2]) for k in keys
+        ])
+        tolerance = self._refine_tolerance * np.where(span > 0, span, 1.0)
+        prev = None
+        for stage, divisor in enumerate(stages):
+            num_x, num_y, gx, gy = self._grid(divisor)
+            inside = self._grid_mask(num_x, num_y)
+            if prev is None:
+                with self._profiler.stage('evaluate'):
+                    z = self._evaluate(interp, gx, gy, inside, len(keys))
+                changed = None
+            else:
+                pred = self._upsample_stage(prev[:3], num_x, num_y, len(keys))
+                if self._refine_tolerance > 0 and prev[3] is not None:
+                    refine = self._upsample_stage(
+                        prev[:2] + (prev[3].astype(float),), num_x, num_y, 1
+                    )[:, 0] > 0
+                    if inside is not None:
+                        # cells next to the footprint's edge have no
+                        # prediction
+                        refine = (refine | np.isnan(pred).any(axis=1)) & inside
+                        pred[~inside] = np.nan
+                    z = pred.copy()
+                    with self._profiler.stage('evaluate'):
+                        z[refine] = interp(gx[refine], gy[refine])
+                    logger.info(
+                        'Stage %d: refined %d of %d cells', stage,
+                        refine.sum(), len(gx)
+                    )
+                else:
+                    with self._profiler.stage('evaluate'):
+                        z = self._evaluate(interp, gx, gy, inside, len(keys))
+                changed = (np.abs(z - pred) > tolerance).any(axis=1)
+            if stage < len(stages) - 1:
+                with self._profiler.stage('preview'):
+                    self._write_previews(a, keys, z, num_x, num_y)
+            prev = (num_x, num_y, z, changed)
+        grids = {k: z[:, idx] for idx, k in enumerate(keys)}
+        self._log_accuracy(a, gx, gy, grids)
+        return num_x, num_y, grids
+
+    def _upsample_stage(self, stage, num_x, num_y, count):
+        """
+        Bilinearly upsample the ``count`` flattened grids of a
+        ``(num_x, num_y, z)`` progressive stage to a ``num_x`` by ``num_y``
+        grid.
+        """
+        prev_x, prev_y, z = stage
+        z = z.reshape((prev_y, prev_x, count))
+        x = np.linspace(0, self._image_width, num_x)
+        y = np.linspace(0, self._image_height, num_y)
+        return np.column_stack([
+            upsample(
+                z[:, :, idx], y, x, self._image_width, self._image_height
+            ).ravel()
+            for idx in range(count)
+        ])
+
+    def _preview_name(self, key):
+        """Return the file name of the progressive preview of ``key``."""
+        return '%s_%s.preview.png' % (key, self._title)
+
+    def _remove_preview(self, key):
+        """Remove the progressive preview of ``key``, if there is one."""
+        try:
+            os.remove(self._preview_name(key))
+        except OSError:
             return
-        if not len(a['x']) == len(a['y']) == len(a[key]):
-            logger.info("Skipping {} because data has holes".format(key))
+        logger.debug('Removed preview of %s', key)
+
+    def _write_previews(self, a, keys, z, num_x, num_y):
+        """Write a raster preview of each interpolated metric."""
+        if self._preview is None:
+            self._preview = RasterRenderer(self._cmap, compression=1)
+        for idx, key in enumerate(keys):
+            # there may be hundreds of per-BSS maps
+            if self._measured_key(key) in self._bss_keys:
+                continue
+            vmin, vmax = self._value_range(a, key)
+            fname = self._preview_name(key)
+            tmpname = fname + '.tmp'
+            self._preview.render(
+                tmpname, z[:, idx].reshape((num_y, num_x)), self._layout,
+                vmin, vmax, self._image_width, self._image_height
+            )
+            os.rename(tmpname, fname)
+            logger.info('Wrote %dx%d preview: %s', num_x, num_y, fname)
+
+    def _log_accuracy(self, a, gx, gy, grids):
+        """
+        If requested, log the error of the local interpolation method
+        against the exact RBF.
+        """
+        if self._method != 'local' or not self._check_accuracy:
             return
-        logger.debug('Plotting: %s', key)
-        pp.rcParams['figure.figsize'] = (
-            self._image_width / 300, self._image_height / 300
-        )
-        fig, ax = pp.subplots()
-        ax.set_title(title)
+        for k, z in grids.items():
+            x, y, values = a.metric(k, self._corners)
+            # only the cells inside the footprint were interpolated
+            inside = np.isfinite(z)
+            with self._profiler.stage('check_accuracy', k):
+                max_err, rms_err = compare_with_exact(
+                    x, y, values, gx[inside], gy[inside], z[inside]
+                )
+            logger.warning(
+                '%s: local interpolation error vs. exact Rbf: '
+                'max=%.4f rms=%.4f', k, max_err, rms_err
+            )
+
+    def _value_range(self, a, key):
+        """
+        Return the (min, max) values of ``key`` mapped to the ends of the
+        colormap, taken from the thresholds if present.
+        """
+        values = a.metric(self._measured_key(key))[2]
+        if key != self._measured_key(key):
+            # from certain to the spread of the measurements, beyond which
+            # the map says nothing
+            return 0.0, float(values.std())
+        if key == 'best_server':
+            # centered on the BSS indices, for the categorical colormap
+            return -0.5, len(self._bss_keys) - 0.5
         if 'min' in self.thresholds.get(key, {}):
             vmin = self.thresholds[key]['min']
             logger.debug('Using min threshold from thresholds: %s', vmin)
         else:
-            vmin = min(a[key])
+            vmin = values.min()
             logger.debug('Using calculated min threshold: %s', vmin)
         if 'max' in self.thresholds.get(key, {}):
             vmax = self.thresholds[key]['max']
             logger.debug('Using max threshold from thresholds: %s', vmax)
         else:
-            vmax = max(a[key])
+            vmax = values.max()
             logger.debug('Using calculated max threshold: %s', vmax)
         logger.info("{} has range [{},{}]".format(key, vmin, vmax))
+        return vmin, vmax
+
+    def _best_server_cmap(self):
+        """Return a categorical colormap with one color per BSS."""
+        from matplotlib.colors import ListedColormap
+        colors = _pyplot().get_cmap('tab20').colors
+        return ListedColormap([
+            colors[idx % len(colors)] for idx in range(len(self._bss_keys))
+        ])
+
+    def _draw_contours(self, ax, contours):
+        """
+        Draw contour lines, each level labeled on its longest line.
+        """
+        from matplotlib.collections import LineCollection
+        from matplotlib.patheffects import withStroke
+        ax.add_collection(LineCollection(
+            [line for lines in contours.lines for line in lines],
+            colors='k', linewidths=1, alpha=0.3, zorder=150
+        ))
+        for level, lines in zip(contours.levels, contours.lines):
+            if len(lines) == 0:
+                continue
+            line = max(lines, key=len)
+            x, y = line[len(line) // 2]
+            ax.text(
+                x, y, '%g' % level, fontsize=6, zorder=150,
+                horizontalalignment='center', verticalalignment='center',
+                path_effects=[withStroke(linewidth=2, foreground='w')]
+            )
+
+    def _plot(self, a, key, title, z, num_x, num_y, contours=None):
+        """
+        Plot the heatmap of metric ``key`` from its interpolated grid ``z``,
+        with the contour lines of ``contours`` (if any), and write those to
+        GeoJSON if requested. Its progressive preview, if any, is removed
+        once the heatmap is written.
+
+        :return: whether the plot was written; False if ``key`` wasn't
+          measured at all
+        :rtype: bool
+        """
+        written = self._plot_heatmap(
+            a, key, title, z, num_x, num_y, contours
+        )
+        if written and self._progressive:
+            self._remove_preview(key)
+        return written
+
+    def _plot_heatmap(self, a, key, title, z, num_x, num_y, contours):
+        """Plot and write the heatmap of ``key``; see :py:meth:`~._plot`."""
+        measured = self._measured_key(key)
+        if not a.has(measured):
+            logger.info("Skipping {} due to insufficient data".format(key))
+            return False
+        if z is None:
+            raise ValueError('%s could not be interpolated' % key)
+        logger.debug('Plotting: %s', key)
+        if self._geojson and contours is not None:
+            self._write_geojson(key, contours)
+        vmin, vmax = self._value_range(a, key)
+        # the best server map is categorical, with one color per BSS
+        categorical = key == 'best_server'
+        cmap = self._best_server_cmap() if categorical else self._cmap
         # Interpolate the data only if there is something to interpolate
         if vmin != vmax:
-            rbf = Rbf(
-                a['x'], a['y'], a[key], function='linear'
-            )
-            z = rbf(gx, gy)
             z = z.reshape((num_y, num_x))
         else:
             # Uniform array with the same color everywhere
-            # (avoids interpolation artifacts)
+            # (avoids interpolation artifacts), but outside the footprint
+            outside = None if z is None else numpy.isnan(z)
             z = numpy.ones((num_y, num_x))*vmin
+            if outside is not None:
+                z[outside.reshape((num_y, num_x))] = numpy.nan
+        if self._output_format == 'tiles':
+            dirname = '%s_%s_tiles' % (key, self._title)
+            logger.info('Writing tiles to: %s', dirname)
+            with self._profiler.stage('tiles'):
+                self._tiles.render(
+                    dirname, z, self._layout, vmin, vmax,
+                    self._image_width, self._image_height,
+                    metadata={'metric': key, 'title': title},
+                    levels=self._floorplan.levels,
+                    cmap=cmap if categorical else None, nearest=categorical
+                )
+            return True
+        fname = '%s_%s.png' % (key, self._title)
+        if self._backend == 'raster':
+            logger.info('Writing plot to: %s', fname)
+            with self._profiler.stage('raster'):
+                self._raster.render(
+                    fname, z, self._layout, vmin, vmax,
+                    self._image_width, self._image_height,
+                    cmap=cmap if categorical else None, nearest=categorical
+                )
+            return True
+        from matplotlib.colors import Normalize
+        from matplotlib.font_manager import FontManager
+        pp = _pyplot()
+        pp.rcParams['figure.figsize'] = (
+            self._image_width / 300, self._image_height / 300
+        )
+        fig, ax = pp.subplots()
+        ax.set_title(title)
         # Render the interpolated data to the plot
         ax.axis('off')
-        # begin color mapping
-        norm = matplotlib.colors.Normalize(vmin=vmin, vmax=vmax, clip=True)
-        mapper = cm.ScalarMappable(norm=norm, cmap=self._cmap)
-        # end color mapping
+        # color mapping of the survey points
+        norm = Normalize(vmin=vmin, vmax=vmax, clip=True)
         image = ax.imshow(
             z,
             extent=(0, self._image_width, self._image_height, 0),
             alpha=0.5, zorder=100,
-            cmap=self._cmap, vmin=vmin, vmax=vmax
+            cmap=cmap, vmin=vmin, vmax=vmax,
+            interpolation='nearest' if categorical else None
         )
 
         # Draw contours if requested and meaningful in this plot
-        if self._contours is not None and vmin != vmax:
-            CS = ax.contour(z, colors='k', linewidths=1, levels=self._contours,
-                            extent=(0, self._image_width, self._image_height, 0),
-                            alpha=0.3, zorder=150, origin='upper')
-            ax.clabel(CS, inline=1, fontsize=6)
+        if (
+            self._contours is not None and contours is not None and
+            vmin != vmax and not categorical
+        ):
+            with self._profiler.stage('contour'):
+                self._draw_contours(ax, contours)
         cbar = fig.colorbar(image)
 
         # Print only one ytick label when there is only one value to be shown
         if vmin == vmax:
             cbar.set_ticks([vmin])
+        if categorical:
+            cbar.set_ticks(range(len(self._bss_labels)))
+            cbar.set_ticklabels(self._bss_labels, fontsize=4)
 
         # Draw floorplan itself to the lowest layer with full opacity
         ax.imshow(self._layout, interpolation='bicubic', zorder=1, alpha=1)
         labelsize = FontManager.get_default_size() * 0.4
         if(self._showpoints):
-            # begin plotting points
-            for idx in range(0, len(a['x'])):
-                if (a['x'][idx], a['y'][idx]) in self._corners:
-                    continue
-                ax.plot(
-                    a['x'][idx], a['y'][idx], zorder=200,
-                    marker='o', markeredgecolor='black', markeredgewidth=1,
-                    markerfacecolor=mapper.to_rgba(a[key][idx]), markersize=6
+            with self._profiler.stage('annotate'):
+                if self._annotations is None:
+                    self._annotations = PointAnnotations(
+                        a.x, a.y, a.ap, labelsize
+                    )
+                values = a.values[measured]
+                if measured != key:
+                    # measured points are (nearly) certain
+                    values = numpy.zeros(len(values))
+                self._annotations.draw(
+                    ax, a.valid[measured], values, cmap, norm
                 )
-                ax.text(
-                    a['x'][idx], a['y'][idx] - 30,
-                    a['ap'][idx], fontsize=labelsize,
-                    horizontalalignment='center'
-                )
-            # end plotting points
-        fname = '%s_%s.png' % (key, self._title)
         logger.info('Writing plot to: %s', fname)
-        pp.savefig(fname, dpi=300)
+        with self._profiler.stage('savefig'):
+            pp.savefig(fname, dpi=300)
         pp.close('all')
+        return True
+
+
+#: arguments of the generators built by worker processes, with the title
+#: left out; see :py:func:`~._worker_generator`
+_worker_args = None
+
+#: per-process generators and survey data by title, most recently used last
+_workers = OrderedDict()
+
+#: number of surveys each worker process keeps loaded
+WORKER_CACHE_SIZE = 2
+
+
+def _init_worker(args, kwargs):
+    """
+    Set up a worker process to build generators with the given
+    :py:class:`~.HeatMapGenerator` arguments (whose title is replaced by
+    that of each job).
+    """
+    global _worker_args
+    _worker_args = (args, kwargs)
+    _workers.clear()
+
+
+def _worker_generator(title):
+    """
+    Return the generator and prepared survey data for ``title`` in a worker
+    process, building them if needed. Only the most recently used
+    :py:const:`~.WORKER_CACHE_SIZE` surveys are kept.
+    """
+    if title in _workers:
+        _workers.move_to_end(title)
+        return _workers[title]
+    args, kwargs = _worker_args
+    generator = HeatMapGenerator(*(args[:1] + (title,) + args[2:]), **kwargs)
+    _workers[title] = (generator, generator._prepare())
+    while len(_workers) > WORKER_CACHE_SIZE:
+        _workers.popitem(last=False)
+    return _workers[title]
+
+
+def _worker_records(title):
+    """
+    Return (and clear) the profiler records of the generator of ``title`` in
+    a worker process, if it could be built.
+    """
+    if title in _workers:
+        return _workers[title][0].profiler.take()
+    return {}
+
+
+def _error_message(ex):
+    """Return a short description of an error that stopped a job."""
+    if isinstance(ex, SystemExit):
+        # HeatMapGenerator logs the reason before exiting
+        return 'aborted'
+    return str(ex) or type(ex).__name__
+
+
+def _interpolate_worker(title):
+    """
+    Interpolate the grids of survey ``title`` in a worker process.
+
+    :return: tuple of (title, list of :py:meth:`~.HeatMapGenerator._plot`
+      tasks, floorplan size in pixels, error message or None, seconds taken,
+      profiler records of the job)
+    :rtype: tuple
+    """
+    start = time.time()
+    try:
+        generator, a = _worker_generator(title)
+        tasks = generator._render_tasks(a)
+        size = generator._image_width * generator._image_height
+    except (Exception, SystemExit) as ex:
+        logger.debug('Error interpolating %s', title, exc_info=True)
+        return (title, None, 0, _error_message(ex), time.time() - start,
+                _worker_records(title))
+    return (title, tasks, size, None, time.time() - start,
+            generator.profiler.take())
+
+
+def _render_worker(job):
+    """
+    Render the channel graphs (if ``task`` is None) or one
+    :py:meth:`~.HeatMapGenerator._plot` task of a survey in a worker process.
+
+    :param job: tuple of (survey title, task)
+    :type job: tuple
+    :return: tuple of (title, plot name, whether it was written, error
+      message or None, seconds taken, profiler records of the job)
+    :rtype: tuple
+    """
+    title, task = job
+    name = 'channels' if task is None else task[0]
+    start = time.time()
+    written = True
+    try:
+        generator, a = _worker_generator(title)
+        if task is None:
+            with generator.profiler.stage('channel_graphs'):
+                generator._channel_graphs()
+        else:
+            with generator.profiler.stage('plot', name):
+                written = generator._plot(a, *task)
+    except (Exception, SystemExit) as ex:
+        logger.debug('Error rendering %s of %s', name, title, exc_info=True)
+        return (title, name, False, _error_message(ex), time.time() - start,
+                _worker_records(title))
+    return (title, name, written, None, time.time() - start,
+            generator.profiler.take())
+
+
+class BatchGenerator(object):
+    """
+    Generate the heatmaps of many surveys.
+
+    With more than one job, all surveys share a single pool of worker
+    processes: first every survey is interpolated (largest survey file
+    first), then the channel graphs and heatmaps of all surveys are
+    rendered one job per plot, ordered by floorplan size so that large
+    floors are started first and small ones fill in the gaps.
+
+    :param titles: survey titles (or data filenames)
+    :type titles: list
+    :param jobs: number of worker processes
+    :type jobs: int
+    :param args: the other positional arguments of
+      :py:class:`~.HeatMapGenerator`, i.e. image_path, showpoints, cname and
+      contours
+    :param kwargs: keyword arguments of :py:class:`~.HeatMapGenerator`
+    """
+
+    def __init__(self, titles, jobs, *args, **kwargs):
+        self._titles = [
+            t if t.endswith('.json') else t + '.json' for t in titles
+        ]
+        self._jobs = jobs
+        self._args = (args[0], None) + tuple(args[1:])
+        self._kwargs = kwargs
+        #: per-survey results; dicts with ``interpolate`` and ``render``
+        #: seconds (without a pool, all of the time is counted as
+        #: rendering), number of ``plots`` rendered, list of ``failed``
+        #: plots and the ``error`` that prevented generating the survey
+        self.summary = OrderedDict(
+            (t, {'interpolate': 0.0, 'render': 0.0, 'plots': 0,
+                 'failed': [], 'error': None})
+            for t in self._titles
+        )
+        #: stages of all surveys (see ``profile``)
+        self.profiler = NULL_PROFILER
+        if kwargs.get('profile'):
+            self.profiler = Profiler()
+
+    def generate(self):
+        """
+        Generate the heatmaps of all surveys.
+
+        :return: whether every survey was generated
+        :rtype: bool
+        """
+        if self._jobs < 2:
+            self._generate_serial()
+        else:
+            self._generate_parallel()
+        return all(s['error'] is None for s in self.summary.values())
+
+    def _generate_serial(self):
+        for title in self._titles:
+            start = time.time()
+            generator = None
+            try:
+                generator = HeatMapGenerator(
+                    *(self._args[:1] + (title,) + self._args[2:]),
+                    **self._kwargs
+                )
+                plots, failed = generator.generate()
+                self.summary[title]['plots'] = plots
+                self.summary[title]['failed'] = failed
+            except (Exception, SystemExit) as ex:
+                logger.error(
+                    'Error generating %s', title,
+                    exc_info=not isinstance(ex, SystemExit)
+                )
+                self.summary[title]['error'] = _error_message(ex)
+            if generator is not None:
+                self.profiler.merge(generator.profiler.take())
+            self.summary[title]['render'] = time.time() - start
+
+    def _generate_parallel(self):
+        logger.info(
+            'Generating %d surveys with %d worker processes',
+            len(self._titles), self._jobs
+        )
+        titles = sorted(
+            self._titles, key=lambda t: -os.path.getsize(t)
+            if os.path.exists(t) else 0
+        )
+        pool = multiprocessing.Pool(
+            self._jobs, initializer=_init_worker,
+            initargs=(self._args, self._kwargs)
+        )
+        try:
+            jobs = []
+            for title, tasks, size, error, elapsed, records in \
+                    pool.imap_unordered(_interpolate_worker, titles):
+                self.profiler.merge(records)
+                self.summary[title]['interpolate'] = elapsed
+                if error is not None:
+                    logger.error('Error generating %s: %s', title, error)
+                    self.summary[title]['error'] = error
+                    continue
+                jobs.extend(
+                    (size, (title, task)) for task in [None] + tasks
+                )
+            jobs.sort(key=lambda job: -job[0])
+            for title, name, written, error, elapsed, records in \
+                    pool.imap_unordered(
+                        _render_worker, [job for _, job in jobs]
+                    ):
+                self.profiler.merge(records)
+                self.summary[title]['render'] += elapsed
+                if error is None:
+                    if name != 'channels':
+                        self.summary[title]['plots'] += written
+                else:
+                    logger.warning(
+                        'Cannot create %s plot of %s: %s', name, title, error
+                    )
+                    self.summary[title]['failed'].append(name)
+        finally:
+            pool.close()
+            pool.join()
+
+    def format_summary(self):
+        """
+        Return the per-survey timings and failures as a text table.
+
+        :rtype: str
+        """
+        width = max([len(t) for t in self._titles] + [6])
+        lines = ['%-*s  %5s  %6s  %10s  %10s' % (
+            width, 'Survey', 'Plots', 'Failed', 'Interp [s]', 'Render [s]'
+        )]
+        for title, res in self.summary.items():
+            lines.append('%-*s  %5d  %6d  %10.1f  %10.1f' % (
+                width, title, res['plots'], len(res['failed']),
+                res['interpolate'], res['render']
+            ))
+        for title, res in self.summary.items():
+            if res['error'] is not None:
+                lines.append('%s failed: %s' % (title, res['error']))
+            elif len(res['failed']) > 0:
+                lines.append('%s: could not create %s' % (
+                    title, ', '.join(res['failed'])
+                ))
+        return '\n'.join(lines)
+
+
+def expand_titles(titles):
+    """
+    Expand any glob patterns (such as ``'floor*.json'``) in ``titles``;
+    other titles are kept as they are.
+
+    :rtype: list
+    """
+    res = []
+    for title in titles:
+        if glob.has_magic(title):
+            matches = sorted(glob.glob(title))
+            if len(matches) == 0:
+                logger.warning('No survey files match: %s', title)
+            res.extend(matches)
+        else:
+            res.append(title)
+    return res
 
 
 def parse_args(argv):
@@ -475,7 +1631,8 @@ def parse_args(argv):
     p.add_argument('-v', '--verbose', dest='verbose', action='count', default=0,
                    help='verbose output. specify twice for debug-level output.')
     p.add_argument('-i', '--ignore', dest='ignore', action='append',
-                   default=[], help='SSIDs to ignore from channel graph')
+                   default=[], help='SSIDs to ignore from channel graph '
+                                    'and BSS maps')
     p.add_argument('-t', '--thresholds', dest='thresholds', action='store',
                    type=str, help='thresholds JSON file path')
     p.add_argument('-a', '--ap-names', type=str, dest='aps', action='store',
@@ -490,14 +1647,111 @@ def parse_args(argv):
     p.add_argument('-n', '--contours', type=int, dest='N', action='store',
                    default=None,
                    help='If specified, N contour lines will be added to the graphs')
+    p.add_argument('--geojson', dest='geojson', action='store_true',
+                   default=False,
+                   help='Also write the contour lines and areas of each '
+                        'heatmap (-n levels, default %d) to '
+                        '<metric>_<title>.geojson, in floorplan pixel '
+                        'coordinates' % DEFAULT_GEOJSON_CONTOURS)
     p.add_argument('-p', '--picture', dest='IMAGE', type=str, action='store',
                    default=None, help='Path to background image')
     p.add_argument(
-        'TITLE', type=str, help='Title for survey (and data filename)'
+        'TITLE', type=str, nargs='+',
+        help='Title for survey (and data filename); several titles or glob '
+             'patterns generate the heatmaps of all of those surveys'
     )
     p.add_argument('-s', '--show-points', dest='showpoints', action='count',
                    default=0, help='show measurement points in file')
+    p.add_argument('-m', '--method', dest='method', action='store',
+                   choices=INTERPOLATION_METHODS, default='rbf',
+                   help='Interpolation method: "rbf" for an exact global '
+                        'linear RBF (slow for large surveys), "local" for '
+                        'a linear RBF limited to the nearest measurements, '
+                        '"geodesic" for an RBF over distances around the '
+                        'walls of the floorplan, or "kriging" for local '
+                        'kriging that also plots METRIC_uncertainty maps')
+    p.add_argument('-k', '--neighbors', dest='neighbors', action='store',
+                   type=int, default=32,
+                   help='Number of nearest measurements used by the "local" '
+                        'and "kriging" interpolation methods')
+    p.add_argument('--check-accuracy', dest='check_accuracy',
+                   action='store_true', default=False,
+                   help='Log the error of the "local" interpolation method '
+                        'against the exact RBF on a sample of the grid')
+    p.add_argument('-j', '--jobs', dest='jobs', action='store', type=int,
+                   default=1,
+                   help='Number of worker processes used to render plots')
+    p.add_argument('-b', '--backend', dest='backend', action='store',
+                   choices=['matplotlib', 'raster'], default='matplotlib',
+                   help='Rendering backend: "matplotlib" for annotated '
+                        'figures, or "raster" for plain heatmaps composited '
+                        'over the floorplan, which is much faster')
+    p.add_argument('--png-compression', dest='compression', action='store',
+                   type=int, choices=range(10), default=6,
+                   help='PNG compression level of the "raster" backend')
+    p.add_argument('--encoder-thread', dest='encoder_thread',
+                   action='store_true', default=False,
+                   help='Encode PNGs of the "raster" backend on a separate '
+                        'thread')
+    p.add_argument('-o', '--output-format', dest='output_format',
+                   action='store', choices=['png', 'tiles'], default='png',
+                   help='Write each heatmap as a single PNG, or as a '
+                        'pyramid of PNG tiles plus a manifest.json in a '
+                        '<metric>_<title>_tiles directory (composited like '
+                        'the "raster" backend)')
+    p.add_argument('--tile-size', dest='tile_size', action='store', type=int,
+                   default=256, help='Tile size in pixels for "-o tiles"')
+    p.add_argument('--progressive', dest='progressive', action='store_true',
+                   default=False,
+                   help='Interpolate in coarse-to-fine stages, writing a '
+                        'quick <metric>_<title>.preview.png after each stage '
+                        'until the final heatmap is written')
+    p.add_argument('--refine-tolerance', dest='refine_tolerance',
+                   action='store', type=float, default=0.0,
+                   help='With --progressive, only refine cells whose value '
+                        'changed by more than this fraction of the metric\'s '
+                        'range in the previous stage (default: refine all)')
+    p.add_argument('--no-cache', dest='cache', action='store_false',
+                   default=True,
+                   help='Do not read or write cached interpolated grids')
+    p.add_argument('--cache-max-size', dest='cache_max_size', action='store',
+                   type=float, default=1024,
+                   help='Maximum size of the interpolated grid cache, in MB')
+    p.add_argument('--cache-max-age', dest='cache_max_age', action='store',
+                   type=float, default=30,
+                   help='Remove cached grids unused for this many days')
+    p.add_argument('--bss-maps', dest='bss_maps', action='store_true',
+                   default=False,
+                   help='Also plot the signal of every BSSID in the scan '
+                        'results, the best server (strongest BSSID) and the '
+                        'number of BSSIDs above --overlap-threshold')
+    p.add_argument('--overlap-threshold', dest='overlap_threshold',
+                   action='store', type=float, default=-67.0,
+                   help='Signal (dBm) above which a BSSID counts towards '
+                        'the overlap map of --bss-maps')
+    p.add_argument('--footprint', dest='footprint', action='store',
+                   nargs='?', const='auto', default=None, metavar='MASK',
+                   help='Only interpolate inside the building footprint, '
+                        'leaving the rest of the floorplan uncolored. The '
+                        'footprint is read from the MASK image (white or '
+                        'opaque inside) if given, otherwise derived from '
+                        'the transparency or background color of the '
+                        'floorplan')
+    p.add_argument('--profile', dest='profile', action='store_true',
+                   default=False,
+                   help='Print the wall time, CPU time and peak memory of '
+                        'each stage (and each metric) of generating the '
+                        'heatmaps')
+    p.add_argument('--profile-json', dest='profile_json', action='store',
+                   type=str, default=None,
+                   help='Also write the --profile results to this JSON file')
+    p.add_argument('--profile-stats', dest='profile_stats', action='store',
+                   type=str, default=None,
+                   help='Also write cProfile statistics of the main process '
+                        'to this file, for use with pstats or snakeviz')
     args = p.parse_args(argv)
+    if args.profile_json is not None or args.profile_stats is not None:
+        args.profile = True
     return args
 
 
@@ -531,6 +1785,10 @@ def set_log_level_format(level, format):
 
 
 def main():
+    if sys.argv[1:2] == ['serve']:
+        from wifi_survey_heatmap.server import main as serve
+        serve(sys.argv[2:])
+        return
     args = parse_args(sys.argv[1:])
 
     # set logging level
@@ -540,11 +1798,57 @@ def main():
         set_log_info()
 
     showpoints = True if args.showpoints > 0 else False
-
-    HeatMapGenerator(
-        args.IMAGE, args.TITLE, showpoints, args.CNAME, args.N,
-        ignore_ssids=args.ignore, aps=args.aps, thresholds=args.thresholds
-    ).generate()
+    kwargs = dict(
+        ignore_ssids=args.ignore, aps=args.aps, thresholds=args.thresholds,
+        method=args.method, neighbors=args.neighbors,
+        check_accuracy=args.check_accuracy,
+        backend=args.backend, compression=args.compression,
+        encoder_thread=args.encoder_thread,
+        output_format=args.output_format, tile_size=args.tile_size,
+        progressive=args.progressive, refine_tolerance=args.refine_tolerance,
+        cache=args.cache, cache_max_size=int(args.cache_max_size * 1024 ** 2),
+        cache_max_age=args.cache_max_age * 86400, bss_maps=args.bss_maps,
+        overlap_threshold=args.overlap_threshold, profile=args.profile,
+        geojson=args.geojson, footprint=args.footprint
+    )
+    titles = expand_titles(args.TITLE)
+    if len(titles) == 0:
+        logger.error('No surveys to generate heatmaps of')
+        raise SystemExit(1)
+    stats = None
+    if args.profile_stats is not None:
+        import cProfile
+        stats = cProfile.Profile()
+        stats.enable()
+    try:
+        if len(titles) == 1:
+            generator = HeatMapGenerator(
+                args.IMAGE, titles[0], showpoints, args.CNAME, args.N,
+                jobs=args.jobs, **kwargs
+            )
+            generator.generate()
+            ok = True
+            profiler = generator.profiler
+        else:
+            batch = BatchGenerator(
+                titles, args.jobs, args.IMAGE, showpoints, args.CNAME,
+                args.N, **kwargs
+            )
+            ok = batch.generate()
+            print(batch.format_summary())
+            profiler = batch.profiler
+    finally:
+        if stats is not None:
+            stats.disable()
+            stats.dump_stats(args.profile_stats)
+            logger.info('Wrote cProfile statistics to: %s', args.profile_stats)
+    if args.profile:
+        print(profiler.format_table())
+        if args.profile_json is not None:
+            profiler.write_json(args.profile_json)
+            logger.info('Wrote profile to: %s', args.profile_json)
+    if not ok:
+        raise SystemExit(1)
 
 
 if __name__ == '__main__':
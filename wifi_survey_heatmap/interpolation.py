@@ -0,0 +1,739 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import logging
+import warnings
+
+import numpy as np
+
+# SciPy is imported where it is used, so that entry points which don't
+# interpolate anything (e.g. ``--help``) start quickly
+
+logger = logging.getLogger(__name__)
+
+#: Interpolation methods selectable via ``wifi-heatmap --method``
+INTERPOLATION_METHODS = ['rbf', 'local', 'geodesic', 'kriging']
+
+#: nugget of :py:class:`~.LocalKrigingInterpolator`, as a fraction of the
+#: variance of the values; keeps the kriging systems of measurements taken
+#: at the same location solvable
+KRIGING_NUGGET = 1e-6
+
+
+def _solve_stack(a, b):
+    """
+    Solve a stack of small linear systems ``a[i] @ x[i] = b[i]``, falling back
+    to least squares for the (rare) singular ones, e.g. when the same
+    location was measured twice.
+    """
+    vector = b.ndim == a.ndim - 1
+    if vector:
+        b = b[..., None]
+    try:
+        res = np.linalg.solve(a, b)
+    except np.linalg.LinAlgError:
+        res = np.empty(b.shape, dtype=float)
+        for i in range(len(a)):
+            try:
+                res[i] = np.linalg.solve(a[i], b[i])
+            except np.linalg.LinAlgError:
+                res[i] = np.linalg.lstsq(a[i], b[i], rcond=None)[0]
+    return res[..., 0] if vector else res
+
+
+def _rank1_update(mat, col, row, block=256):
+    """
+    In-place ``mat += outer(col, row)``, in blocks of rows so that no
+    temporary of the size of ``mat`` is needed.
+    """
+    for start in range(0, len(mat), block):
+        mat[start:start + block] += col[start:start + block, None] * row
+
+
+class RbfInterpolator(object):
+    """
+    Exact global linear RBF, equivalent to
+    ``scipy.interpolate.Rbf(x, y, values, function='linear')`` but accepting
+    several sets of values for the same coordinates at once.
+
+    The kernel matrix only depends on the coordinates, so it is LU-factored
+    once and solved for all columns of ``values`` together; evaluation is a
+    single (chunked) product of the query-to-point distance matrix with all
+    weight columns.
+
+    Measurements can be added, moved and removed afterwards; the solution is
+    then updated in ``O(N^2)`` from an explicit kernel inverse, which is only
+    computed on the first such edit.
+
+    :param x: X coordinates of the measurements
+    :type x: list
+    :param y: Y coordinates of the measurements
+    :type y: list
+    :param values: measured values, either of shape ``(N,)`` or ``(N, K)``
+      for ``K`` metrics measured at the same ``N`` locations
+    :type values: numpy.ndarray
+    :param chunk_size: maximum number of query points evaluated at once
+    :type chunk_size: int
+    :raises numpy.linalg.LinAlgError: if the kernel is singular, e.g. when
+      the same location was measured twice
+    """
+
+    def __init__(self, x, y, values, chunk_size=4096):
+        from scipy.linalg import LinAlgWarning, lu_factor, lu_solve
+        from scipy.spatial.distance import cdist
+        self._points = np.column_stack([
+            np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        ])
+        values = np.asarray(values, dtype=float)
+        if len(self._points) != len(values):
+            raise ValueError('x, y and values must have the same length')
+        self._chunk_size = chunk_size
+        self._values = values
+        with warnings.catch_warnings():
+            # reported below as an error instead
+            warnings.simplefilter('ignore', LinAlgWarning)
+            self._lu = lu_factor(cdist(self._points, self._points))
+        pivots = np.abs(np.diag(self._lu[0]))
+        if len(pivots) > 0 and not (
+            pivots.min() > np.finfo(float).eps * len(pivots) * pivots.max()
+        ):
+            raise np.linalg.LinAlgError(
+                'Singular RBF kernel; is a location measured twice?'
+            )
+        self._weights = lu_solve(self._lu, values)
+        if not np.isfinite(self._weights).all():
+            raise np.linalg.LinAlgError('Non-finite RBF weights')
+        # explicit kernel inverse, only computed for incremental updates
+        self._inverse = None
+
+    def _kernel_inverse(self):
+        if self._inverse is None:
+            from scipy.linalg import lu_solve
+            self._inverse = lu_solve(self._lu, np.eye(len(self._points)))
+        return self._inverse
+
+    def add_point(self, x, y, value):
+        """
+        Add a measurement, updating the solution in ``O(N^2)`` with a
+        bordered-matrix (Schur complement) update of the kernel inverse
+        instead of refactoring the kernel.
+
+        :param value: measured value, or one value per metric
+        :return: None, since the whole interpolated surface changes
+        """
+        from scipy.spatial.distance import cdist
+        inv = self._kernel_inverse()
+        border = cdist(self._points, [[x, y]])[:, 0]
+        proj = np.dot(inv, border)
+        # the kernel diagonal is phi(0) = 0
+        schur = -np.dot(border, proj)
+        if abs(schur) < 1e-12 * max(1.0, np.abs(border).max()):
+            raise ValueError(
+                'Cannot add a point at the location of an existing point'
+            )
+        n = len(self._points)
+        res = np.empty((n + 1, n + 1), dtype=float)
+        res[:n, :n] = inv
+        _rank1_update(res[:n, :n], proj, proj / schur)
+        res[:n, n] = res[n, :n] = -proj / schur
+        res[n, n] = 1.0 / schur
+        self._inverse = res
+        self._points = np.vstack([self._points, [[x, y]]])
+        self._values = np.concatenate([
+            self._values, np.reshape(value, (1,) + self._values.shape[1:])
+        ])
+        self._weights = np.dot(self._inverse, self._values)
+
+    def remove_point(self, index):
+        """
+        Remove the measurement at ``index``, updating the solution in
+        ``O(N^2)`` with a bordered-matrix downdate of the kernel inverse.
+
+        :return: None, since the whole interpolated surface changes
+        """
+        inv = self._kernel_inverse()
+        keep = np.flatnonzero(np.arange(len(self._points)) != index)
+        res = inv[np.ix_(keep, keep)]
+        _rank1_update(
+            res, inv[keep, index], -inv[index, keep] / inv[index, index]
+        )
+        self._inverse = res
+        self._points = self._points[keep]
+        self._values = self._values[keep]
+        self._weights = np.dot(self._inverse, self._values)
+
+    def move_point(self, index, x, y):
+        """
+        Move the measurement at ``index`` to ``(x, y)``; the moved point
+        becomes the last one.
+
+        :return: None, since the whole interpolated surface changes
+        """
+        value = self._values[index]
+        self.remove_point(index)
+        self.add_point(x, y, value)
+
+    def __call__(self, gx, gy):
+        from scipy.spatial.distance import cdist
+        gx = np.asarray(gx, dtype=float)
+        query = np.column_stack([gx.ravel(), np.asarray(gy, float).ravel()])
+        res = np.empty((len(query),) + self._weights.shape[1:], dtype=float)
+        for start in range(0, len(query), self._chunk_size):
+            res[start:start + self._chunk_size] = np.dot(
+                cdist(query[start:start + self._chunk_size], self._points),
+                self._weights
+            )
+        return res.reshape(gx.shape + self._weights.shape[1:])
+
+
+class LocalRbfInterpolator(object):
+    """
+    Neighbor-limited approximation of
+    ``scipy.interpolate.Rbf(x, y, values, function='linear')``.
+
+    Small linear RBF systems are solved at the nodes of a regular lattice
+    spread over the survey points; each node only uses its ``neighbors``
+    nearest measurements, found with a KD-tree. Every query point is blended
+    from the fits of the four lattice nodes surrounding it using bilinear
+    weights, which form a partition of unity, so the result has no seams
+    between nodes. The cost is ``O(M * k^3 + G * k)`` for ``M`` nodes, ``G``
+    query points and ``k`` neighbors instead of the ``O(N^3 + G * N)`` of a
+    global fit over all ``N`` points.
+
+    Like :py:class:`scipy.interpolate.Rbf`, instances are constructed from the
+    data and then called with the coordinates to evaluate. Measurements can
+    be added, moved and removed afterwards; only the nodes whose neighbors
+    change are refitted, and the region whose values changed is returned.
+
+    :param x: X coordinates of the measurements
+    :type x: list
+    :param y: Y coordinates of the measurements
+    :type y: list
+    :param values: measured values, either of shape ``(N,)`` or ``(N, K)``
+      for ``K`` metrics measured at the same ``N`` locations
+    :type values: numpy.ndarray
+    :param neighbors: number of nearest measurements used per lattice node
+    :type neighbors: int
+    :param spacing: lattice node spacing, in the same units as x and y.
+      Defaults to a value derived from the typical distance to the
+      ``neighbors``-th nearest measurement.
+    :type spacing: float
+    :param chunk_size: maximum number of query points evaluated at once
+    :type chunk_size: int
+    """
+
+    def __init__(
+        self, x, y, values, neighbors=32, spacing=None, chunk_size=65536
+    ):
+        from scipy.spatial import cKDTree
+        self._points = np.column_stack([
+            np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        ])
+        values = np.asarray(values, dtype=float)
+        if len(self._points) != len(values):
+            raise ValueError('x, y and values must have the same length')
+        # trailing shape of a single result; () for one metric, (K,) for K
+        self._value_shape = values.shape[1:]
+        self._values = values.reshape(len(values), -1)
+        self._max_k = int(max(1, neighbors))
+        self._k = min(self._max_k, len(self._points))
+        self._chunk_size = chunk_size
+        self._tree = cKDTree(self._points)
+        self._origin = self._points.min(axis=0)
+        extent = self._points.max(axis=0) - self._origin
+        if spacing is None:
+            spacing = self._default_spacing(extent)
+        self._spacing = float(spacing)
+        # at least two nodes per axis, so every query has four corners
+        self._shape = np.maximum(
+            np.ceil(extent / self._spacing).astype(int) + 1, 2
+        )
+        logger.debug(
+            'LocalRbfInterpolator: %d points, k=%d, spacing=%.1f, '
+            'lattice=%dx%d', len(self._points), self._k, self._spacing,
+            self._shape[0], self._shape[1]
+        )
+        self._fit()
+
+    def _default_spacing(self, extent):
+        """
+        Pick a node spacing so that each node's support (the 2x2 lattice
+        cells around it) lies within the disk of its ``k`` nearest points.
+        """
+        sample = self._points[::max(1, len(self._points) // 1000)]
+        k = min(self._k + 1, len(self._points))
+        dist, _ = self._tree.query(sample, k=k)
+        radius = np.median(np.reshape(dist, (len(sample), -1))[:, -1])
+        spacing = radius / np.sqrt(2.0)
+        if not spacing > 0:
+            spacing = max(extent.max(), 1.0)
+        return spacing
+
+    def _fit(self):
+        nx, ny = self._shape
+        ix, iy = np.meshgrid(np.arange(nx), np.arange(ny), indexing='ij')
+        self._lattice = np.column_stack([ix.ravel(), iy.ravel()])
+        self._nodes = self._origin + self._spacing * self._lattice
+        count = len(self._nodes)
+        self._neighbors = np.empty((count, self._k), dtype=int)
+        # distance from each node to its k-th nearest neighbor
+        self._radii = np.empty(count, dtype=float)
+        self._weights = np.empty(
+            self._neighbors.shape + self._values.shape[1:], dtype=float
+        )
+        self._fit_nodes(np.arange(count))
+
+    def _fit_nodes(self, nodes):
+        """(Re-)fit the local RBFs of the given lattice nodes."""
+        if len(nodes) == 0:
+            return
+        dist, idx = self._tree.query(self._nodes[nodes], k=self._k)
+        self._neighbors[nodes] = np.reshape(idx, (len(nodes), self._k))
+        self._radii[nodes] = np.reshape(dist, (len(nodes), self._k))[:, -1]
+        # bound memory of the stacked k*k kernel matrices
+        step = max(1, 2 ** 22 // (self._k * self._k))
+        for start in range(0, len(nodes), step):
+            sub = nodes[start:start + step]
+            self._solve_nodes(sub, self._neighbors[sub])
+
+    def _solve_nodes(self, nodes, nbr):
+        """
+        Solve the local systems of the given lattice nodes, whose nearest
+        measurements are ``nbr``.
+        """
+        pts = self._points[nbr]
+        kernel = np.sqrt(
+            ((pts[:, :, None, :] - pts[:, None, :, :]) ** 2).sum(axis=-1)
+        )
+        self._weights[nodes] = _solve_stack(kernel, self._values[nbr])
+
+    def _support(self, nodes):
+        """
+        Return the bounding box ``(xmin, ymin, xmax, ymax)`` of the region
+        whose values depend on the given lattice nodes (an empty box if there
+        are none); nodes on the lattice edge also cover everything beyond it.
+        """
+        if len(nodes) == 0:
+            return (np.inf, np.inf, -np.inf, -np.inf)
+        lattice = self._lattice[nodes]
+        lo = self._nodes[nodes] - self._spacing
+        hi = self._nodes[nodes] + self._spacing
+        lo[lattice == 0] = -np.inf
+        hi[lattice == self._shape - 1] = np.inf
+        lo = lo.min(axis=0)
+        hi = hi.max(axis=0)
+        return (lo[0], lo[1], hi[0], hi[1])
+
+    def _rebuild(self):
+        """
+        Rebuild the KD-tree after the points changed. Returns True if the
+        number of neighbors per node changed, which requires a full refit.
+        """
+        from scipy.spatial import cKDTree
+        self._tree = cKDTree(self._points)
+        k = min(self._max_k, len(self._points))
+        if k == self._k:
+            return False
+        self._k = k
+        self._fit()
+        return True
+
+    def add_point(self, x, y, value):
+        """
+        Add a measurement, refitting only the lattice nodes whose nearest
+        neighbors now include it. The lattice is not extended, so points
+        outside of the original survey area are only picked up by the
+        nodes on its edge.
+
+        :param value: measured value, or one value per metric
+        :return: bounding box ``(xmin, ymin, xmax, ymax)`` of the region whose
+          interpolated values changed, or None if all of them did
+        :rtype: tuple
+        """
+        self._points = np.vstack([self._points, [[x, y]]])
+        self._values = np.vstack([
+            self._values, np.reshape(value, (1, self._values.shape[1]))
+        ])
+        if self._rebuild():
+            return None
+        dist = np.sqrt(((self._nodes - [x, y]) ** 2).sum(axis=1))
+        affected = np.flatnonzero(dist < self._radii)
+        self._fit_nodes(affected)
+        return self._support(affected)
+
+    def remove_point(self, index):
+        """
+        Remove the measurement at ``index``, refitting only the lattice nodes
+        that used it.
+
+        :return: bounding box ``(xmin, ymin, xmax, ymax)`` of the region whose
+          interpolated values changed, or None if all of them did
+        :rtype: tuple
+        """
+        affected = np.flatnonzero((self._neighbors == index).any(axis=1))
+        self._points = np.delete(self._points, index, axis=0)
+        self._values = np.delete(self._values, index, axis=0)
+        self._neighbors[self._neighbors > index] -= 1
+        if self._rebuild():
+            return None
+        self._fit_nodes(affected)
+        return self._support(affected)
+
+    def move_point(self, index, x, y):
+        """
+        Move the measurement at ``index`` to ``(x, y)``; the moved point
+        becomes the last one.
+
+        :return: bounding box ``(xmin, ymin, xmax, ymax)`` of the region whose
+          interpolated values changed, or None if all of them did
+        :rtype: tuple
+        """
+        value = self._values[index].copy()
+        removed = self.remove_point(index)
+        added = self.add_point(x, y, value)
+        if removed is None or added is None:
+            return None
+        return (
+            min(removed[0], added[0]), min(removed[1], added[1]),
+            max(removed[2], added[2]), max(removed[3], added[3])
+        )
+
+    def __call__(self, gx, gy):
+        gx = np.asarray(gx, dtype=float)
+        query = np.column_stack([gx.ravel(), np.asarray(gy, float).ravel()])
+        res = np.empty((len(query), self._values.shape[1]), dtype=float)
+        for start in range(0, len(query), self._chunk_size):
+            res[start:start + self._chunk_size] = self._evaluate(
+                query[start:start + self._chunk_size]
+            )
+        return res.reshape(gx.shape + self._value_shape)
+
+    def _evaluate(self, query):
+        pos = (query - self._origin) / self._spacing
+        cell = np.clip(np.floor(pos).astype(int), 0, self._shape - 2)
+        frac = np.clip(pos - cell, 0.0, 1.0)
+        res = np.zeros((len(query), self._values.shape[1]), dtype=float)
+        for dx in (0, 1):
+            for dy in (0, 1):
+                blend = (
+                    (frac[:, 0] if dx else 1.0 - frac[:, 0]) *
+                    (frac[:, 1] if dy else 1.0 - frac[:, 1])
+                )
+                node = (cell[:, 0] + dx) * self._shape[1] + cell[:, 1] + dy
+                nbr = self._neighbors[node]
+                dist = np.sqrt(
+                    ((query[:, None, :] - self._points[nbr]) ** 2).sum(axis=-1)
+                )
+                res += blend[:, None] * np.einsum(
+                    'gk,gkv->gv', dist, self._weights[node]
+                )
+        return res
+
+
+class LocalKrigingInterpolator(LocalRbfInterpolator):
+    """
+    Neighbor-limited ordinary kriging, i.e. Gaussian process regression with
+    an unknown constant mean, which also estimates its own uncertainty.
+
+    The lattice, neighborhoods, blending and incremental updates are those
+    of :py:class:`~.LocalRbfInterpolator`, but each node solves an ordinary
+    kriging system with the exponential covariance
+    ``exp(-d / length)`` instead of a linear RBF. The inverse of that system
+    gives both the prediction weights and the kriging variance, so with
+    ``uncertainty`` the standard deviation of every prediction is computed
+    in the same pass, from the same neighborhood solves. The variances of
+    the metrics only differ in scale: each is the normalized kriging
+    variance times the variance of its values.
+
+    :param x: X coordinates of the measurements
+    :type x: list
+    :param y: Y coordinates of the measurements
+    :type y: list
+    :param values: measured values, either of shape ``(N,)`` or ``(N, K)``
+      for ``K`` metrics measured at the same ``N`` locations
+    :type values: numpy.ndarray
+    :param neighbors: number of nearest measurements used per lattice node
+    :type neighbors: int
+    :param spacing: lattice node spacing (see
+      :py:class:`~.LocalRbfInterpolator`)
+    :type spacing: float
+    :param length: covariance length, in the same units as x and y.
+      Defaults to the typical distance to the ``neighbors``-th nearest
+      measurement.
+    :type length: float
+    :param uncertainty: if True, return the standard deviations of the
+      predictions after them, i.e. ``2 * K`` columns for ``K`` metrics
+    :type uncertainty: bool
+    :param chunk_size: maximum number of query points evaluated at once
+    :type chunk_size: int
+    """
+
+    def __init__(
+        self, x, y, values, neighbors=32, spacing=None, length=None,
+        uncertainty=False, chunk_size=4096
+    ):
+        self._length = length
+        self._uncertainty = uncertainty
+        super(LocalKrigingInterpolator, self).__init__(
+            x, y, values, neighbors=neighbors, spacing=spacing,
+            chunk_size=chunk_size
+        )
+
+    def _default_length(self):
+        sample = self._points[::max(1, len(self._points) // 1000)]
+        k = min(self._k + 1, len(self._points))
+        dist, _ = self._tree.query(sample, k=k)
+        length = np.median(np.reshape(dist, (len(sample), -1))[:, -1])
+        return length if length > 0 else 1.0
+
+    def _fit(self):
+        if self._length is None:
+            self._length = float(self._default_length())
+        count = int(np.prod(self._shape))
+        # estimated mean of each node's neighborhood
+        self._means = np.empty((count,) + self._values.shape[1:])
+        # inverse of each node's kriging system, for the variances
+        self._inverse = None
+        if self._uncertainty:
+            self._inverse = np.empty((count, self._k + 1, self._k + 1))
+        super(LocalKrigingInterpolator, self)._fit()
+
+    def _solve_nodes(self, nodes, nbr):
+        k = nbr.shape[1]
+        pts = self._points[nbr]
+        system = np.ones((len(nodes), k + 1, k + 1))
+        system[:, :k, :k] = np.exp(-np.sqrt(
+            ((pts[:, :, None, :] - pts[:, None, :, :]) ** 2).sum(axis=-1)
+        ) / self._length)
+        system[:, :k, :k] += KRIGING_NUGGET * np.eye(k)
+        system[:, k, k] = 0
+        inverse = _solve_stack(
+            system, np.broadcast_to(np.eye(k + 1), system.shape)
+        )
+        values = self._values[nbr]
+        self._weights[nodes] = np.matmul(inverse[:, :k, :k], values)
+        self._means[nodes] = np.matmul(inverse[:, k:, :k], values)[:, 0]
+        if self._inverse is not None:
+            self._inverse[nodes] = inverse
+
+    def __call__(self, gx, gy):
+        gx = np.asarray(gx, dtype=float)
+        query = np.column_stack([gx.ravel(), np.asarray(gy, float).ravel()])
+        count = self._values.shape[1]
+        res = np.empty(
+            (len(query), 2 * count if self._uncertainty else count),
+            dtype=float
+        )
+        for start in range(0, len(query), self._chunk_size):
+            res[start:start + self._chunk_size] = self._evaluate(
+                query[start:start + self._chunk_size]
+            )
+        if self._uncertainty:
+            res[:, count:] *= self._values.std(axis=0)
+        shape = self._value_shape
+        if self._uncertainty:
+            shape = (2 * count,)
+        return res.reshape(gx.shape + shape)
+
+    def _evaluate(self, query):
+        """
+        Return the blended predictions at ``query``, followed by the
+        normalized standard deviations if requested.
+        """
+        pos = (query - self._origin) / self._spacing
+        cell = np.clip(np.floor(pos).astype(int), 0, self._shape - 2)
+        frac = np.clip(pos - cell, 0.0, 1.0)
+        res = np.zeros((len(query), self._values.shape[1]), dtype=float)
+        variance = np.zeros(len(query), dtype=float)
+        for dx in (0, 1):
+            for dy in (0, 1):
+                blend = (
+                    (frac[:, 0] if dx else 1.0 - frac[:, 0]) *
+                    (frac[:, 1] if dy else 1.0 - frac[:, 1])
+                )
+                node = (cell[:, 0] + dx) * self._shape[1] + cell[:, 1] + dy
+                nbr = self._neighbors[node]
+                cov = np.exp(-np.sqrt(
+                    ((query[:, None, :] - self._points[nbr]) ** 2).sum(axis=-1)
+                ) / self._length)
+                res += blend[:, None] * (np.einsum(
+                    'gk,gkv->gv', cov, self._weights[node]
+                ) + self._means[node])
+                if self._inverse is None:
+                    continue
+                variance += blend * self._variance(node, cov)
+        if self._inverse is None:
+            return res
+        return np.column_stack([
+            res, np.repeat(
+                np.sqrt(np.maximum(variance, 0.0))[:, None], res.shape[1],
+                axis=1
+            )
+        ])
+
+    def _variance(self, node, cov):
+        """
+        Return the normalized kriging variances ``1 - b' A^-1 b``, with
+        ``b = [cov, 1]``, of queries whose covariances to the neighbors of
+        their lattice nodes ``node`` are ``cov``. Queries are grouped by
+        node, so that each node's inverse is applied in one product rather
+        than copied for every query.
+        """
+        rhs = np.column_stack([cov, np.ones(len(cov))])
+        res = np.empty(len(cov), dtype=float)
+        order = np.argsort(node, kind='stable')
+        nodes, starts = np.unique(node[order], return_index=True)
+        for n, idx in zip(nodes, np.split(order, starts[1:])):
+            part = rhs[idx]
+            res[idx] = 1.0 - (np.dot(part, self._inverse[n]) * part).sum(
+                axis=1
+            )
+        return res
+
+
+class StackedInterpolator(object):
+    """
+    Evaluate several multi-metric interpolators (e.g. fitted to different
+    subsets of the points) as one, concatenating their metric columns.
+
+    :param interpolators: interpolators returning one column per metric
+    :type interpolators: list
+    """
+
+    def __init__(self, interpolators):
+        self.interpolators = interpolators
+
+    def __call__(self, gx, gy):
+        return np.concatenate(
+            [interp(gx, gy) for interp in self.interpolators], axis=-1
+        )
+
+
+class InterpolatedGrid(object):
+    """
+    Interpolated values on a regular grid, kept up to date as measurements
+    are added, moved or removed (e.g. while editing a survey).
+
+    Edits are passed on to the interpolator, which updates its solution
+    without refitting from scratch; with :py:class:`~.LocalRbfInterpolator`
+    only the grid cells near the edited point are evaluated again.
+
+    :param interpolator: :py:class:`~.RbfInterpolator` or
+      :py:class:`~.LocalRbfInterpolator`
+    :param x: grid column coordinates, increasing
+    :type x: numpy.ndarray
+    :param y: grid row coordinates, increasing
+    :type y: numpy.ndarray
+    """
+
+    def __init__(self, interpolator, x, y):
+        self.interpolator = interpolator
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        gx, gy = np.meshgrid(self.x, self.y)
+        #: interpolated values, of shape ``(len(y), len(x))`` plus one
+        #: trailing axis for multiple metrics
+        self.z = interpolator(gx, gy)
+
+    def add_point(self, x, y, value):
+        """
+        Add a measurement.
+
+        :return: tuple of (row slice, column slice) of the updated cells
+        :rtype: tuple
+        """
+        return self._update(self.interpolator.add_point(x, y, value))
+
+    def remove_point(self, index):
+        """
+        Remove the measurement at ``index``.
+
+        :return: tuple of (row slice, column slice) of the updated cells
+        :rtype: tuple
+        """
+        return self._update(self.interpolator.remove_point(index))
+
+    def move_point(self, index, x, y):
+        """
+        Move the measurement at ``index`` to ``(x, y)``.
+
+        :return: tuple of (row slice, column slice) of the updated cells
+        :rtype: tuple
+        """
+        return self._update(self.interpolator.move_point(index, x, y))
+
+    def _update(self, bbox):
+        if bbox is None:
+            rows = slice(0, len(self.y))
+            cols = slice(0, len(self.x))
+        else:
+            cols = slice(
+                np.searchsorted(self.x, bbox[0], side='left'),
+                np.searchsorted(self.x, bbox[2], side='right')
+            )
+            rows = slice(
+                np.searchsorted(self.y, bbox[1], side='left'),
+                np.searchsorted(self.y, bbox[3], side='right')
+            )
+        gx, gy = np.meshgrid(self.x[cols], self.y[rows])
+        if gx.size > 0:
+            self.z[rows, cols] = self.interpolator(gx, gy)
+        return rows, cols
+
+
+def compare_with_exact(x, y, values, gx, gy, approx, max_samples=2000):
+    """
+    Compare approximated grid values against the exact global
+    ``scipy.interpolate.Rbf(function='linear')`` solution.
+
+    Only up to ``max_samples`` evenly spaced grid cells are evaluated with the
+    exact interpolator, but the exact solve itself is still ``O(N^3)``.
+
+    :param approx: approximated values at ``(gx, gy)``
+    :type approx: numpy.ndarray
+    :return: tuple of (max absolute error, RMS error)
+    :rtype: tuple
+    """
+    gx = np.asarray(gx).ravel()
+    gy = np.asarray(gy).ravel()
+    sample = np.unique(
+        np.linspace(0, len(gx) - 1, min(len(gx), max_samples)).astype(int)
+    )
+    from scipy.interpolate import Rbf
+    exact = Rbf(x, y, values, function='linear')(gx[sample], gy[sample])
+    err = np.asarray(approx).ravel()[sample] - exact
+    return float(np.abs(err).max()), float(np.sqrt((err ** 2).mean()))
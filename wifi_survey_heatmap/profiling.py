@@ -0,0 +1,264 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+import time
+import tracemalloc
+from collections import OrderedDict
+
+
+class _Stage(object):
+    """A running :py:meth:`~.Profiler.stage`."""
+
+    __slots__ = ('profiler', 'name', 'metric', 'path', 'wall', 'cpu', 'base',
+                 'peak')
+
+    def __init__(self, profiler, name, metric):
+        self.profiler = profiler
+        self.name = name
+        self.metric = metric
+
+    def __enter__(self):
+        self.profiler._enter(self)
+        return self
+
+    def __exit__(self, *args):
+        self.profiler._exit(self)
+        return False
+
+
+class Profiler(object):
+    """
+    Record the wall time, CPU time and (with ``memory``) peak memory, as
+    traced by :py:mod:`tracemalloc`, of named stages:
+
+    .. code-block:: python
+
+        with profiler.stage('plot', metric='signal_quality'):
+            with profiler.stage('savefig'):
+                ...
+
+    Nested stages are recorded under the path of their parent (e.g.
+    ``plot/savefig``) and inherit its metric. Stages run several times with
+    the same path and metric add up their times and keep their highest peak.
+    Peaks are measured from the memory allocated when the stage started.
+
+    :param memory: whether to trace memory; tracing slows down code that
+      allocates many Python objects
+    :type memory: bool
+    """
+
+    enabled = True
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        #: dict of (stage path, metric) to dict of ``calls``, ``wall`` and
+        #: ``cpu`` seconds and ``peak_mb``, in the order stages first ran
+        self.records = OrderedDict()
+        self._stack = []
+
+    def stage(self, name, metric=None):
+        """
+        Return a context manager recording the stage ``name``.
+
+        :param name: stage name
+        :type name: str
+        :param metric: name of the metric the stage works on, if any
+        :type metric: str
+        """
+        return _Stage(self, name, metric)
+
+    def _enter(self, stage):
+        parent = self._stack[-1] if len(self._stack) > 0 else None
+        stage.path = stage.name
+        if parent is not None:
+            stage.path = parent.path + '/' + stage.name
+            if stage.metric is None:
+                stage.metric = parent.metric
+        # added now, so that parents are listed before their children
+        if (stage.path, stage.metric) not in self.records:
+            self.records[(stage.path, stage.metric)] = {
+                'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak_mb': 0.0
+            }
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent.peak = max(parent.peak, peak)
+            # each stage measures its own peak; parents keep the highest
+            # peak of their children (see _exit)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            stage.base = stage.peak = current
+        self._stack.append(stage)
+        stage.cpu = time.process_time()
+        stage.wall = time.perf_counter()
+
+    def _exit(self, stage):
+        wall = time.perf_counter() - stage.wall
+        cpu = time.process_time() - stage.cpu
+        self._stack.pop()
+        rec = self.records[(stage.path, stage.metric)]
+        rec['calls'] += 1
+        rec['wall'] += wall
+        rec['cpu'] += cpu
+        if self.memory and tracemalloc.is_tracing():
+            peak = max(stage.peak, tracemalloc.get_traced_memory()[1])
+            rec['peak_mb'] = max(
+                rec['peak_mb'], (peak - stage.base) / 1024.0 ** 2
+            )
+            if len(self._stack) > 0:
+                self._stack[-1].peak = max(self._stack[-1].peak, peak)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+
+    def merge(self, records):
+        """
+        Add records of another profiler (e.g. of a worker process, see
+        :py:meth:`~.take`) to this one.
+
+        :param records: records, as in :py:attr:`~.records`
+        :type records: dict
+        """
+        for key, other in records.items():
+            rec = self.records.get(key)
+            if rec is None:
+                self.records[key] = dict(other)
+                continue
+            rec['calls'] += other['calls']
+            rec['wall'] += other['wall']
+            rec['cpu'] += other['cpu']
+            rec['peak_mb'] = max(rec['peak_mb'], other['peak_mb'])
+
+    def take(self):
+        """
+        Return the records so far and start over with none.
+
+        :rtype: collections.OrderedDict
+        """
+        records = self.records
+        self.records = OrderedDict()
+        return records
+
+    def format_table(self):
+        """
+        Return the records as a text table, with nested stages indented
+        below their parents.
+
+        :rtype: str
+        """
+        rows = [
+            ('  ' * path.count('/') + path.rsplit('/', 1)[-1], metric or '',
+             rec) for (path, metric), rec in self.records.items()
+        ]
+        width = max([len(r[0]) for r in rows] + [5])
+        mwidth = max([len(r[1]) for r in rows] + [6])
+        lines = ['%-*s  %-*s  %5s  %9s  %9s  %10s' % (
+            width, 'Stage', mwidth, 'Metric', 'Calls', 'Wall [s]', 'CPU [s]',
+            'Peak [MB]'
+        )]
+        for name, metric, rec in rows:
+            lines.append('%-*s  %-*s  %5d  %9.3f  %9.3f  %10s' % (
+                width, name, mwidth, metric, rec['calls'], rec['wall'],
+                rec['cpu'], '%.1f' % rec['peak_mb'] if self.memory else '-'
+            ))
+        return '\n'.join(lines)
+
+    def to_list(self):
+        """
+        Return the records as a list of dicts with ``stage`` (path),
+        ``metric``, ``calls``, ``wall``, ``cpu`` and ``peak_mb`` keys.
+
+        :rtype: list
+        """
+        return [
+            dict(stage=path, metric=metric, **rec)
+            for (path, metric), rec in self.records.items()
+        ]
+
+    def write_json(self, path):
+        """
+        Write the records (see :py:meth:`~.to_list`) to a JSON report.
+
+        :param path: report file path
+        :type path: str
+        """
+        with open(path, 'w') as fh:
+            json.dump({
+                'memory': self.memory, 'stages': self.to_list()
+            }, fh, indent=2)
+
+
+class _NullStage(object):
+    """A stage that records nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class NullProfiler(object):
+    """
+    A profiler that records nothing, used when profiling is disabled; its
+    stages cost one method call.
+    """
+
+    enabled = False
+    memory = False
+
+    _stage = _NullStage()
+
+    def __init__(self):
+        self.records = OrderedDict()
+
+    def stage(self, name, metric=None):
+        return self._stage
+
+    def merge(self, records):
+        pass
+
+    def take(self):
+        return OrderedDict()
+
+
+#: shared profiler of everything not being profiled
+NULL_PROFILER = NullProfiler()
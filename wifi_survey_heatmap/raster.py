@@ -0,0 +1,352 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import logging
+import struct
+import threading
+import zlib
+from queue import Queue
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+#: PNG file signature
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def colormap_lut(cmap, size=256):
+    """
+    Precompute a lookup table for a matplotlib colormap.
+
+    :param cmap: matplotlib colormap
+    :type cmap: matplotlib.colors.Colormap
+    :param size: number of LUT entries
+    :type size: int
+    :return: uint8 array of shape ``(size, 4)`` holding RGBA colors
+    :rtype: numpy.ndarray
+    """
+    colors = cmap(np.linspace(0.0, 1.0, size))
+    return np.round(np.asarray(colors) * 255).astype(np.uint8)
+
+
+def _to_rgba8(img):
+    """Convert a band of an image as read by ``imread`` to uint8 RGBA."""
+    img = np.asarray(img)
+    if img.dtype != np.uint8:
+        img = np.round(np.clip(img, 0.0, 1.0) * 255).astype(np.uint8)
+    if img.ndim == 2:
+        img = np.repeat(img[:, :, None], 3, axis=2)
+    if img.shape[2] == 3:
+        img = np.concatenate(
+            [img, np.full(img.shape[:2] + (1,), 255, dtype=np.uint8)], axis=2
+        )
+    return img
+
+
+def _axis_weights(pixels, size, length):
+    """
+    Return the indices of the lower grid sample and the interpolation weight
+    of the upper one, for the given output pixels along an axis of a grid
+    with ``size`` samples spanning ``length`` pixels.
+    """
+    pos = np.asarray(pixels, dtype=float) * (size - 1) / max(length, 1)
+    lower = np.clip(np.floor(pos).astype(int), 0, max(size - 2, 0))
+    frac = np.clip(pos - lower, 0.0, 1.0)
+    if size < 2:
+        frac[:] = 0.0
+    return lower, frac
+
+
+def upsample(z, rows, cols, width, height, col_weights=None, nearest=False):
+    """
+    Bilinearly upsample (part of) a grid to image pixels.
+
+    :param z: grid of shape ``(num_y, num_x)`` whose samples are evenly spread
+      over ``[0, width] x [0, height]`` image pixels
+    :type z: numpy.ndarray
+    :param rows: image row positions to produce
+    :type rows: numpy.ndarray
+    :param cols: image column positions to produce
+    :type cols: numpy.ndarray
+    :param col_weights: precomputed column weights, to reuse across bands
+    :param nearest: use the nearest grid sample instead of interpolating,
+      e.g. for categorical grids
+    :type nearest: bool
+    :return: float array of shape ``(len(rows), len(cols))``
+    :rtype: numpy.ndarray
+    """
+    num_y, num_x = z.shape
+    ylow, yfrac = _axis_weights(rows, num_y, height)
+    if col_weights is None:
+        col_weights = _axis_weights(cols, num_x, width)
+    xlow, xfrac = col_weights
+    if nearest:
+        xfrac = np.round(xfrac)
+        yfrac = np.round(yfrac)
+    yhigh = np.minimum(ylow + 1, num_y - 1)
+    xhigh = np.minimum(xlow + 1, num_x - 1)
+    top = z[ylow][:, xlow] * (1 - xfrac) + z[ylow][:, xhigh] * xfrac
+    bottom = z[yhigh][:, xlow] * (1 - xfrac) + z[yhigh][:, xhigh] * xfrac
+    return top * (1 - yfrac[:, None]) + bottom * yfrac[:, None]
+
+
+def halve(img):
+    """
+    Downscale an image by a factor of two with a 2x2 box filter; odd sizes
+    are padded by repeating the last row / column.
+
+    :param img: image as read by ``imread``
+    :type img: numpy.ndarray
+    :return: uint8 RGBA image
+    :rtype: numpy.ndarray
+    """
+    img = _to_rgba8(img).astype(np.uint16)
+    if img.shape[0] % 2:
+        img = np.concatenate([img, img[-1:]], axis=0)
+    if img.shape[1] % 2:
+        img = np.concatenate([img, img[:, -1:]], axis=1)
+    res = img[0::2, 0::2] + img[1::2, 0::2] + img[0::2, 1::2] + img[1::2, 1::2]
+    return ((res + 2) // 4).astype(np.uint8)
+
+
+def composite(values, floorplan, lut, vmin, vmax, alpha):
+    """
+    Colormap ``values`` through ``lut`` and alpha-composite the colors over
+    the floorplan. NaN values are left fully transparent.
+
+    :param values: float array of shape ``(rows, cols)``
+    :param floorplan: uint8 RGBA array of shape ``(rows, cols, 4)``
+    :return: uint8 RGBA array of shape ``(rows, cols, 4)``
+    :rtype: numpy.ndarray
+    """
+    span = float(vmax - vmin)
+    if span > 0:
+        norm = (values - vmin) / span
+    else:
+        norm = np.zeros(values.shape, dtype=float)
+    valid = np.isfinite(norm)
+    idx = np.round(
+        np.clip(np.where(valid, norm, 0.0), 0.0, 1.0) * (len(lut) - 1)
+    ).astype(np.intp)
+    color = lut[idx].astype(np.float32) / 255
+    top_a = color[..., 3] * alpha * valid
+    base = floorplan.astype(np.float32) / 255
+    base_a = base[..., 3]
+    out_a = top_a + base_a * (1 - top_a)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rgb = (
+            color[..., :3] * top_a[..., None] +
+            base[..., :3] * (base_a * (1 - top_a))[..., None]
+        ) / out_a[..., None]
+    out = np.empty(floorplan.shape[:2] + (4,), dtype=np.uint8)
+    out[..., :3] = np.round(np.nan_to_num(rgb) * 255)
+    out[..., 3] = np.round(out_a * 255)
+    return out
+
+
+def _png_chunk(kind, data):
+    return (
+        struct.pack('>I', len(data)) + kind + data +
+        struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    )
+
+
+def _filter_sub(band):
+    """
+    Apply the PNG "Sub" filter to a band of RGBA rows and prefix each row with
+    its filter type byte.
+    """
+    rows = band.reshape(band.shape[0], -1)
+    res = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+    res[:, 0] = 1
+    res[:, 1:5] = rows[:, :4]
+    res[:, 5:] = rows[:, 4:] - rows[:, :-4]
+    return res.tobytes()
+
+
+class PngWriter(object):
+    """
+    Streaming RGBA PNG encoder; image bands are compressed and written as
+    they are passed to :py:meth:`~.write`, optionally on a separate encoder
+    thread (zlib releases the GIL while compressing).
+
+    :param fname: output file path, or a writable binary file object (which
+      is left open)
+    :type fname: str
+    :param width: image width in pixels
+    :type width: int
+    :param height: image height in pixels
+    :type height: int
+    :param compression: zlib compression level, 0-9
+    :type compression: int
+    :param threaded: whether to encode on a separate thread
+    :type threaded: bool
+    """
+
+    def __init__(self, fname, width, height, compression=6, threaded=False):
+        self._close = not hasattr(fname, 'write')
+        self._fh = open(fname, 'wb') if self._close else fname
+        self._compressor = zlib.compressobj(compression)
+        self._fh.write(PNG_SIGNATURE)
+        self._fh.write(_png_chunk(
+            b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+        ))
+        self._queue = None
+        self._thread = None
+        self._error = None
+        if threaded:
+            self._queue = Queue(maxsize=4)
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            band = self._queue.get()
+            if band is None:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self._encode(band)
+            except Exception as ex:
+                self._error = ex
+
+    def _encode(self, band):
+        data = self._compressor.compress(_filter_sub(band))
+        if data:
+            self._fh.write(_png_chunk(b'IDAT', data))
+
+    def write(self, band):
+        """
+        Add rows to the image.
+
+        :param band: uint8 RGBA array of shape ``(rows, width, 4)``
+        :type band: numpy.ndarray
+        """
+        if self._queue is None:
+            self._encode(band)
+        else:
+            self._queue.put(band)
+
+    def close(self):
+        """Flush all rows and finish the PNG file."""
+        try:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                if self._error is not None:
+                    raise self._error
+            self._fh.write(_png_chunk(b'IDAT', self._compressor.flush()))
+            self._fh.write(_png_chunk(b'IEND', b''))
+        finally:
+            if self._close:
+                self._fh.close()
+
+
+class RasterRenderer(object):
+    """
+    Renders heatmaps directly on arrays, as a much faster alternative to the
+    annotated matplotlib figures: the interpolated grid is bilinearly
+    upsampled to the floorplan size, colormapped through a precomputed LUT and
+    alpha-composited over the floorplan, one band of rows at a time, while
+    the PNG is being encoded.
+
+    :param cmap: matplotlib colormap
+    :type cmap: matplotlib.colors.Colormap
+    :param alpha: opacity of the heatmap layer over the floorplan
+    :type alpha: float
+    :param compression: zlib compression level of the PNG, 0-9
+    :type compression: int
+    :param encoder_thread: whether to encode PNGs on a separate thread
+    :type encoder_thread: bool
+    :param band_height: number of image rows processed at once
+    :type band_height: int
+    """
+
+    def __init__(
+        self, cmap, alpha=0.5, compression=6, encoder_thread=False,
+        band_height=256
+    ):
+        self._lut = colormap_lut(cmap)
+        self._alpha = alpha
+        self._compression = compression
+        self._encoder_thread = encoder_thread
+        self._band_height = band_height
+
+    def render(self, fname, z, floorplan, vmin, vmax, width, height,
+               cmap=None, nearest=False):
+        """
+        Write the heatmap of grid ``z`` over ``floorplan`` to ``fname``.
+
+        :param fname: output PNG file path, or a writable binary file object
+        :type fname: str
+        :param z: interpolated grid of shape ``(num_y, num_x)``, spread over
+          ``[0, width] x [0, height]`` floorplan pixels
+        :type z: numpy.ndarray
+        :param floorplan: floorplan image as read by ``imread``
+        :type floorplan: numpy.ndarray
+        :param vmin: value mapped to the lowest color
+        :type vmin: float
+        :param vmax: value mapped to the highest color
+        :type vmax: float
+        :param cmap: colormap to use instead of the renderer's own
+        :type cmap: matplotlib.colors.Colormap
+        :param nearest: whether to upsample ``z`` with nearest-neighbor
+          instead of bilinear interpolation
+        :type nearest: bool
+        """
+        lut = self._lut if cmap is None else colormap_lut(cmap)
+        rows, cols = floorplan.shape[:2]
+        col_weights = _axis_weights(np.arange(cols), z.shape[1], width)
+        writer = PngWriter(
+            fname, cols, rows, compression=self._compression,
+            threaded=self._encoder_thread
+        )
+        try:
+            for start in range(0, rows, self._band_height):
+                band = np.arange(start, min(start + self._band_height, rows))
+                values = upsample(
+                    z, band, None, width, height, col_weights, nearest
+                )
+                writer.write(composite(
+                    values, _to_rgba8(floorplan[start:band[-1] + 1]),
+                    lut, vmin, vmax, self._alpha
+                ))
+        finally:
+            writer.close()
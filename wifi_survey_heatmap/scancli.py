@@ -41,8 +41,6 @@ import argparse
 import logging
 import os
 
-from wifi_survey_heatmap.collector import Collector
-
 FORMAT = "[%(asctime)s %(levelname)s] %(message)s"
 logging.basicConfig(level=logging.WARNING, format=FORMAT)
 logger = logging.getLogger()
@@ -53,6 +51,8 @@ class CliWrapper(object):
     def run(self, ifname, server):
         if os.geteuid() != 0:
             raise RuntimeError('ERROR: This script must be run as root/sudo.')
+        # imported here, as importing libnl and iperf3 is slow
+        from wifi_survey_heatmap.collector import Collector
         c = Collector(ifname, server)
         print(c.run())
 
@@ -0,0 +1,605 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import numpy as np
+
+from wifi_survey_heatmap.floorplan import FloorplanCache
+from wifi_survey_heatmap.heatmap import (
+    DEFAULT_GEOJSON_CONTOURS, INTERPOLATION_METHODS, HeatMapGenerator,
+    set_log_debug, set_log_info
+)
+from wifi_survey_heatmap.version import VERSION
+
+logger = logging.getLogger(__name__)
+
+
+def _nbytes(*items):
+    """
+    Return the total size of the NumPy arrays in ``items``, looking into
+    dicts, lists and tuples; anything else counts as zero bytes.
+    """
+    total = 0
+    for item in items:
+        if isinstance(item, np.ndarray):
+            total += item.nbytes
+        elif isinstance(item, dict):
+            total += _nbytes(*item.values())
+        elif isinstance(item, (list, tuple)):
+            total += _nbytes(*item)
+    return total
+
+
+class LRUCache(object):
+    """
+    Thread-safe in-memory cache, bounded by the total size of its values.
+
+    Values are created on demand by :py:meth:`~.get`; concurrent requests
+    for the same missing key wait for a single call of the factory instead
+    of each creating the value. The least recently used values are evicted
+    once the total size exceeds ``max_size``; a value larger than that on
+    its own is returned but not kept.
+
+    :param max_size: maximum total size of the cached values, in bytes
+    :type max_size: int
+    :param sizeof: function returning the size of a value, in bytes
+    :type sizeof: callable
+    """
+
+    def __init__(self, max_size, sizeof=_nbytes):
+        self.max_size = max_size
+        self._sizeof = sizeof
+        self._items = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def _lookup(self, key):
+        """Return the (hit, value) of ``key``; the lock must be held."""
+        if key not in self._items:
+            return False, None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return True, self._items[key][0]
+
+    def get(self, key, factory):
+        """
+        Return the value of ``key``, calling ``factory()`` to create it if
+        it isn't cached.
+
+        :param key: hashable cache key
+        :param factory: function returning the value of ``key``
+        :type factory: callable
+        """
+        with self._lock:
+            hit, value = self._lookup(key)
+            if hit:
+                return value
+            pending = self._pending.setdefault(key, threading.Lock())
+        with pending:
+            with self._lock:
+                hit, value = self._lookup(key)
+                if hit:
+                    return value
+                self.misses += 1
+            try:
+                value = factory()
+                self._put(key, value)
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+        return value
+
+    def _put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._items:
+                self.size -= self._items.pop(key)[1]
+            if size > self.max_size:
+                logger.debug('Not caching %s: %d bytes', key, size)
+                return
+            self._items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                evicted, (_, evicted_size) = self._items.popitem(last=False)
+                self.size -= evicted_size
+                logger.debug('Evicted %s from cache', evicted)
+
+    def clear(self):
+        """Remove all cached values."""
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def status(self):
+        """
+        Return the number of entries, size and hit statistics of the cache.
+
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'entries': len(self._items), 'size': self.size,
+                'max_size': self.max_size, 'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+class HeatmapService(object):
+    """
+    Renders heatmap PNGs of the surveys in the current directory on request,
+    keeping loaded surveys, decoded floorplans, interpolated grids and
+    rendered images in memory-bounded :py:class:`~.LRUCache` caches.
+
+    Each survey gets a :py:class:`~wifi_survey_heatmap.heatmap.HeatMapGenerator`
+    (which also reads and writes the on-disk grid cache), and all of its
+    metrics are interpolated together the first time any of them is
+    requested. Surveys and floorplans are keyed by their path, size and
+    modification time, so files changed on disk are reloaded. Images are
+    rendered by the "raster" backend.
+
+    :param cname: name of the default colormap
+    :type cname: str
+    :param cache_sizes: dict of cache name (``surveys``, ``floorplans``,
+      ``grids`` or ``images``) to its maximum size in bytes
+    :type cache_sizes: dict
+    :param compression: PNG compression level, 0-9
+    :type compression: int
+    :param kwargs: other keyword arguments of every
+      :py:class:`~wifi_survey_heatmap.heatmap.HeatMapGenerator`
+    """
+
+    #: default maximum size of each cache, in bytes
+    CACHE_SIZES = {
+        'surveys': 256 * 1024 ** 2,
+        'floorplans': 512 * 1024 ** 2,
+        'grids': 256 * 1024 ** 2,
+        'images': 128 * 1024 ** 2,
+    }
+
+    def __init__(self, cname='RdYlBu_r', cache_sizes={}, compression=6,
+                 **kwargs):
+        self._cname = cname
+        self._kwargs = dict(kwargs, compression=compression)
+        sizes = dict(self.CACHE_SIZES)
+        sizes.update(cache_sizes)
+        self.surveys = LRUCache(
+            sizes['surveys'], lambda value: _nbytes(
+                value[1].x, value[1].y, value[1].values, value[1].valid
+            )
+        )
+        self.floorplans = LRUCache(
+            sizes['floorplans'], lambda value: _nbytes(value.levels)
+        )
+        self.grids = LRUCache(sizes['grids'])
+        self.images = LRUCache(sizes['images'], len)
+
+    @staticmethod
+    def _file_key(path):
+        """
+        Return the cache key of a file in (or below) the current directory.
+
+        :raises LookupError: if there is no such file
+        """
+        real = os.path.realpath(path)
+        root = os.path.realpath(os.getcwd())
+        if os.path.commonpath([real, root]) != root:
+            raise LookupError('Not in the served directory: %s' % path)
+        try:
+            st = os.stat(real)
+        except OSError:
+            raise LookupError('No such file: %s' % path)
+        return real, st.st_size, st.st_mtime_ns
+
+    def _survey(self, title):
+        """
+        Return the (generator, survey data) of survey ``title``.
+        """
+        if not title.endswith('.json'):
+            title += '.json'
+        key = self._file_key(title)
+        return key, self.surveys.get(key, lambda: self._load_survey(title))
+
+    def _load_survey(self, title):
+        try:
+            gen = HeatMapGenerator(
+                None, title, False, self._cname, None, backend='raster',
+                **self._kwargs
+            )
+        except SystemExit:
+            raise LookupError('Unable to load survey: %s' % title)
+        fkey = self._file_key(gen.image_path)
+        floorplan = self.floorplans.get(
+            fkey, lambda: FloorplanCache().get(gen.image_path)
+        )
+        return gen, gen._prepare(floorplan)
+
+    def _interpolate(self, gen, a):
+        """
+        Return a dict of metric name to (grid, num_x, num_y) for every
+        metric of a survey.
+        """
+        return {
+            key: (z, num_x, num_y)
+            for key, _, z, num_x, num_y, _ in gen._render_tasks(a)
+            if z is not None
+        }
+
+    def _thresholds(self, path):
+        """Return the contents of thresholds JSON file ``path``."""
+        key = self._file_key(path)
+        with open(key[0], 'r') as fh:
+            return json.load(fh)
+
+    def render(self, title, metric, cmap=None, vmin=None, vmax=None,
+               thresholds=None, width=None):
+        """
+        Return the heatmap of ``metric`` of survey ``title`` as PNG data.
+
+        :param title: survey title or JSON file path
+        :type title: str
+        :param metric: metric name, as in the ``wifi-heatmap`` file names
+        :type metric: str
+        :param cmap: colormap name; defaults to that of the service
+        :type cmap: str
+        :param vmin: value mapped to the lowest color; defaults to the
+          thresholds, or the lowest value of the metric
+        :type vmin: float
+        :param vmax: value mapped to the highest color; defaults to the
+          thresholds, or the highest value of the metric
+        :type vmax: float
+        :param thresholds: path of a thresholds JSON file (see
+          ``wifi-heatmap-thresholds``) to take ``vmin`` and ``vmax`` from
+        :type thresholds: str
+        :param width: render on the smallest downscaled level of the
+          floorplan that is at least this many pixels wide
+        :type width: int
+        :rtype: bytes
+        :raises LookupError: if the survey, its floorplan or the metric
+          cannot be found
+        :raises ValueError: if the colormap or thresholds are invalid
+        """
+        key, (gen, a) = self._survey(title)
+        grids = self.grids.get(key, lambda: self._interpolate(gen, a))
+        if metric not in grids:
+            raise LookupError('No %s heatmap of %s' % (metric, title))
+        low, high = gen._value_range(a, metric)
+        if thresholds is not None:
+            limits = self._thresholds(thresholds).get(metric, {})
+            low = limits.get('min', low)
+            high = limits.get('max', high)
+        low = float(low if vmin is None else vmin)
+        high = float(high if vmax is None else vmax)
+        return self.images.get(
+            (key, metric, cmap, low, high, width),
+            lambda: self._render(gen, metric, grids[metric], cmap, low, high,
+                                 width)
+        )
+
+    def contours(self, title, metric, count=DEFAULT_GEOJSON_CONTOURS):
+        """
+        Return the contour lines and areas of about ``count`` levels of the
+        heatmap of ``metric`` of survey ``title``, as GeoJSON data in
+        floorplan pixel coordinates (see
+        :py:meth:`~wifi_survey_heatmap.contours.ContourSet.to_geojson`).
+
+        :param title: survey title or JSON file path
+        :type title: str
+        :param metric: metric name, as in the ``wifi-heatmap`` file names
+        :type metric: str
+        :param count: number of contour levels
+        :type count: int
+        :rtype: bytes
+        :raises LookupError: if the survey, its floorplan or the metric
+          cannot be found
+        :raises ValueError: if ``count`` is not positive
+        """
+        if count < 1:
+            raise ValueError('Number of contours must be positive')
+        key, (gen, a) = self._survey(title)
+        grids = self.grids.get(key, lambda: self._interpolate(gen, a))
+        if metric not in grids or metric == 'best_server':
+            raise LookupError('No %s contours of %s' % (metric, title))
+
+        def geojson():
+            contours = gen._contour_set(*(grids[metric] + (count,)))
+            return json.dumps(
+                gen._contour_geojson(metric, contours)
+            ).encode()
+
+        return self.images.get((key, metric, 'geojson', count), geojson)
+
+    def _render(self, gen, metric, grid, cname, vmin, vmax, width):
+        z, num_x, num_y = grid
+        z = np.asarray(z).reshape((num_y, num_x))
+        floorplan = gen._floorplan
+        level = floorplan.levels[0]
+        if width is not None:
+            level = floorplan.level_for(width, 0)
+        scale = level.shape[1] / float(floorplan.width)
+        categorical = metric == 'best_server'
+        cmap = None
+        if categorical:
+            cmap = gen._best_server_cmap()
+        elif cname is not None:
+            cmap = gen.get_cmap(cname)
+        buf = io.BytesIO()
+        gen._raster.render(
+            buf, z, level, vmin, vmax, gen._image_width * scale,
+            gen._image_height * scale, cmap=cmap, nearest=categorical
+        )
+        return buf.getvalue()
+
+    def status(self):
+        """
+        Return the status of each cache (see :py:meth:`~.LRUCache.status`).
+
+        :rtype: dict
+        """
+        return {
+            name: getattr(self, name).status()
+            for name in ('surveys', 'floorplans', 'grids', 'images')
+        }
+
+
+class HeatmapRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serves ``GET /<title>/<metric>.png`` with the query parameters ``cmap``,
+    ``min``, ``max``, ``thresholds`` and ``width`` of
+    :py:meth:`~.HeatmapService.render`, ``GET /<title>/<metric>.geojson``
+    with the ``contours`` query parameter (number of levels) of
+    :py:meth:`~.HeatmapService.contours`, and ``GET /status`` with the cache
+    statistics as JSON.
+    """
+
+    server_version = 'wifi-heatmap/' + VERSION
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = unquote(url.path).strip('/')
+        if path == 'status':
+            self._send(200, 'application/json', json.dumps(
+                self.server.service.status()
+            ).encode())
+            return
+        title, _, fname = path.rpartition('/')
+        metric, _, ext = fname.rpartition('.')
+        if not title or ext not in ('png', 'geojson'):
+            self._send_error(404, 'Not found: %s' % url.path)
+            return
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            if ext == 'geojson':
+                content_type = 'application/geo+json'
+                data = self.server.service.contours(title, metric, int(
+                    params.get('contours', DEFAULT_GEOJSON_CONTOURS)
+                ))
+            else:
+                content_type = 'image/png'
+                data = self._render(title, metric, params)
+        except LookupError as ex:
+            self._send_error(404, str(ex))
+            return
+        except ValueError as ex:
+            self._send_error(400, str(ex))
+            return
+        except Exception as ex:
+            logger.exception('Error rendering %s', self.path)
+            self._send_error(500, str(ex))
+            return
+        self._send(200, content_type, data)
+
+    def _render(self, title, metric, params):
+        """Render a heatmap PNG with the given query parameters."""
+        kwargs = {
+            'cmap': params.get('cmap'),
+            'thresholds': params.get('thresholds'),
+        }
+        for name, param, cast in [
+            ('vmin', 'min', float), ('vmax', 'max', float),
+            ('width', 'width', int)
+        ]:
+            if param in params:
+                kwargs[name] = cast(params[param])
+        return self.server.service.render(title, metric, **kwargs)
+
+    def _send(self, code, content_type, data):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, code, message):
+        self._send(code, 'text/plain; charset=utf-8', message.encode())
+
+    def log_message(self, format, *args):
+        logger.info('%s - %s', self.address_string(), format % args)
+
+
+class HeatmapServer(HTTPServer):
+    """
+    HTTP server handling requests on a pool of ``jobs`` threads, which share
+    the caches of one :py:class:`~.HeatmapService`. Interpolation, rendering
+    and PNG compression mostly run in NumPy, SciPy and zlib code that
+    releases the GIL.
+
+    :param address: ``(host, port)`` to listen on
+    :type address: tuple
+    :param service: service rendering the heatmaps
+    :type service: HeatmapService
+    :param jobs: number of worker threads
+    :type jobs: int
+    """
+
+    def __init__(self, address, service, jobs=4):
+        HTTPServer.__init__(self, address, HeatmapRequestHandler)
+        self.service = service
+        self._pool = ThreadPoolExecutor(jobs)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        HTTPServer.server_close(self)
+        self._pool.shutdown(wait=True)
+
+
+def parse_args(argv):
+    """
+    parse arguments/options
+
+    this uses the new argparse module instead of optparse
+    see: <https://docs.python.org/2/library/argparse.html>
+    """
+    p = argparse.ArgumentParser(
+        prog='wifi-heatmap serve',
+        description='wifi survey heatmap render server; serves '
+                    'GET /<title>/<metric>.png for the surveys in the '
+                    'current directory'
+    )
+    p.add_argument('-v', '--verbose', dest='verbose', action='count', default=0,
+                   help='verbose output. specify twice for debug-level output.')
+    p.add_argument('-H', '--host', dest='host', action='store',
+                   default='127.0.0.1', help='Address to listen on')
+    p.add_argument('-P', '--port', dest='port', action='store', type=int,
+                   default=8080, help='Port to listen on')
+    p.add_argument('-j', '--jobs', dest='jobs', action='store', type=int,
+                   default=4, help='Number of worker threads')
+    p.add_argument('-i', '--ignore', dest='ignore', action='append',
+                   default=[], help='SSIDs to ignore from BSS maps')
+    p.add_argument('-t', '--thresholds', dest='thresholds', action='store',
+                   type=str, help='default thresholds JSON file path')
+    p.add_argument('-a', '--ap-names', type=str, dest='aps', action='store',
+                   default=None,
+                   help='JSON file mapping AP MAC/BSSID to AP name')
+    p.add_argument('-c', '--cmap', type=str, dest='CNAME', action='store',
+                   default="RdYlBu_r",
+                   help='Default matplotlib colormap name')
+    p.add_argument('-m', '--method', dest='method', action='store',
+                   choices=INTERPOLATION_METHODS, default='rbf',
+                   help='Interpolation method (see wifi-heatmap --help)')
+    p.add_argument('-k', '--neighbors', dest='neighbors', action='store',
+                   type=int, default=32,
+                   help='Number of nearest measurements used by the "local" '
+                        'and "kriging" interpolation methods')
+    p.add_argument('--png-compression', dest='compression', action='store',
+                   type=int, choices=range(10), default=6,
+                   help='PNG compression level')
+    p.add_argument('--no-cache', dest='cache', action='store_false',
+                   default=True,
+                   help='Do not read or write the on-disk grid cache')
+    p.add_argument('--bss-maps', dest='bss_maps', action='store_true',
+                   default=False,
+                   help='Also serve per-BSSID signal, best server and '
+                        'overlap maps (see wifi-heatmap --help)')
+    p.add_argument('--overlap-threshold', dest='overlap_threshold',
+                   action='store', type=float, default=-67.0,
+                   help='Signal (dBm) above which a BSSID counts towards '
+                        'the overlap map of --bss-maps')
+    p.add_argument('--footprint', dest='footprint', action='store',
+                   nargs='?', const='auto', default=None, metavar='MASK',
+                   help='Only interpolate inside the building footprint '
+                        '(see wifi-heatmap --help)')
+    for name in sorted(HeatmapService.CACHE_SIZES):
+        p.add_argument(
+            '--%s-cache-size' % name, dest='%s_cache_size' % name,
+            action='store', type=float,
+            default=HeatmapService.CACHE_SIZES[name] / 1024 ** 2,
+            help='Maximum size of the in-memory %s cache, in MB' % name
+        )
+    return p.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+
+    # set logging level
+    if args.verbose > 1:
+        set_log_debug()
+    elif args.verbose == 1:
+        set_log_info()
+
+    service = HeatmapService(
+        args.CNAME, compression=args.compression,
+        cache_sizes={
+            name: int(getattr(args, '%s_cache_size' % name) * 1024 ** 2)
+            for name in HeatmapService.CACHE_SIZES
+        },
+        ignore_ssids=args.ignore, aps=args.aps, thresholds=args.thresholds,
+        method=args.method, neighbors=args.neighbors, cache=args.cache,
+        bss_maps=args.bss_maps, overlap_threshold=args.overlap_threshold,
+        footprint=args.footprint
+    )
+    server = HeatmapServer((args.host, args.port), service, jobs=args.jobs)
+    logger.warning(
+        'Serving heatmaps of %s on http://%s:%d/', os.getcwd(),
+        *server.server_address[:2]
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,217 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+import logging
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from wifi_survey_heatmap.survey import METRICS, SurveyFile, SurveyMetrics
+
+logger = logging.getLogger(__name__)
+
+#: bump whenever the sidecar layout or its contents change
+SIDECAR_VERSION = 1
+
+MAGIC = b'WSHMTRCS'
+
+#: fixed-size preamble: magic, version and length of the JSON header
+_PREAMBLE = struct.Struct('<8sII')
+
+#: alignment of each array in the file, so that they can be viewed in place
+_ALIGN = 64
+
+
+def _align(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def sidecar_path(json_path):
+    """
+    Return the path of the metrics sidecar of survey file ``json_path``,
+    i.e. ``TITLE.metrics`` next to ``TITLE.json``.
+    """
+    if json_path.endswith('.json'):
+        json_path = json_path[:-5]
+    return json_path + '.metrics'
+
+
+def _arrays(metrics):
+    """Return a list of (name, array) of everything in ``metrics``."""
+    arrays = [
+        ('x', metrics.x), ('y', metrics.y),
+        ('ssid_index', metrics.ssid_index), ('scanned', metrics.scanned),
+        ('scan_signal', metrics.scan_signal)
+    ]
+    for name, _, _, _ in METRICS:
+        arrays.append(('value/' + name, metrics.values[name]))
+        arrays.append(('valid/' + name, metrics.valid[name]))
+    return arrays
+
+
+def write_sidecar(json_path, metrics, stat=None):
+    """
+    Write the metrics sidecar of survey file ``json_path``, atomically.
+
+    The sidecar is a small fixed preamble and JSON header, followed by each
+    array of ``metrics`` as raw little-endian data, aligned so that readers
+    can memory-map them without copying.
+
+    :param json_path: path to the survey JSON file
+    :type json_path: str
+    :param metrics: flattened measurements of the survey file
+    :type metrics: wifi_survey_heatmap.survey.SurveyMetrics
+    :param stat: result of :py:func:`os.stat` on ``json_path`` taken before
+      reading it; by default, the file is stat'ed now
+    :type stat: os.stat_result
+    """
+    if stat is None:
+        stat = os.stat(json_path)
+    layout = {}
+    offset = 0
+    arrays = []
+    for name, arr in _arrays(metrics):
+        arr = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder('<'))
+        offset = _align(offset)
+        layout[name] = [arr.dtype.str, list(arr.shape), offset]
+        arrays.append((offset, arr))
+        offset += arr.nbytes
+    header = json.dumps({
+        'json_size': stat.st_size,
+        'json_mtime_ns': stat.st_mtime_ns,
+        'header': metrics.header,
+        'ssids': metrics.ssids,
+        'scan_columns': metrics.scan_columns,
+        'arrays': layout,
+    }).encode('utf-8')
+    start = _align(_PREAMBLE.size + len(header))
+    path = sidecar_path(json_path)
+    fd, tmpname = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(_PREAMBLE.pack(MAGIC, SIDECAR_VERSION, len(header)))
+            fh.write(header)
+            for offset, arr in arrays:
+                fh.seek(start + offset)
+                fh.write(arr.tobytes())
+        # mkstemp creates files only readable by their owner
+        os.chmod(tmpname, 0o644)
+        os.replace(tmpname, path)
+    except Exception:
+        os.unlink(tmpname)
+        raise
+    logger.debug('Wrote metrics sidecar: %s', path)
+
+
+def read_sidecar(json_path):
+    """
+    Memory-map the metrics sidecar of survey file ``json_path``.
+
+    :return: the flattened measurements, with every array a read-only view
+      of the sidecar file; or None if there is no sidecar, or if it is of
+      another version or older than the survey file
+    :rtype: wifi_survey_heatmap.survey.SurveyMetrics
+    """
+    path = sidecar_path(json_path)
+    try:
+        stat = os.stat(json_path)
+        with open(path, 'rb') as fh:
+            magic, version, length = _PREAMBLE.unpack(
+                fh.read(_PREAMBLE.size)
+            )
+            if magic != MAGIC or version != SIDECAR_VERSION:
+                logger.debug('Ignoring incompatible sidecar: %s', path)
+                return None
+            header = json.loads(fh.read(length).decode('utf-8'))
+    except (IOError, OSError, ValueError, struct.error):
+        return None
+    if (
+        header['json_size'] != stat.st_size or
+        header['json_mtime_ns'] != stat.st_mtime_ns
+    ):
+        logger.debug('Ignoring stale sidecar: %s', path)
+        return None
+    start = _align(_PREAMBLE.size + length)
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    arrays = {}
+    for name, (dtype, shape, offset) in header['arrays'].items():
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        arrays[name] = data[start + offset:start + offset + size].view(
+            dtype
+        ).reshape(shape)
+    names = [m[0] for m in METRICS]
+    return SurveyMetrics(
+        header['header'], arrays['x'], arrays['y'],
+        {name: arrays['value/' + name] for name in names},
+        {name: arrays['valid/' + name] for name in names},
+        header['ssids'], arrays['ssid_index'], arrays['scanned'],
+        [tuple(c) for c in header['scan_columns']], arrays['scan_signal']
+    )
+
+
+def load_metrics(json_path):
+    """
+    Return the flattened measurements of survey file ``json_path``, from its
+    metrics sidecar if that is up to date; otherwise, the survey file is
+    read and the sidecar (re-)built.
+
+    :param json_path: path to the survey JSON file
+    :type json_path: str
+    :rtype: wifi_survey_heatmap.survey.SurveyMetrics
+    :raises ValueError: if the survey file has no survey points
+    """
+    metrics = read_sidecar(json_path)
+    if metrics is not None:
+        logger.debug('Loaded metrics sidecar for %s', json_path)
+        return metrics
+    stat = os.stat(json_path)
+    with SurveyFile(json_path) as survey:
+        metrics = SurveyMetrics.from_points(survey, survey.header)
+    try:
+        write_sidecar(json_path, metrics, stat)
+    except (IOError, OSError):
+        logger.warning(
+            'Unable to write metrics sidecar for %s', json_path,
+            exc_info=True
+        )
+    return metrics
@@ -0,0 +1,190 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import numpy as np
+
+#: default size parameter of :py:class:`~.KllSketch`; the rank error of its
+#: quantiles is roughly ``1.7 / k``, i.e. under 1% of the values
+KLL_K = 200
+
+
+class KllSketch(object):
+    """
+    Mergeable streaming quantile sketch (KLL; Karnin, Lang and Liberty,
+    "Optimal Quantile Approximation in Streams", 2016).
+
+    Values are kept in a hierarchy of compactors, where each value at level
+    ``h`` stands for ``2 ** h`` of the values added. When a level exceeds its
+    capacity it is sorted and every other value is promoted to the next
+    level, so the sketch holds ``O(k)`` values however many are added.
+    Two sketches are merged by concatenating their levels and compacting.
+
+    Compaction alternates between keeping the odd and even values of each
+    level instead of choosing at random, so sketches are reproducible.
+
+    :param k: size parameter; larger is more accurate
+    :type k: int
+    """
+
+    def __init__(self, k=KLL_K):
+        self.k = k
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._levels = [np.empty(0)]
+        self._offsets = [0]
+
+    def _capacity(self, level):
+        depth = len(self._levels) - level - 1
+        return max(int(np.ceil(self.k * (2.0 / 3.0) ** depth)), 2)
+
+    def _compact(self):
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                    self._offsets.append(0)
+                items = np.sort(items)
+                # an odd item out stays behind
+                keep = len(items) % 2
+                offset = self._offsets[level]
+                self._offsets[level] = 1 - offset
+                self._levels[level + 1] = np.concatenate(
+                    (self._levels[level + 1], items[keep + offset::2])
+                )
+                self._levels[level] = items[:keep]
+            level += 1
+
+    def update(self, values):
+        """
+        Add values to the sketch; NaNs are ignored.
+
+        :param values: values to add
+        :type values: numpy.ndarray
+        :return: this sketch
+        :rtype: KllSketch
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self._extremes(values.min(), values.max())
+        self.count += len(values)
+        self._levels[0] = np.concatenate((self._levels[0], values))
+        self._compact()
+        return self
+
+    def _extremes(self, vmin, vmax):
+        self.min = vmin if self.min is None else min(self.min, vmin)
+        self.max = vmax if self.max is None else max(self.max, vmax)
+
+    def merge(self, other):
+        """
+        Merge another sketch into this one.
+
+        :type other: KllSketch
+        :return: this sketch
+        :rtype: KllSketch
+        """
+        if other.count == 0:
+            return self
+        self._extremes(other.min, other.max)
+        self.count += other.count
+        for level, items in enumerate(other._levels):
+            if level == len(self._levels):
+                self._levels.append(np.empty(0))
+                self._offsets.append(0)
+            self._levels[level] = np.concatenate((self._levels[level], items))
+        self._compact()
+        return self
+
+    def quantile(self, q):
+        """
+        Return the approximate ``q`` quantile of the values added, or None if
+        the sketch is empty.
+
+        :param q: quantile, between 0 and 1
+        :type q: float
+        :rtype: float
+        """
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return float(self.min)
+        if q >= 1:
+            return float(self.max)
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([
+            np.full(len(x), 2.0 ** level)
+            for level, x in enumerate(self._levels)
+        ])
+        order = np.argsort(items, kind='mergesort')
+        ranks = np.cumsum(weights[order])
+        idx = np.searchsorted(ranks, q * ranks[-1])
+        return float(items[order][min(idx, len(items) - 1)])
+
+    def to_dict(self):
+        """
+        Return the sketch as a JSON-serializable dict.
+
+        :rtype: dict
+        """
+        return {
+            'k': self.k,
+            'count': self.count,
+            'min': None if self.min is None else float(self.min),
+            'max': None if self.max is None else float(self.max),
+            'levels': [x.tolist() for x in self._levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Return the sketch serialized by :py:meth:`~.to_dict`.
+
+        :type data: dict
+        :rtype: KllSketch
+        """
+        res = cls(data['k'])
+        res.count = data['count']
+        res.min = data['min']
+        res.max = data['max']
+        res._levels = [np.array(x, dtype=float) for x in data['levels']]
+        res._offsets = [0] * len(res._levels)
+        return res
@@ -0,0 +1,553 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+import logging
+import re
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_DECODER = json.JSONDecoder()
+_NON_SPACE = re.compile(r'\S')
+
+
+def _get(*path):
+    """
+    Return a function extracting the value at ``path`` from a survey point's
+    ``result`` dict and applying a scale and offset to it.
+    """
+    def getter(result, scale=1.0, offset=0.0):
+        for key in path:
+            result = result[key]
+        return result * scale + offset
+    return getter
+
+
+#: tuples of (metric name, getter, scale, offset) for every metric that can
+#: be loaded from a survey point's ``result`` dict
+METRICS = [
+    ('channel', _get('channel'), 1.0, 0.0),
+    ('tcp_upload_Mbps', _get('tcp', 'received_Mbps'), 1.0, 0.0),
+    ('tcp_download_Mbps', _get('tcp-reverse', 'received_Mbps'), 1.0, 0.0),
+    ('udp_download_Mbps', _get('udp', 'Mbps'), 1.0, 0.0),
+    ('jitter_download', _get('udp', 'jitter_ms'), 1.0, 0.0),
+    ('udp_upload_Mbps', _get('udp-reverse', 'Mbps'), 1.0, 0.0),
+    ('jitter_upload', _get('udp-reverse', 'jitter_ms'), 1.0, 0.0),
+    ('tx_power', _get('tx_power'), 1.0, 0.0),
+    ('frequency', _get('frequency'), 1e-3, 0.0),
+    ('channel_bitrate', _get('bitrate'), 1.0, 0.0),
+    ('signal_quality', _get('signal_mbm'), 1.0, 130.0),
+]
+
+
+class SurveyData(object):
+    """
+    Columnar survey measurements: one float array per metric, with a
+    validity mask marking the points at which the metric was measured.
+
+    :param x: x coordinates of the survey points
+    :type x: numpy.ndarray
+    :param y: y coordinates of the survey points
+    :type y: numpy.ndarray
+    :param ap: label of the AP each point was connected to (or None)
+    :type ap: list
+    :param values: dict of metric name to float array of values, with NaN
+      where the metric was not measured
+    :type values: dict
+    :param valid: dict of metric name to boolean validity mask
+    :type valid: dict
+    """
+
+    def __init__(self, x, y, ap, values, valid):
+        self.x = x
+        self.y = y
+        self.ap = ap
+        self.values = values
+        self.valid = valid
+
+    def __len__(self):
+        return len(self.x)
+
+    def add_metric(self, key, values):
+        """
+        Add (or replace) metric ``key``, valid wherever ``values`` isn't NaN.
+
+        :param values: float array with one value per point
+        :type values: numpy.ndarray
+        """
+        self.values[key] = values
+        self.valid[key] = ~np.isnan(values)
+
+    def has(self, key):
+        """Return whether metric ``key`` was measured at any point."""
+        return key in self.valid and bool(self.valid[key].any())
+
+    def metric(self, key, corners=()):
+        """
+        Return the points at which metric ``key`` was measured, optionally
+        followed by the given extra ``corners`` (typically those of the
+        floorplan) taking the metric's minimum value.
+
+        :return: tuple of (x, y, values) float arrays
+        :rtype: tuple
+        """
+        mask = self.valid[key]
+        x = self.x[mask]
+        y = self.y[mask]
+        values = self.values[key][mask]
+        if len(corners) > 0 and len(values) > 0:
+            cx, cy = np.asarray(corners, dtype=float).T
+            x = np.concatenate([x, cx])
+            y = np.concatenate([y, cy])
+            values = np.concatenate([
+                values, np.full(len(cx), values.min())
+            ])
+        return x, y, values
+
+    def groups(self, keys):
+        """
+        Group the given metrics by validity mask, so that metrics measured at
+        the same points can share an interpolator. Metrics without any valid
+        value are left out.
+
+        :return: list of lists of metric names, in the order of ``keys``
+        :rtype: list
+        """
+        groups = {}
+        for key in keys:
+            if self.has(key):
+                groups.setdefault(self.valid[key].tobytes(), []).append(key)
+        return list(groups.values())
+
+
+def _text(value):
+    """Return ``value`` as text, decoding bytes like the survey UI does."""
+    if isinstance(value, bytes):
+        return value.decode()
+    return value
+
+
+class SurveyMetrics(object):
+    """
+    Flattened survey measurements: the point coordinates, every scalar
+    metric (see :py:data:`~.METRICS`), the SSID each point was connected to
+    and a table of the signal of every scanned BSS at every point. This is
+    all that the heatmap and threshold generators need from a survey, and
+    what metrics sidecar files (see :py:mod:`~.sidecar`) store.
+
+    :param header: top-level keys of the survey file other than
+      ``survey_points``
+    :type header: dict
+    :param x: x coordinates of the survey points
+    :type x: numpy.ndarray
+    :param y: y coordinates of the survey points
+    :type y: numpy.ndarray
+    :param values: dict of metric name to float array of values, with NaN
+      where the metric was not measured
+    :type values: dict
+    :param valid: dict of metric name to boolean validity mask
+    :type valid: dict
+    :param ssids: distinct SSIDs the survey points were connected to
+    :type ssids: list
+    :param ssid_index: index into ``ssids`` for each point, or -1
+    :type ssid_index: numpy.ndarray
+    :param scanned: whether each point has scan results
+    :type scanned: numpy.ndarray
+    :param scan_columns: list of (bssid, ssid, frequency) of each column of
+      ``scan_signal``
+    :type scan_columns: list
+    :param scan_signal: signal (mBm) of each scanned BSS at each point, of
+      shape ``(points, len(scan_columns))``, with NaN where not seen
+    :type scan_signal: numpy.ndarray
+    """
+
+    def __init__(
+        self, header, x, y, values, valid, ssids, ssid_index, scanned,
+        scan_columns, scan_signal
+    ):
+        self.header = header
+        self.x = x
+        self.y = y
+        self.values = values
+        self.valid = valid
+        self.ssids = ssids
+        self.ssid_index = ssid_index
+        self.scanned = scanned
+        self.scan_columns = scan_columns
+        self.scan_signal = scan_signal
+
+    def __len__(self):
+        return len(self.x)
+
+    @classmethod
+    def from_points(cls, points, header={}):
+        """
+        Flatten survey points (the ``survey_points`` list of a survey JSON
+        file) in a single pass.
+
+        :param points: survey points
+        :type points: list or SurveyFile
+        :param header: top-level keys of the survey file other than
+          ``survey_points``
+        :type header: dict
+        :rtype: SurveyMetrics
+        """
+        builder = SurveyMetricsBuilder()
+        for point in points:
+            builder.add(point)
+        return builder.build(header)
+
+    def survey(self, ap_names={}):
+        """
+        Return the measurements as :py:class:`~.SurveyData`.
+
+        :param ap_names: dict of upper-case BSSID/SSID to AP name, used to
+          label each point with the AP it was connected to
+        :type ap_names: dict
+        :rtype: SurveyData
+        """
+        frequency = self.values['frequency']
+        ap = [None] * len(self)
+        for idx in np.flatnonzero(
+            (self.ssid_index >= 0) & self.valid['frequency']
+        ):
+            ssid = self.ssids[self.ssid_index[idx]]
+            ap[idx] = ap_names.get(ssid.upper(), ssid) + (
+                ' ({0:.1f} GHz)'.format(frequency[idx])
+            )
+        for name, mask in self.valid.items():
+            if not mask.all():
+                logger.info(
+                    '%s measured at %d of %d points', name, mask.sum(),
+                    len(self)
+                )
+        return SurveyData(
+            self.x, self.y, ap, dict(self.values), dict(self.valid)
+        )
+
+
+class SurveyMetricsBuilder(object):
+    """
+    Build :py:class:`~.SurveyMetrics` from survey points added one at a
+    time, e.g. while they are being written out.
+    """
+
+    def __init__(self):
+        self._x = []
+        self._y = []
+        self._columns = [[] for _ in METRICS]
+        self._ssids = {}
+        self._ssid_index = []
+        self._scanned = []
+        self._scan_columns = {}
+        # (point, column, signal) of every scan result
+        self._scans = ([], [], [])
+
+    def add(self, point):
+        """
+        Add a survey point.
+
+        :param point: survey point dict, with ``x``, ``y`` and ``result``
+        :type point: dict
+        """
+        idx = len(self._x)
+        self._x.append(point['x'])
+        self._y.append(point['y'])
+        result = point['result']
+        for col, (_, getter, scale, offset) in enumerate(METRICS):
+            try:
+                value = float(getter(result, scale, offset))
+            except (KeyError, TypeError, ValueError):
+                value = np.nan
+            self._columns[col].append(value)
+        ssid = _text(result.get('ssid'))
+        if isinstance(ssid, str):
+            self._ssid_index.append(self._ssids.setdefault(
+                ssid, len(self._ssids)
+            ))
+        else:
+            self._ssid_index.append(-1)
+        scans = result.get('scan_results')
+        self._scanned.append(isinstance(scans, dict))
+        if not isinstance(scans, dict):
+            return
+        for bssid, bss in scans.items():
+            try:
+                key = (_text(bssid), _text(bss['ssid']), bss['frequency'])
+                signal = float(bss['signal_mbm'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            self._scans[0].append(idx)
+            self._scans[1].append(
+                self._scan_columns.setdefault(key, len(self._scan_columns))
+            )
+            self._scans[2].append(signal)
+
+    def build(self, header={}):
+        """
+        Return the flattened measurements of all points added so far.
+
+        :param header: top-level keys of the survey file other than
+          ``survey_points``
+        :type header: dict
+        :rtype: SurveyMetrics
+        """
+        names = [m[0] for m in METRICS]
+        values = {
+            name: np.array(column, dtype=float)
+            for name, column in zip(names, self._columns)
+        }
+        scan_signal = np.full(
+            (len(self._x), len(self._scan_columns)), np.nan
+        )
+        scan_signal[self._scans[0], self._scans[1]] = self._scans[2]
+        return SurveyMetrics(
+            header, np.array(self._x, dtype=float),
+            np.array(self._y, dtype=float), values,
+            {name: ~np.isnan(v) for name, v in values.items()},
+            sorted(self._ssids, key=self._ssids.get),
+            np.array(self._ssid_index, dtype=np.int32),
+            np.array(self._scanned, dtype=bool),
+            sorted(self._scan_columns, key=self._scan_columns.get),
+            scan_signal
+        )
+
+
+def load_survey(points, ap_names={}):
+    """
+    Load survey points (the ``survey_points`` list of a survey JSON file)
+    into a :py:class:`~.SurveyData` in a single pass.
+
+    :param points: survey points
+    :type points: list or SurveyFile
+    :param ap_names: dict of upper-case BSSID/SSID to AP name, used to label
+      each point with the AP it was connected to
+    :type ap_names: dict
+    :rtype: SurveyData
+    """
+    return SurveyMetrics.from_points(points).survey(ap_names)
+
+
+class _Reader(object):
+    """
+    Incremental reader for locating JSON values in a file, which only keeps
+    the part of the file that hasn't been consumed yet in memory.
+
+    The file is decoded as latin-1, so that string positions are equal to
+    byte offsets. All JSON syntax is ASCII, so this finds the boundaries of
+    values correctly in UTF-8 files too; only the values decoded while
+    scanning are garbled, which :py:meth:`~.load` takes care of.
+    """
+
+    def __init__(self, fh, blocksize=1024 * 1024):
+        self._fh = fh
+        self._blocksize = blocksize
+        self._text = ''
+        # byte offset of self._text[0]
+        self._base = 0
+        self._eof = False
+
+    def _fill(self, size=0):
+        """Read at least ``size`` more bytes, unless at end of file."""
+        data = self._fh.read(max(size, self._blocksize))
+        if not data:
+            self._eof = True
+            return
+        self._text += data.decode('latin-1')
+
+    def char(self, pos):
+        """
+        Return the first non-whitespace character at or after byte offset
+        ``pos`` (or an empty string at end of file), and its offset.
+        """
+        while True:
+            match = _NON_SPACE.search(self._text, pos - self._base)
+            if match is not None:
+                return match.group(), self._base + match.start()
+            if self._eof:
+                return '', pos
+            self._fill()
+
+    def skip(self, pos):
+        """
+        Skip the JSON value starting at byte offset ``pos``, returning the
+        offset of its end.
+        """
+        while True:
+            start = pos - self._base
+            try:
+                _, end = _DECODER.raw_decode(self._text, start)
+                # a number may continue beyond what has been read so far
+                if end < len(self._text) or self._eof:
+                    return self._base + end
+            except ValueError:
+                if self._eof:
+                    raise
+            self._fill(len(self._text) - start)
+
+    def load(self, pos):
+        """
+        Decode the JSON value starting at byte offset ``pos``, returning it
+        and the offset of its end.
+        """
+        end = self.skip(pos)
+        raw = self._text[pos - self._base:end - self._base]
+        return json.loads(raw.encode('latin-1')), end
+
+    def discard(self, pos):
+        """Forget everything before byte offset ``pos``."""
+        # only once a block's worth has been consumed, to avoid copying the
+        # remaining text for every value
+        if pos - self._base > self._blocksize:
+            self._text = self._text[pos - self._base:]
+            self._base = pos
+
+
+class SurveyFile(object):
+    """
+    Streaming, random-access reader for survey JSON files.
+
+    On opening, the file is scanned once, a block at a time, to build an
+    index of the byte offsets at which each element of its ``survey_points``
+    array starts and ends. Points are then parsed one at a
+    time when iterated over or indexed, so memory use is bounded by the size
+    of the largest single point, not of the file.
+
+    :param path: path to the survey JSON file
+    :type path: str
+    :param blocksize: number of bytes to read at a time while scanning
+    :type blocksize: int
+    :raises ValueError: if the file is empty or has no ``survey_points``
+    """
+
+    def __init__(self, path, blocksize=1024 * 1024):
+        self.path = path
+        self._fh = open(path, 'rb')
+        try:
+            #: top-level keys of the file other than ``survey_points``
+            self.header, points = self._index(blocksize)
+        except Exception:
+            self._fh.close()
+            raise
+        #: array of (start, end) byte offsets of each survey point
+        self.offsets = np.array(points, dtype=np.int64).reshape((-1, 2))
+        logger.debug(
+            'Indexed %d survey points in %s', len(self.offsets), path
+        )
+
+    def _index(self, blocksize):
+        """
+        Scan the file, returning a tuple of (header dict, list of (start,
+        end) offsets of survey points).
+        """
+        reader = _Reader(self._fh, blocksize)
+        header = {}
+        points = None
+        char, pos = reader.char(0)
+        if char != '{':
+            raise ValueError('%s is not a survey file' % self.path)
+        char, pos = reader.char(pos + 1)
+        while char != '}':
+            key, pos = reader.load(pos)
+            char, pos = reader.char(pos)
+            if char != ':':
+                raise ValueError('Invalid JSON in %s' % self.path)
+            char, pos = reader.char(pos + 1)
+            if key == 'survey_points' and char == '[':
+                points, pos = self._index_points(reader, pos + 1)
+            else:
+                header[key], pos = reader.load(pos)
+            reader.discard(pos)
+            char, pos = reader.char(pos)
+            if char == ',':
+                char, pos = reader.char(pos + 1)
+            elif char != '}':
+                raise ValueError('Invalid JSON in %s' % self.path)
+        if points is None:
+            raise ValueError('No survey points found in %s' % self.path)
+        return header, points
+
+    def _index_points(self, reader, pos):
+        """
+        Index the elements of the ``survey_points`` array, whose content
+        starts at byte offset ``pos``. Returns a tuple of (list of (start,
+        end) offsets, offset after the end of the array).
+        """
+        points = []
+        char, pos = reader.char(pos)
+        if char == ']':
+            return points, pos + 1
+        while True:
+            if char == '':
+                raise ValueError('Unexpected end of %s' % self.path)
+            if char == ']':
+                # trailing comma
+                raise ValueError('Invalid JSON in %s' % self.path)
+            end = reader.skip(pos)
+            points.append((pos, end))
+            reader.discard(end)
+            char, pos = reader.char(end)
+            if char == ']':
+                return points, pos + 1
+            if char == '':
+                raise ValueError('Unexpected end of %s' % self.path)
+            if char != ',':
+                raise ValueError('Invalid JSON in %s' % self.path)
+            char, pos = reader.char(pos + 1)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, idx):
+        start, end = self.offsets[idx]
+        self._fh.seek(start)
+        return json.loads(self._fh.read(end - start))
+
+    def __iter__(self):
+        for idx in range(len(self.offsets)):
+            yield self[idx]
+
+    def close(self):
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
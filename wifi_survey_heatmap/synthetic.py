@@ -0,0 +1,284 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+import os
+
+import numpy as np
+
+from wifi_survey_heatmap.raster import PngWriter
+
+#: floorplan scale assumed by the signal model, in meters per pixel
+METERS_PER_PIXEL = 0.05
+
+#: (channel, center frequency in MHz) of the radios of synthetic APs
+CHANNELS_24 = [(1, 2412), (6, 2437), (11, 2462)]
+CHANNELS_5 = [(36, 5180), (52, 5260), (100, 5500), (116, 5580), (149, 5745)]
+
+
+def synthetic_floorplan(width=1600, height=1000, rooms=(5, 3), wall=4):
+    """
+    Return a synthetic floorplan: white background, with outer walls and a
+    grid of ``rooms`` (columns, rows) separated by walls with door gaps.
+
+    :param width: image width in pixels
+    :type width: int
+    :param height: image height in pixels
+    :type height: int
+    :param rooms: number of room columns and rows
+    :type rooms: tuple
+    :param wall: wall thickness in pixels
+    :type wall: int
+    :return: uint8 RGBA array of shape ``(height, width, 4)``
+    :rtype: numpy.ndarray
+    """
+    img = np.full((height, width, 4), 255, dtype=np.uint8)
+    color = (64, 64, 64, 255)
+    door = max(width, height) // 40
+    img[:wall] = img[-wall:] = color
+    img[:, :wall] = img[:, -wall:] = color
+    for col in range(1, rooms[0]):
+        x = col * width // rooms[0]
+        img[:, x:x + wall] = color
+        for row in range(rooms[1]):
+            y = (2 * row + 1) * height // (2 * rooms[1])
+            img[y - door // 2:y + door // 2, x:x + wall] = 255
+    for row in range(1, rooms[1]):
+        y = row * height // rooms[1]
+        img[y:y + wall] = color
+        for col in range(rooms[0]):
+            x = (2 * col + 1) * width // (2 * rooms[0])
+            img[y:y + wall, x - door // 2:x + door // 2] = 255
+    return img
+
+
+def write_floorplan(path, img):
+    """
+    Write a uint8 RGBA image (e.g. from :py:func:`~.synthetic_floorplan`) to
+    a PNG file.
+    """
+    writer = PngWriter(path, img.shape[1], img.shape[0])
+    try:
+        for start in range(0, img.shape[0], 256):
+            writer.write(img[start:start + 256])
+    finally:
+        writer.close()
+
+
+def _walk(count, width, height, rng):
+    """
+    Return ``(count, 2)`` survey point coordinates along a serpentine walk
+    through the floorplan, with some jitter.
+    """
+    margin = 0.05
+    rows = max(1, int(round(np.sqrt(count * height / float(width)))))
+    per_row = int(np.ceil(count / float(rows)))
+    idx = np.arange(count)
+    row = idx // per_row
+    frac = (idx % per_row + 0.5) / per_row
+    frac = np.where(row % 2 == 1, 1 - frac, frac)
+    x = (margin + (1 - 2 * margin) * frac) * width
+    y = (margin + (1 - 2 * margin) * (row + 0.5) / rows) * height
+    jitter = min(width / float(per_row), height / float(rows)) / 4
+    points = np.column_stack([x, y]) + rng.normal(0, jitter, (count, 2))
+    return np.clip(points, 0, [width - 1, height - 1]).round(1)
+
+
+def _bssid(idx):
+    return ':'.join('%02x' % b for b in (0x02, 0x1a, 0x11) + (
+        (idx >> 16) & 0xff, (idx >> 8) & 0xff, idx & 0xff
+    ))
+
+
+def _radios(count, aps, width, height, rng):
+    """
+    Return a list of (bssid, ssid, channel, frequency, position) of ``count``
+    BSSes: two radios (2.4 and 5 GHz) of each of the ``aps`` APs of the
+    surveyed network spread over the floor, then neighboring networks
+    placed around and beyond it.
+    """
+    res = []
+    for idx in range(count):
+        ap = idx // 2
+        if ap < aps:
+            ssid = 'survey'
+            pos = np.array([
+                (ap % 2 + 0.5) / 2 * width,
+                (ap // 2 + 0.5) / max(1, (aps + 1) // 2) * height
+            ])
+        else:
+            ssid = 'neighbor-%d' % (ap % 40)
+            pos = rng.uniform(-0.5, 1.5, 2) * [width, height]
+        channel, freq = (CHANNELS_24 if idx % 2 == 0 else CHANNELS_5)[
+            ap % (3 if idx % 2 == 0 else 5)
+        ]
+        res.append((_bssid(idx), ssid, channel, freq, pos))
+    return res
+
+
+def _iperf(mbps, udp, rng):
+    """Return an iperf3 result dict (as stored by ``wifi-survey``)."""
+    mbps = max(0.1, mbps * rng.uniform(0.8, 1.05))
+    res = {
+        'error': None, 'protocol': 'UDP' if udp else 'TCP',
+        'num_streams': 1, 'blksize': 1448 if udp else 131072, 'omit': 0,
+        'duration': 10, 'time': 'Thu, 01 Oct 2020 12:00:00 GMT',
+        'timesecs': 1601553600, 'local_host': '192.168.1.50',
+        'local_port': 52044, 'remote_host': '192.168.1.2',
+        'remote_port': 5201
+    }
+    if udp:
+        bps = mbps * 1e6
+        res.update({
+            'bytes': int(bps * 1.25), 'bps': bps, 'kbps': bps / 1e3,
+            'Mbps': mbps, 'kB_s': bps / 8e3, 'MB_s': bps / 8e6,
+            'jitter_ms': float(rng.gamma(2.0, 20.0 / mbps + 0.05)),
+            'packets': int(bps / 11584), 'lost_packets': int(rng.poisson(2)),
+            'lost_percent': float(rng.uniform(0, 1)), 'seconds': 10.0
+        })
+    else:
+        res.update({
+            'sent_bytes': int(mbps * 1.25e6), 'sent_bps': mbps * 1e6,
+            'sent_kbps': mbps * 1e3, 'sent_Mbps': mbps,
+            'sent_kB_s': mbps * 125, 'sent_MB_s': mbps / 8,
+            'received_bytes': int(mbps * 1.24e6),
+            'received_bps': mbps * 0.99e6, 'received_kbps': mbps * 990,
+            'received_Mbps': mbps * 0.99, 'received_kB_s': mbps * 123.75,
+            'received_MB_s': mbps * 0.12375,
+            'retransmits': int(rng.poisson(5))
+        })
+    return res
+
+
+def synthetic_survey(points, width=1600, height=1000, bssids=0, aps=4,
+                     iperf=True, seed=0, img_path='floorplan.png'):
+    """
+    Return a synthetic survey, as written by ``wifi-survey``.
+
+    The ``aps`` access points of the surveyed network (SSID ``survey``) are
+    spread over the floorplan; signals follow a log-distance path loss model
+    with log-normal shadowing, and throughput follows signal strength. With
+    ``bssids``, each point also has scan results of up to that many BSSes
+    (those of the surveyed network, then neighboring networks), less those
+    too weak to be heard there.
+
+    :param points: number of survey points
+    :type points: int
+    :param width: floorplan width in pixels
+    :type width: int
+    :param height: floorplan height in pixels
+    :type height: int
+    :param bssids: number of BSSes in the scan results; 0 for no scans
+    :type bssids: int
+    :param aps: number of access points of the surveyed network
+    :type aps: int
+    :param iperf: whether to include iperf3 results
+    :type iperf: bool
+    :param seed: random seed
+    :type seed: int
+    :param img_path: floorplan image path stored in the survey
+    :type img_path: str
+    :rtype: dict
+    """
+    rng = np.random.RandomState(seed)
+    radios = _radios(max(bssids, 2 * aps), aps, width, height, rng)
+    positions = np.array([r[4] for r in radios])
+    # 5 GHz radios (odd indices) lose more signal
+    offset = np.where(np.arange(len(radios)) % 2 == 1, -38.0, -32.0)
+    surveyed = np.arange(len(radios)) < 2 * aps
+    coords = _walk(points, width, height, rng)
+    res = []
+    for start in range(0, points, 1024):
+        chunk = coords[start:start + 1024]
+        dist = np.hypot(
+            chunk[:, None, 0] - positions[None, :, 0],
+            chunk[:, None, 1] - positions[None, :, 1]
+        ) * METERS_PER_PIXEL
+        signal = (
+            offset - 35.0 * np.log10(np.maximum(dist, 1.0)) +
+            rng.normal(0, 3.0, dist.shape)
+        ).round()
+        best = np.argmax(np.where(surveyed, signal, -np.inf), axis=1)
+        for (x, y), row, ap in zip(chunk, signal, best):
+            bssid, ssid, channel, freq, _ = radios[ap]
+            rssi = float(row[ap])
+            bitrate = float(np.clip((rssi + 92) * 18, 6.5, 866.7).round(1))
+            result = {
+                'ssid': ssid, 'bssid': bssid, 'channel': channel,
+                'frequency': freq, 'ch_width': 80 if freq > 5000 else 20,
+                'signal_mbm': rssi, 'tx_power': 20.0, 'bitrate': bitrate,
+            }
+            if iperf:
+                mbps = bitrate * 0.6
+                result['tcp'] = _iperf(mbps, False, rng)
+                result['tcp-reverse'] = _iperf(mbps * 1.1, False, rng)
+                result['udp'] = _iperf(mbps * 0.8, True, rng)
+                result['udp-reverse'] = _iperf(mbps * 0.85, True, rng)
+            if bssids > 0:
+                result['scan_results'] = {
+                    radios[idx][0]: {
+                        'bssid': radios[idx][0], 'ssid': radios[idx][1],
+                        'channel': radios[idx][2],
+                        'frequency': radios[idx][3] * 1e6,
+                        'signal_mbm': float(row[idx])
+                    }
+                    for idx in range(bssids) if row[idx] > -95
+                }
+            res.append({'x': float(x), 'y': float(y), 'result': result})
+    return {'img_path': img_path, 'survey_points': res}
+
+
+def write_synthetic_survey(title, points, width=1600, height=1000, **kwargs):
+    """
+    Write a synthetic survey (see :py:func:`~.synthetic_survey`) to
+    ``TITLE.json``, and its floorplan to ``TITLE.png``.
+
+    :param title: survey title, optionally with a directory
+    :type title: str
+    :param points: number of survey points
+    :type points: int
+    :return: path of the survey JSON file
+    :rtype: str
+    """
+    img_path = title + '.png'
+    write_floorplan(img_path, synthetic_floorplan(width, height))
+    survey = synthetic_survey(
+        points, width, height, img_path=os.path.basename(img_path), **kwargs
+    )
+    with open(title + '.json', 'w') as fh:
+        json.dump(survey, fh, indent=2)
+    return title + '.json'
@@ -0,0 +1,147 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import numpy as np
+
+from wifi_survey_heatmap.annotations import (
+    PointAnnotations, cull_overlapping
+)
+from wifi_survey_heatmap.heatmap import _pyplot
+
+
+class TestCullOverlapping(object):
+
+    def test_earlier_boxes_win(self):
+        boxes = [
+            [0, 0, 10, 5],
+            [5, 2, 15, 7],    # overlaps the first
+            [10, 0, 20, 5],   # only touches the first
+            [100, 100, 130, 105],
+            [121, 101, 125, 103],  # inside the fourth, other cell
+        ]
+        assert cull_overlapping(boxes).tolist() == [
+            True, False, True, True, False
+        ]
+
+    def test_empty(self):
+        assert cull_overlapping(np.zeros((0, 4))).tolist() == []
+
+    def test_matches_pairwise(self):
+        rng = np.random.RandomState(3)
+        xy = rng.uniform(0, 200, (300, 2))
+        wh = rng.uniform(1, 12, (300, 2))
+        boxes = np.hstack([xy, xy + wh])
+        keep = cull_overlapping(boxes)
+        expected = []
+        for i, (x0, y0, x1, y1) in enumerate(boxes):
+            expected.append(not any(
+                x0 < boxes[j, 2] and boxes[j, 0] < x1 and
+                y0 < boxes[j, 3] and boxes[j, 1] < y1
+                for j in range(i) if expected[j]
+            ))
+        assert keep.tolist() == expected
+
+
+class TestPointAnnotations(object):
+
+    def _axes(self):
+        fig, ax = _pyplot().subplots(figsize=(4, 3))
+        ax.imshow(np.zeros((10, 10)), extent=(0, 100, 100, 0))
+        return fig, ax
+
+    def test_draw(self):
+        from matplotlib.colors import Normalize
+        x = np.array([10.0, 11.0, 50.0, 80.0])
+        y = np.array([50.0, 50.0, 50.0, 90.0])
+        ann = PointAnnotations(x, y, ['a', 'a', None, 'b'], 8)
+        fig, ax = self._axes()
+        try:
+            valid = np.array([True, True, True, False])
+            ann.draw(ax, valid, np.arange(4.0), 'viridis', Normalize(0, 3))
+            # one collection of markers, one of labels
+            assert len(ax.collections) == 2
+            assert len(ax.collections[0].get_offsets()) == 3
+            # the second "a" overlaps the first and "b" is not valid
+            assert ax.collections[1].get_offsets().tolist() == [[10, 20]]
+            geometry = ann._geometry
+            ann.draw(ax, valid, np.arange(4.0), 'viridis', Normalize(0, 3))
+            assert ann._geometry is geometry
+            # a new layout culls again
+            fig.set_size_inches(40, 30)
+            ann.draw(ax, valid, np.arange(4.0), 'viridis', Normalize(0, 3))
+            assert ann._geometry is not geometry
+            assert ann._culled[valid[[0, 1, 3]].tobytes()].tolist() == [
+                True, True, False
+            ]
+        finally:
+            _pyplot().close(fig)
+
+    def test_culled_per_valid_points(self):
+        from matplotlib.colors import Normalize
+        x = np.array([10.0, 11.0, 80.0])
+        y = np.array([50.0, 50.0, 90.0])
+        ann = PointAnnotations(x, y, ['a', 'a', 'b'], 8)
+        fig, ax = self._axes()
+        try:
+            ann.draw(
+                ax, np.array([True, True, True]), np.arange(3.0), 'viridis',
+                Normalize(0, 2)
+            )
+            assert ax.collections[1].get_offsets().tolist() == [
+                [10, 20], [80, 60]
+            ]
+            # the label of a point that is not valid hides no other label
+            ann.draw(
+                ax, np.array([False, True, True]), np.arange(3.0), 'viridis',
+                Normalize(0, 2)
+            )
+            assert ax.collections[3].get_offsets().tolist() == [
+                [11, 20], [80, 60]
+            ]
+            assert len(ann._culled) == 2
+        finally:
+            _pyplot().close(fig)
+
+    def test_nothing_valid(self):
+        from matplotlib.colors import Normalize
+        ann = PointAnnotations([10.0], [50.0], ['a'], 8)
+        fig, ax = self._axes()
+        try:
+            ann.draw(ax, np.array([False]), [0.0], 'viridis', Normalize())
+            assert len(ax.collections) == 1
+        finally:
+            _pyplot().close(fig)
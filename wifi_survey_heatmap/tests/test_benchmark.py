@@ -0,0 +1,181 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+
+import pytest
+
+from wifi_survey_heatmap import benchmark
+from wifi_survey_heatmap.benchmark import (
+    SurveyBenchmark, compare, format_results, measure
+)
+from wifi_survey_heatmap.floorplan import FloorplanCache
+from wifi_survey_heatmap.sidecar import load_metrics
+from wifi_survey_heatmap.synthetic import (
+    synthetic_floorplan, synthetic_survey, write_synthetic_survey
+)
+
+
+class TestSynthetic(object):
+
+    def test_floorplan(self):
+        img = synthetic_floorplan(200, 100, rooms=(2, 2))
+        assert img.shape == (100, 200, 4)
+        assert (img[0] == [64, 64, 64, 255]).all()
+        assert (img[50, 50] == 255).all()
+        # wall between the two room columns, with a door gap
+        assert (img[10, 100] == [64, 64, 64, 255]).all()
+        assert (img[25, 100] == 255).all()
+
+    def test_survey(self):
+        survey = synthetic_survey(50, 200, 100, bssids=20)
+        points = survey['survey_points']
+        assert len(points) == 50
+        assert all(0 <= p['x'] < 200 and 0 <= p['y'] < 100 for p in points)
+        for p in points:
+            res = p['result']
+            assert res['ssid'] == 'survey'
+            assert -95 < res['signal_mbm'] < 0
+            assert res['tcp']['received_Mbps'] > 0
+            assert res['udp']['jitter_ms'] > 0
+            assert 0 < len(res['scan_results']) <= 20
+            assert res['bssid'] in res['scan_results']
+        assert synthetic_survey(50, 200, 100, bssids=20) == survey
+
+    def test_survey_no_scans(self):
+        survey = synthetic_survey(5, 200, 100, iperf=False)
+        res = survey['survey_points'][0]['result']
+        assert 'scan_results' not in res
+        assert 'tcp' not in res
+
+    def test_write(self, tmpdir):
+        path = write_synthetic_survey(
+            str(tmpdir.join('s')), 30, 120, 80, bssids=10
+        )
+        metrics = load_metrics(path)
+        assert len(metrics) == 30
+        assert metrics.header['img_path'] == 's.png'
+        assert len(metrics.scan_columns) == 10
+        plan = FloorplanCache(str(tmpdir.join('cache'))).get(
+            str(tmpdir.join('s.png'))
+        )
+        assert (plan.width, plan.height) == (120, 80)
+
+
+class TestMeasure(object):
+
+    def test_measure(self):
+        calls = []
+        res, values = measure(lambda: calls.append(1) or len(calls), 2)
+        assert res == 2
+        assert len(calls) == 3
+        assert values['wall'] >= 0
+        assert values['peak_mb'] >= 0
+
+    def test_no_memory(self):
+        res, values = measure(lambda: bytearray(1024), 1, memory=False)
+        assert len(res) == 1024
+        assert 'peak_mb' not in values
+
+
+class TestCompare(object):
+
+    baseline = {'c': {
+        'a': {'wall': 1.0, 'peak_mb': 10.0},
+        'b': {'wall': 0.001, 'peak_mb': 0.1},
+    }}
+
+    def test_no_regression(self):
+        res = {'c': {
+            'a': {'wall': 1.2, 'peak_mb': 5.0},
+            'b': {'wall': 0.005, 'peak_mb': 0.5},
+            'new': {'wall': 9.0}
+        }, 'other': {'a': {'wall': 9.0}}}
+        assert compare(res, self.baseline, 0.25) == []
+
+    def test_regression(self):
+        res = {'c': {
+            'a': {'wall': 1.3, 'peak_mb': 20.0},
+            'b': {'wall': 0.05},
+        }}
+        regressions = compare(res, self.baseline, 0.25)
+        assert len(regressions) == 3
+        assert regressions[0].startswith('c a: wall 1.300 > baseline 1.000')
+        expected = ['c b: wall 0.050 > baseline 0.001 (+4900%)']
+        assert compare(res, self.baseline, 10) == expected
+
+    def test_format(self):
+        out = format_results({'c': {'a': {'wall': 1.5, 'peak_mb': 10.0}}},
+                             self.baseline)
+        assert '1.5000 (+50%)' in out
+        assert '10.0 (+0%)' in out
+
+
+class TestSurveyBenchmark(object):
+
+    def test_method(self):
+        assert SurveyBenchmark(10).method == 'rbf'
+        assert SurveyBenchmark(50000).method == 'local'
+        assert SurveyBenchmark(10, method='local').method == 'local'
+
+    def test_run(self, tmpdir):
+        bench = SurveyBenchmark(
+            20, bssids=8, backend='raster', repeat=1, width=120, height=80
+        )
+        res = bench.run()
+        stages = [s for s in benchmark.STAGES if s != 'netlink_parse']
+        assert list(res.keys())[:len(stages)] == stages
+        assert all(v['wall'] >= 0 and v['peak_mb'] >= 0 for v in res.values())
+
+    def test_main(self, tmpdir, capsys, monkeypatch):
+        args = ['-s', '10', '-b', '0', '-r', '1', '--no-memory',
+                '--backend', 'raster']
+        out = str(tmpdir.join('base.json'))
+        benchmark.main(args + ['-o', out])
+        with open(out) as fh:
+            base = json.load(fh)
+        assert list(base) == ['points=10,bssids=0,method=rbf,backend=raster']
+        assert 'channel_to_signal' not in list(base.values())[0]
+        assert 'interpolate' in capsys.readouterr().out
+        for stage in base.values():
+            for values in stage.values():
+                values['wall'] = 0.0
+        with open(out, 'w') as fh:
+            json.dump(base, fh)
+        monkeypatch.setattr(benchmark, 'MIN_WALL_DELTA', 0.0)
+        with pytest.raises(SystemExit):
+            benchmark.main(args + ['-B', out, '-t', '0'])
@@ -0,0 +1,102 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import os
+import time
+
+import numpy as np
+
+from wifi_survey_heatmap.cache import GridCache, cache_dir, file_hash
+
+
+class TestCacheDir(object):
+
+    def test_env_var(self, tmpdir, monkeypatch):
+        monkeypatch.setenv('WIFI_HEATMAP_CACHE_DIR', str(tmpdir))
+        assert cache_dir('foo') == str(tmpdir.join('foo'))
+        assert tmpdir.join('foo').isdir()
+
+    def test_file_hash(self, tmpdir):
+        fpath = tmpdir.join('foo')
+        fpath.write('foo')
+        assert file_hash(str(fpath), blocksize=2) == (
+            '2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae'
+        )
+
+
+class TestGridCache(object):
+
+    def test_key(self):
+        arr = np.arange(4, dtype=float)
+        assert GridCache.key('a', arr, 1) == GridCache.key('a', arr.copy(), 1)
+        assert GridCache.key('a', arr, 1) != GridCache.key('a', arr, 2)
+        assert GridCache.key('a', arr, 1) != GridCache.key(
+            'a', arr.astype(np.float32), 1
+        )
+        assert GridCache.key('a', arr, 1) != GridCache.key(
+            'a', arr.reshape((2, 2)), 1
+        )
+
+    def test_get_put(self, tmpdir):
+        cache = GridCache(path=str(tmpdir))
+        assert cache.get('foo') is None
+        cache.put('foo', np.arange(10.0))
+        res = cache.get('foo')
+        assert isinstance(res, np.memmap)
+        assert np.array_equal(res, np.arange(10.0))
+
+    def test_evict_size(self, tmpdir):
+        cache = GridCache(path=str(tmpdir), max_size=3000)
+        for idx, key in enumerate(['a', 'b', 'c']):
+            cache.put(key, np.zeros(128))
+            mtime = time.time() - 100 + idx
+            os.utime(str(tmpdir.join(key + '.npy')), (mtime, mtime))
+        # reading marks as recently used
+        cache.get('a')
+        cache.evict()
+        assert cache.get('a') is not None
+        assert cache.get('b') is None
+        assert cache.get('c') is not None
+
+    def test_evict_age(self, tmpdir):
+        cache = GridCache(path=str(tmpdir), max_age=60)
+        cache.put('old', np.zeros(4))
+        cache.put('new', np.zeros(4))
+        mtime = time.time() - 120
+        os.utime(str(tmpdir.join('old.npy')), (mtime, mtime))
+        cache.evict()
+        assert sorted(os.listdir(str(tmpdir))) == ['new.npy']
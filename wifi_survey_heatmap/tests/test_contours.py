@@ -0,0 +1,221 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import numpy as np
+import pytest
+
+from wifi_survey_heatmap.contours import (
+    ContourSet, contour_levels, contour_lines, contour_polygons
+)
+from wifi_survey_heatmap.heatmap import _pyplot
+
+
+def _area(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * (np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))
+
+
+def _grid(n=7):
+    return np.arange(float(n)), np.arange(float(n))
+
+
+class TestContourLevels(object):
+
+    @pytest.mark.parametrize('low, high, count', [
+        (20.0, 90.0, 5), (0.0, 943.0, 6), (-90.0, -30.0, 4), (0.0, 1.0, 3),
+        (49.3, 96.9, 5)
+    ])
+    def test_levels_match_matplotlib(self, low, high, count):
+        pyplot = _pyplot()
+        z = np.linspace(low, high, 100).reshape((10, 10))
+        expected = np.asarray(pyplot.contour(z, levels=count).levels)
+        pyplot.close('all')
+        # matplotlib may keep levels beyond the data, which draw nothing
+        expected = expected[(expected > low) & (expected < high)]
+        assert contour_levels(z, count).tolist() == pytest.approx(
+            expected.tolist()
+        )
+
+    def test_levels(self):
+        assert contour_levels(np.array([20.0, 90.0]), 5).tolist() == [
+            30, 45, 60, 75
+        ]
+        assert contour_levels(np.array([0.0, 1.0]), 3).tolist() == [
+            0.25, 0.5, 0.75
+        ]
+
+    def test_flat(self):
+        assert len(contour_levels(np.ones(4), 5)) == 0
+        assert len(contour_levels(np.array([np.nan, 1.0]), 5)) == 0
+
+
+class TestContourLines(object):
+
+    def test_peak(self):
+        x, y = _grid(5)
+        z = np.zeros((5, 5))
+        z[2, 2] = 1
+        lines = contour_lines(z, x, y, 0.5)
+        assert len(lines) == 1
+        assert (lines[0][0] == lines[0][-1]).all()
+        assert sorted(map(tuple, lines[0][:-1].tolist())) == [
+            (1.5, 2.0), (2.0, 1.5), (2.0, 2.5), (2.5, 2.0)
+        ]
+        assert _area(lines[0]) == 0.5
+
+    def test_open_line(self):
+        x, y = _grid(4)
+        z = np.zeros((4, 4))
+        z[:, :2] = 1
+        lines = contour_lines(z, x, y, 0.5)
+        assert len(lines) == 1
+        assert lines[0][:, 0].tolist() == [1.5] * 4
+        assert sorted(lines[0][:, 1].tolist()) == [0, 1, 2, 3]
+
+    def test_saddle(self):
+        x, y = _grid(2)
+        z = np.array([[1.0, 0.0], [0.0, 1.0]])
+        high = contour_lines(z, x, y, 0.6)
+        assert len(high) == 2
+        # below the center value, the high corners are connected
+        low = contour_lines(z, x, y, 0.4)
+        assert sorted(tuple(sorted(map(tuple, line.tolist())))
+                      for line in low) == [
+            ((0.0, 0.6), (0.4, 1.0)), ((0.6, 0.0), (1.0, 0.4))
+        ]
+        assert sorted(tuple(sorted(map(tuple, line.tolist())))
+                      for line in high) == [
+            ((0.0, 0.4), (0.4, 0.0)), ((0.6, 1.0), (1.0, 0.6))
+        ]
+
+    def test_nan(self):
+        x, y = _grid(3)
+        z = np.ones((3, 3))
+        z[1, 1] = -np.inf
+        lines = contour_lines(z, x, y, 0.5)
+        assert len(lines) == 1
+        assert _area(lines[0]) < 0
+        # NaN is masked: no lines through the cells around it
+        z[1, 1] = np.nan
+        assert contour_lines(z, x, y, 0.5) == []
+        x, y = _grid(4)
+        z = np.zeros((4, 4))
+        z[:, 2:] = 1
+        z[0, 0] = np.nan
+        lines = contour_lines(z, x, y, 0.5)
+        assert len(lines) == 1
+        assert lines[0][:, 0].tolist() == [1.5] * 4
+
+
+class TestContourPolygons(object):
+
+    def test_hole(self):
+        x, y = _grid()
+        z = np.zeros((7, 7))
+        z[1:6, 1:6] = 1
+        z[3, 3] = 0
+        polygons = contour_polygons(z, x, y, 0.5)
+        assert len(polygons) == 1
+        exterior, hole = polygons[0]
+        assert _area(exterior) > 0
+        assert _area(hole) == -0.5
+        # a 5x5 square with its corners cut, less the hole
+        assert _area(exterior) + _area(hole) == pytest.approx(24.0)
+
+    def test_clipped_to_grid(self):
+        x, y = _grid(4)
+        z = np.zeros((4, 4))
+        z[:, :2] = 1
+        (exterior,), = contour_polygons(z, x, y, 0.5)
+        assert exterior[:, 0].min() == 0
+        assert exterior[:, 1].min() == 0
+        assert exterior[:, 1].max() == 3
+        assert _area(exterior) == 4.5
+
+    def test_clipped_to_nan(self):
+        x, y = _grid(4)
+        z = np.ones((4, 4))
+        z[:, 2:] = np.nan
+        (exterior,), = contour_polygons(z, x, y, 0.5)
+        # up to the last column with values
+        assert exterior[:, 0].max() == 1
+        assert _area(exterior) == 3.0
+
+    def test_separate(self):
+        x, y = _grid()
+        z = np.zeros((7, 7))
+        z[1, 1] = z[5, 5] = 1
+        assert len(contour_polygons(z, x, y, 0.5)) == 2
+        assert contour_polygons(z, x, y, 2) == []
+
+
+class TestContourSet(object):
+
+    def _set(self):
+        x, y = np.linspace(0, 60, 31), np.linspace(0, 40, 21)
+        gx, gy = np.meshgrid(x, y)
+        z = np.sin(gx / 10.0) * np.cos(gy / 8.0)
+        return ContourSet.compute(z, x, y, contour_levels(z, 4))
+
+    def test_round_trip(self):
+        cs = self._set()
+        res = ContourSet.from_array(cs.to_array())
+        assert res.levels == cs.levels
+        for a, b in zip(res.lines + res.polygons, cs.lines + cs.polygons):
+            assert len(a) == len(b)
+        for a, b in zip(res.lines, cs.lines):
+            assert all((la == lb).all() for la, lb in zip(a, b))
+        for a, b in zip(res.polygons, cs.polygons):
+            for pa, pb in zip(a, b):
+                assert all((ra == rb).all() for ra, rb in zip(pa, pb))
+
+    def test_geojson(self):
+        cs = self._set()
+        geojson = cs.to_geojson({'metric': 'm'})
+        assert geojson['type'] == 'FeatureCollection'
+        features = geojson['features']
+        assert len(features) == 2 * len(cs.levels)
+        line, area = features[:2]
+        assert line['geometry']['type'] == 'MultiLineString'
+        assert area['geometry']['type'] == 'MultiPolygon'
+        assert line['properties'] == {
+            'metric': 'm', 'level': cs.levels[0], 'kind': 'line'
+        }
+        assert area['properties']['kind'] == 'area'
+        ring = area['geometry']['coordinates'][0][0]
+        assert ring[0] == ring[-1]
+        assert len(line['geometry']['coordinates']) == len(cs.lines[0])
@@ -0,0 +1,84 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import numpy as np
+from matplotlib.image import imsave
+
+from wifi_survey_heatmap.floorplan import FloorplanCache
+
+
+def _floorplan(tmpdir):
+    rng = np.random.RandomState(0)
+    img = rng.randint(0, 256, size=(300, 520, 4)).astype(np.uint8)
+    img[:, :, 3] = 255
+    fname = str(tmpdir.join('plan.png'))
+    imsave(fname, img)
+    return fname, img
+
+
+class TestFloorplanCache(object):
+
+    def test_levels(self, tmpdir):
+        fname, img = _floorplan(tmpdir)
+        fp = FloorplanCache(path=str(tmpdir.join('cache'))).get(fname)
+        assert (fp.width, fp.height) == (520, 300)
+        assert [x.shape for x in fp.levels] == [
+            (300, 520, 4), (150, 260, 4), (75, 130, 4)
+        ]
+        assert fp.levels[0].dtype == np.uint8
+        assert np.array_equal(fp.levels[0], img)
+        assert fp.level_for(100, 70) is fp.levels[2]
+        assert fp.level_for(100, 100) is fp.levels[1]
+        assert fp.level_for(200, 100) is fp.levels[1]
+        assert fp.level_for(1000, 1000) is fp.levels[0]
+
+    def test_cached(self, tmpdir):
+        fname, img = _floorplan(tmpdir)
+        cache = FloorplanCache(path=str(tmpdir.join('cache')))
+        first = cache.get(fname)
+        second = cache.get(fname)
+        assert first.digest == second.digest
+        assert isinstance(second.levels[0], np.memmap)
+        assert np.array_equal(second.levels[0], img)
+        assert len(tmpdir.join('cache').listdir()) == 1
+
+    def test_unwritable_cache(self, tmpdir):
+        fname, img = _floorplan(tmpdir)
+        blocker = tmpdir.join('cache')
+        blocker.write('not a directory')
+        fp = FloorplanCache(path=str(blocker)).get(fname)
+        assert np.array_equal(fp.levels[0], img)
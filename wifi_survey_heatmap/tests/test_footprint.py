@@ -0,0 +1,110 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import numpy as np
+import pytest
+
+from wifi_survey_heatmap.footprint import Footprint
+from wifi_survey_heatmap.synthetic import synthetic_floorplan, write_floorplan
+
+
+def l_shaped(width=400, height=300, wall=4):
+    """
+    Synthetic floorplan without its top right quarter; the walls around
+    that quarter have door gaps to it.
+    """
+    img = synthetic_floorplan(width, height, rooms=(2, 2), wall=wall)
+    img[:height // 2, width // 2 + wall:] = 255
+    return img
+
+
+class TestFromFloorplan(object):
+
+    def test_background(self):
+        fp = Footprint.from_floorplan(l_shaped())
+        assert fp.coverage == pytest.approx(0.75, abs=0.01)
+        # the cut out quarter, rooms of the background color, and walls
+        assert not fp.mask[50, 300]
+        assert fp.mask[50, 100] and fp.mask[250, 300]
+        assert fp.mask[150, 100]
+
+    def test_transparency(self):
+        img = l_shaped()
+        img[:150, 204:, 3] = 0
+        fp = Footprint.from_floorplan(img)
+        assert (fp.mask == (img[..., 3] == 255)).all()
+
+    def test_whole_image(self):
+        fp = Footprint.from_floorplan(synthetic_floorplan(200, 100))
+        assert fp.mask.all()
+
+    def test_downscaled(self):
+        fp = Footprint.from_floorplan(l_shaped()[::2, ::2], 400, 300)
+        assert fp.mask.shape == (150, 200)
+        assert (fp.width, fp.height) == (400, 300)
+        assert fp.coverage == pytest.approx(0.75, abs=0.01)
+
+
+class TestFromImage(object):
+
+    def test_white_inside(self, tmpdir):
+        img = np.zeros((30, 40, 4), dtype=np.uint8)
+        img[..., 3] = 255
+        img[10:, :20, :3] = 255
+        write_floorplan(str(tmpdir.join('mask.png')), img)
+        fp = Footprint.from_image(str(tmpdir.join('mask.png')), 400, 300)
+        assert fp.mask.sum() == 20 * 20
+        assert fp.mask[10, 0] and not fp.mask[9, 0]
+
+
+class TestGrid(object):
+
+    def test_grown_by_one_cell(self):
+        mask = np.zeros((100, 100), dtype=bool)
+        mask[:, :50] = True
+        fp = Footprint(mask, 100, 100)
+        # cells at x = 0, 25, 50, 75, 100
+        inside = fp.grid(5, 2, 100, 100).reshape((2, 5))
+        assert inside.tolist() == [[True, True, True, False, False]] * 2
+
+    def test_digest(self):
+        mask = np.ones((10, 10), dtype=bool)
+        assert Footprint(mask, 10, 10).digest == \
+            Footprint(mask.copy(), 10, 10).digest
+        mask[0, 0] = False
+        assert Footprint(mask, 10, 10).digest != \
+            Footprint(~mask, 10, 10).digest
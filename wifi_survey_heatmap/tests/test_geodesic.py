@@ -0,0 +1,126 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import numpy as np
+import pytest
+
+from wifi_survey_heatmap.cache import GridCache
+from wifi_survey_heatmap.geodesic import (
+    GeodesicFields, GeodesicInterpolator, wall_mask
+)
+
+
+def _walls():
+    """
+    Mask of a 200x100 plan split in two rooms by a vertical wall at
+    ``x=100``, with a door at its bottom.
+    """
+    walls = np.zeros((100, 200), dtype=bool)
+    walls[:80, 96:104] = True
+    return walls
+
+
+class TestWallMask(object):
+
+    def test_mask(self):
+        img = np.full((4, 4, 4), 255, dtype=np.uint8)
+        img[0, :, :3] = 0
+        img[1, :, :3] = 200
+        img[2, :, :3] = 0
+        img[2, :, 3] = 0
+        assert wall_mask(img).tolist() == [
+            [True] * 4, [False] * 4, [False] * 4, [False] * 4
+        ]
+
+
+class TestGeodesicFields(object):
+
+    def test_around_wall(self):
+        fields = GeodesicFields(_walls(), 'd')
+        assert fields.shape == (13, 25)
+        dist = fields.distances(
+            fields.fields([50], [20]), [150, 50, 150], [20, 60, 92]
+        )[:, 0]
+        # through the door rather than the wall
+        assert dist[0] > 150
+        # open space is about straight-line, to within the node spacing
+        assert dist[1] == pytest.approx(40, abs=4)
+        assert dist[2] < dist[0]
+
+    def test_cached(self, tmpdir, monkeypatch):
+        cache = GridCache(str(tmpdir))
+        a = GeodesicFields(_walls(), 'd', cache=cache).fields(
+            [10, 190], [10, 90]
+        )
+        monkeypatch.setattr(
+            GeodesicFields, '_solve',
+            lambda *args: pytest.fail('fields not cached')
+        )
+        b = GeodesicFields(_walls(), 'd', cache=cache).fields(
+            [190, 10], [90, 10]
+        )
+        assert (a == b[:, ::-1]).all()
+
+
+class TestGeodesicInterpolator(object):
+
+    def test_walls(self):
+        fields = GeodesicFields(_walls(), 'd')
+        x, y = [20, 80, 120, 180], [20, 20, 20, 20]
+        interp = GeodesicInterpolator(x, y, [90.0, 90.0, 30.0, 30.0], fields)
+        assert interp(np.array(x), np.array(y)) == pytest.approx(
+            [90, 90, 30, 30]
+        )
+        # either side of the wall keeps the value of its own room
+        res = interp(np.array([92.0, 108.0]), np.array([20.0, 20.0]))
+        assert res[0] > 80 and res[1] < 40
+
+    def test_columns_and_duplicates(self):
+        fields = GeodesicFields(_walls(), 'd')
+        values = np.array([[1.0, 2.0], [3.0, 4.0], [3.0, 4.0]])
+        interp = GeodesicInterpolator(
+            [20, 150, 150], [50, 50, 50], values, fields
+        )
+        res = interp(np.array([[20.0, 150.0]]), np.array([[50.0, 50.0]]))
+        assert res.shape == (1, 2, 2)
+        assert res[0] == pytest.approx(values[:2])
+
+    def test_length_mismatch(self):
+        with pytest.raises(ValueError):
+            GeodesicInterpolator(
+                [1, 2], [1], [1.0, 2.0], GeodesicFields(_walls(), 'd')
+            )
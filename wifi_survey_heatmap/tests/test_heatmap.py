@@ -0,0 +1,516 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from wifi_survey_heatmap.heatmap import (
+    BatchGenerator, HeatMapGenerator, expand_titles
+)
+from wifi_survey_heatmap.interpolation import RbfInterpolator
+from wifi_survey_heatmap.synthetic import (
+    write_floorplan, write_synthetic_survey
+)
+from wifi_survey_heatmap.tests.test_footprint import l_shaped
+
+
+class TestExpandTitles(object):
+
+    def test_globs(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        for name in ['b.json', 'a.json', 'c.txt']:
+            tmpdir.join(name).write('{}')
+        assert expand_titles(['*.json', 'site', 'x*.json']) == [
+            'a.json', 'b.json', 'site'
+        ]
+
+
+class TestBatchGenerator(object):
+
+    def test_summary_of_failed_surveys(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.join('empty.json').write('{"img_path": "plan.png"}')
+        batch = BatchGenerator(
+            ['missing', 'empty.json'], 1, None, False, 'RdYlBu_r', None
+        )
+        assert batch.generate() is False
+        assert list(batch.summary.keys()) == ['missing.json', 'empty.json']
+        assert batch.summary['empty.json']['error'] == 'aborted'
+        assert batch.summary['missing.json']['error'] is not None
+        summary = batch.format_summary()
+        assert summary.splitlines()[0].split() == [
+            'Survey', 'Plots', 'Failed', 'Interp', '[s]', 'Render', '[s]'
+        ]
+        assert 'empty.json failed: aborted' in summary
+
+
+class TestBssMaps(object):
+
+    def test_bss_maps(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_synthetic_survey('site', 30, 400, 300, bssids=5, iperf=False)
+        fits = []
+
+        class Spy(RbfInterpolator):
+            def __init__(self, x, y, values, **kwargs):
+                fits.append(np.asarray(values).shape)
+                super(Spy, self).__init__(x, y, values, **kwargs)
+
+        monkeypatch.setattr(
+            'wifi_survey_heatmap.heatmap.RbfInterpolator', Spy
+        )
+        gen = HeatMapGenerator(
+            None, 'site', False, 'RdYlBu_r', None, cache=False,
+            bss_maps=True, overlap_threshold=-70.0
+        )
+        a = gen._prepare()
+        bss = gen._bss_keys
+        assert 1 < len(bss) <= 5
+        assert all(k.startswith('bss_') and k in gen.graphs for k in bss)
+        assert gen.graphs['ap_overlap'] == 'APs above -70 dBm'
+        assert 'best_server' in gen.graphs
+        tasks = {t[0]: t for t in gen._render_tasks(a)}
+        # all BSSes are valid at the same points, and share one solve
+        assert len(a.groups(bss)) == 1
+        assert len([shape for shape in fits if shape[1] >= len(bss)]) == 1
+        interpolated = [
+            k for k in gen._metric_keys(a)
+            if k not in gen.BSS_SUMMARY_GRAPHS
+        ]
+        assert len(fits) == len(a.groups(interpolated))
+        signal = np.column_stack([tasks[k][2] for k in bss])
+        assert (tasks['best_server'][2] == signal.argmax(axis=1)).all()
+        assert (
+            tasks['ap_overlap'][2] == (signal > -70.0).sum(axis=1)
+        ).all()
+        # and at the points
+        assert (
+            a.metric('best_server')[2] ==
+            np.column_stack([a.metric(k)[2] for k in bss]).argmax(axis=1)
+        ).all()
+
+
+class TestParallel(object):
+
+    def test_same_as_serial(self, tmpdir, monkeypatch):
+        plot = HeatMapGenerator._plot
+
+        def failing_plot(self, a, key, *args):
+            if key == 'tx_power':
+                raise ValueError('broken')
+            return plot(self, a, key, *args)
+
+        # inherited by the forked worker processes
+        monkeypatch.setattr(HeatMapGenerator, '_plot', failing_plot)
+        results = {}
+        for jobs in (1, 2):
+            path = tmpdir.mkdir('jobs%d' % jobs)
+            monkeypatch.chdir(path)
+            write_synthetic_survey('site', 15, 120, 80, bssids=3)
+            gen = HeatMapGenerator(
+                None, 'site', True, 'RdYlBu_r', 4, cache=False, jobs=jobs
+            )
+            results[jobs] = gen.generate()
+        plots, failed = results[1]
+        assert failed == ['tx_power']
+        assert results[2][0] == plots
+        assert sorted(results[2][1]) == failed
+        serial, parallel = tmpdir.join('jobs1'), tmpdir.join('jobs2')
+        # plots and channel graphs, but not the floorplan
+        names = sorted(p.basename for p in serial.listdir('*_site.json.png'))
+        assert len(names) == plots + 2
+        assert 'channels24_site.json.png' in names
+        assert names == sorted(
+            p.basename for p in parallel.listdir('*_site.json.png')
+        )
+        for name in names:
+            assert serial.join(name).read_binary() == \
+                parallel.join(name).read_binary(), name
+
+
+class TestProgressive(object):
+
+    def _tasks(self, **kwargs):
+        gen = HeatMapGenerator(
+            None, 'site', False, 'RdYlBu_r', None, backend='raster',
+            cache=False, **kwargs
+        )
+        a = gen._prepare()
+        return gen, a, {t[0]: t for t in gen._render_tasks(a)}
+
+    def test_same_as_full_grid(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_synthetic_survey('site', 30, 400, 300, iperf=False)
+        full = self._tasks()[2]
+        gen, a, tasks = self._tasks(progressive=True)
+        for key, task in full.items():
+            if task[2] is None:
+                continue
+            assert tasks[key][3:5] == task[3:5]
+            assert np.allclose(tasks[key][2], task[2])
+
+    def test_refine_tolerance(self, tmpdir, monkeypatch, caplog):
+        monkeypatch.chdir(tmpdir)
+        write_synthetic_survey('site', 30, 400, 300, iperf=False)
+        full = self._tasks()[2]
+        caplog.set_level('INFO')
+        gen, a, tasks = self._tasks(progressive=True, refine_tolerance=0.05)
+        refined = [
+            r.args for r in caplog.records
+            if r.getMessage().startswith('Stage')
+        ]
+        # every stage after the first two refines only part of the grid,
+        # where the previous one changed
+        assert len(refined) == len(gen.PROGRESSIVE_STAGES) - 1
+        assert all(count < total for _, count, total in refined)
+        for key in ['signal_quality', 'channel_bitrate']:
+            span = np.ptp(a.metric(key)[2])
+            assert span > 0
+            err = np.abs(tasks[key][2] - full[key][2]).max()
+            assert 0 < err <= 0.05 * span
+
+    def test_previews(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_synthetic_survey('site', 30, 400, 300, iperf=False)
+        gen, a, tasks = self._tasks(progressive=True)
+        preview = tmpdir.join('signal_quality_site.json.preview.png')
+        assert preview.check()
+        assert tmpdir.join('tx_power_site.json.preview.png').check()
+        # removed once the final heatmap is written
+        assert gen._plot(a, *tasks['signal_quality'])
+        assert not preview.check()
+        assert tmpdir.join('signal_quality_site.json.png').check()
+        assert gen.generate() == (5, [])
+        assert tmpdir.listdir('*.preview.png') == []
+
+
+class TestInterpolationFailures(object):
+
+    def test_failed_group(self, tmpdir, monkeypatch, caplog):
+        monkeypatch.chdir(tmpdir)
+        write_synthetic_survey('site', 10, 120, 80)
+        # a point without TCP upload, which is then interpolated separately
+        with open('site.json') as fh:
+            survey = json.load(fh)
+        del survey['survey_points'][0]['result']['tcp']
+        with open('site.json', 'w') as fh:
+            json.dump(survey, fh)
+        group_interpolator = HeatMapGenerator._group_interpolator
+
+        def failing(self, x, y, values):
+            if values.shape[1] > 1:
+                raise ValueError('broken')
+            return group_interpolator(self, x, y, values)
+
+        monkeypatch.setattr(
+            HeatMapGenerator, '_group_interpolator', failing
+        )
+        gen = HeatMapGenerator(
+            None, 'site', False, 'RdYlBu_r', None, backend='raster',
+            cache=False
+        )
+        a = gen._prepare()
+        keys = gen._metric_keys(a)
+        groups = a.groups(keys)
+        assert 1 < len(groups) < len(keys)
+        single = [g[0] for g in groups if len(g) == 1]
+        plots, failed = gen.generate()
+        # the metrics of the failed groups only
+        assert plots == len(single)
+        assert sorted(failed) == sorted(k for k in keys if k not in single)
+        assert 'Cannot interpolate' in caplog.text
+
+    def test_duplicate_points(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_synthetic_survey('site', 10, 120, 80, iperf=False)
+        with open('site.json') as fh:
+            survey = json.load(fh)
+        points = survey['survey_points']
+        points[1]['x'], points[1]['y'] = points[0]['x'], points[0]['y']
+        with open('site.json', 'w') as fh:
+            json.dump(survey, fh)
+        gen = HeatMapGenerator(
+            None, 'site', False, 'RdYlBu_r', None, backend='raster',
+            cache=False
+        )
+        plots, failed = gen.generate()
+        assert plots == 0
+        assert 'signal_quality' in failed
+
+
+class TestProfile(object):
+
+    def test_stages(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        monkeypatch.setenv('WIFI_HEATMAP_CACHE_DIR', str(tmpdir.join('c')))
+        write_synthetic_survey('site', 20, 120, 80, iperf=False)
+        gen = HeatMapGenerator(
+            None, 'site', False, 'RdYlBu_r', None, backend='raster',
+            profile=True
+        )
+        assert gen.generate() == (5, [])
+        stages = [k[0] for k in gen.profiler.records.keys()]
+        assert stages[:7] == [
+            'load_survey', 'load_floorplan', 'survey_data', 'channel_graphs',
+            'grid_cache', 'interpolate', 'interpolate/solve'
+        ]
+        assert ('plot/raster', 'signal_quality') in gen.profiler.records
+
+    def test_batch(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        monkeypatch.setenv('WIFI_HEATMAP_CACHE_DIR', str(tmpdir.join('c')))
+        for title in ['a', 'b']:
+            write_synthetic_survey(title, 10, 120, 80, iperf=False)
+        batch = BatchGenerator(
+            ['a', 'b'], 1, None, False, 'RdYlBu_r', None, backend='raster',
+            profile=True
+        )
+        assert batch.generate() is True
+        assert batch.profiler.records[('load_survey', None)]['calls'] == 2
+
+    def test_disabled(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_synthetic_survey('site', 10, 120, 80, iperf=False)
+        gen = HeatMapGenerator(None, 'site', False, 'RdYlBu_r', None)
+        assert gen.profiler.enabled is False
+
+
+class TestContours(object):
+
+    def test_geojson_and_cache(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        monkeypatch.setenv('WIFI_HEATMAP_CACHE_DIR', str(tmpdir.join('c')))
+        write_synthetic_survey('site', 20, 120, 80, iperf=False)
+
+        def tasks():
+            gen = HeatMapGenerator(
+                None, 'site', False, 'RdYlBu_r', 4, backend='raster',
+                geojson=True, profile=True
+            )
+            res = {t[0]: t for t in gen._render_tasks(gen._prepare())}
+            return gen, res
+
+        gen, res = tasks()
+        contours = res['signal_quality'][5]
+        assert 1 <= len(contours.levels) <= 5
+        assert gen.profiler.records[('contour', None)]['calls'] == 1
+        assert gen._plot(gen.load_data(), *res['signal_quality'])
+        with open('signal_quality_site.json.geojson') as fh:
+            geojson = json.load(fh)
+        assert geojson['bbox'] == [0, 0, 120, 80]
+        assert len(geojson['features']) == 2 * len(contours.levels)
+        # the second run takes the contours from the grid cache
+        monkeypatch.setattr(
+            HeatMapGenerator, '_contour_set',
+            lambda *args: pytest.fail('contours not cached')
+        )
+        cached = tasks()[1]['signal_quality'][5]
+        assert cached.levels == contours.levels
+        assert len(cached.lines[0]) == len(contours.lines[0])
+
+    def test_no_contours(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_synthetic_survey('site', 10, 120, 80, iperf=False)
+        gen = HeatMapGenerator(
+            None, 'site', False, 'RdYlBu_r', None, cache=False
+        )
+        assert all(t[5] is None for t in gen._render_tasks(gen._prepare()))
+
+
+class TestShowPoints(object):
+
+    def test_annotations_reused(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_synthetic_survey('site', 10, 120, 80, iperf=False)
+        gen = HeatMapGenerator(
+            None, 'site', True, 'RdYlBu_r', None, cache=False, profile=True
+        )
+        assert gen.generate() == (5, [])
+        assert gen._annotations is not None
+        assert gen.profiler.records[
+            ('plot/annotate', 'signal_quality')
+        ]['calls'] == 1
+        assert tmpdir.join('signal_quality_site.json.png').check()
+
+
+class TestFootprint(object):
+
+    def _generator(self, tmpdir, monkeypatch, **kwargs):
+        monkeypatch.chdir(tmpdir)
+        monkeypatch.setenv('WIFI_HEATMAP_CACHE_DIR', str(tmpdir.join('c')))
+        write_synthetic_survey('site', 30, 400, 300, iperf=False)
+        write_floorplan('site.png', l_shaped())
+        return HeatMapGenerator(
+            None, 'site', False, 'RdYlBu_r', 4, backend='raster', **kwargs
+        )
+
+    def test_outside_not_interpolated(self, tmpdir, monkeypatch):
+        gen = self._generator(
+            tmpdir, monkeypatch, footprint='auto', profile=True
+        )
+        tasks = {t[0]: t for t in gen._render_tasks(gen._prepare())}
+        _, _, z, num_x, num_y, contours = tasks['signal_quality']
+        z = z.reshape((num_y, num_x))
+        assert np.isnan(z[:num_y // 2 - 2, num_x // 2 + 2:]).all()
+        assert np.isfinite(z[num_y // 2 + 2:]).all()
+        assert np.isfinite(z[:, :num_x // 2]).all()
+        assert np.isnan(z).mean() == pytest.approx(0.25, abs=0.05)
+        # no contour lines along the edge of the footprint
+        for lines in contours.lines:
+            for line in lines:
+                assert not (
+                    (line[:, 0] > 210) & (line[:, 1] < 140)
+                ).any()
+        assert gen._plot(gen.load_data(), *tasks['signal_quality'])
+        assert gen.profiler.records[('footprint', None)]['calls'] == 1
+
+    def test_cache(self, tmpdir, monkeypatch):
+        gen = self._generator(tmpdir, monkeypatch)
+        plain = gen._grid_cache_key(gen._prepare(), 'signal_quality', 10, 8)
+        gen = HeatMapGenerator(
+            None, 'site', False, 'RdYlBu_r', None, footprint='auto'
+        )
+        a = gen._prepare()
+        key = gen._grid_cache_key(a, 'signal_quality', 10, 8)
+        assert key != plain
+        # the derived footprint is cached with the grids
+        monkeypatch.setattr(
+            'wifi_survey_heatmap.footprint.Footprint.from_floorplan',
+            lambda *args: pytest.fail('footprint not cached')
+        )
+        gen = HeatMapGenerator(
+            None, 'site', False, 'RdYlBu_r', None, footprint='auto'
+        )
+        assert gen._grid_cache_key(
+            gen._prepare(), 'signal_quality', 10, 8
+        ) == key
+
+    def test_mask_array(self, tmpdir, monkeypatch):
+        mask = np.zeros((300, 400), dtype=bool)
+        mask[:, :100] = True
+        gen = self._generator(tmpdir, monkeypatch, footprint=mask)
+        gen._prepare()
+        num_x, num_y, _, _ = gen._grid()
+        inside = gen._grid_mask(num_x, num_y).reshape((num_y, num_x))
+        assert inside[:, :25].all() and not inside[:, 30:].any()
+
+
+class TestGeodesic(object):
+
+    def test_fields_cached(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        monkeypatch.setenv('WIFI_HEATMAP_CACHE_DIR', str(tmpdir.join('c')))
+        write_synthetic_survey('site', 20, 400, 300, iperf=False)
+        write_floorplan('site.png', l_shaped())
+
+        def generator():
+            return HeatMapGenerator(
+                None, 'site', False, 'RdYlBu_r', None, backend='raster',
+                method='geodesic', profile=True
+            )
+
+        gen = generator()
+        assert gen.generate() == (5, [])
+        assert gen.profiler.records[
+            ('interpolate/solve/distance_fields', None)
+        ]['calls'] == 1
+        key = gen._grid_cache_key(gen._prepare(), 'signal_quality', 10, 8)
+        # the fields are reused from the cache for new interpolations
+        monkeypatch.setattr(
+            'wifi_survey_heatmap.geodesic.GeodesicFields._solve',
+            lambda *args: pytest.fail('fields not cached')
+        )
+        gen = generator()
+        keys, interp = gen._interpolator(gen._prepare())
+        assert 'signal_quality' in keys
+        # grids depend on the walls of the floorplan
+        write_floorplan('site.png', l_shaped(wall=8))
+        gen = generator()
+        assert gen._grid_cache_key(
+            gen._prepare(), 'signal_quality', 10, 8
+        ) != key
+
+
+class TestKriging(object):
+
+    def test_uncertainty_graphs(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        monkeypatch.setenv('WIFI_HEATMAP_CACHE_DIR', str(tmpdir.join('c')))
+        write_synthetic_survey('site', 30, 400, 300, iperf=False)
+
+        def generator():
+            gen = HeatMapGenerator(
+                None, 'site', False, 'RdYlBu_r', None, backend='raster',
+                method='kriging', profile=True
+            )
+            return gen, gen._prepare()
+
+        gen, a = generator()
+        keys = list(gen.graphs.keys())
+        assert keys[:3] == [
+            'signal_quality', 'signal_quality_uncertainty', 'tx_power'
+        ]
+        tasks = {t[0]: t for t in gen._render_tasks(a)}
+        # computed in the same pass as the values
+        assert gen.profiler.records[('interpolate/solve', None)]['calls'] == 1
+        z = tasks['signal_quality_uncertainty'][2]
+        assert z.shape == tasks['signal_quality'][2].shape
+        assert (z >= 0).all() and z.max() > 0
+        assert gen._value_range(a, 'signal_quality_uncertainty') == (
+            0.0, pytest.approx(a.metric('signal_quality')[2].std())
+        )
+        assert gen._plot(a, *tasks['signal_quality_uncertainty'])
+        assert tmpdir.join('signal_quality_uncertainty_site.json.png').check()
+        # both are taken from the grid cache
+        gen, a = generator()
+        monkeypatch.setattr(
+            HeatMapGenerator, '_interpolate',
+            lambda *args: pytest.fail('grids not cached')
+        )
+        cached = {t[0]: t for t in gen._render_tasks(a)}
+        assert (cached['signal_quality_uncertainty'][2] == z).all()
+
+    def test_other_methods(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_synthetic_survey('site', 10, 120, 80, iperf=False)
+        gen = HeatMapGenerator(
+            None, 'site', False, 'RdYlBu_r', None, cache=False
+        )
+        gen._prepare()
+        assert not any(k.endswith('_uncertainty') for k in gen.graphs)
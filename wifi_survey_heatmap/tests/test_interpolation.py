@@ -0,0 +1,298 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import numpy as np
+import pytest
+from scipy.interpolate import Rbf
+
+from wifi_survey_heatmap.interpolation import (
+    InterpolatedGrid, LocalKrigingInterpolator, LocalRbfInterpolator,
+    RbfInterpolator, StackedInterpolator, compare_with_exact
+)
+
+
+def _survey(n=400, seed=0):
+    rng = np.random.RandomState(seed)
+    x = rng.uniform(0, 1000, n)
+    y = rng.uniform(0, 800, n)
+    z = -50 - 20 * np.sin(x / 200.0) * np.cos(y / 150.0)
+    return x, y, z
+
+
+class TestLocalRbfInterpolator(object):
+
+    def test_reproduces_measurements(self):
+        x, y, z = _survey()
+        res = LocalRbfInterpolator(x, y, z, neighbors=32)(x, y)
+        assert np.abs(res - z).max() < 0.5
+
+    def test_close_to_exact_inside_survey(self):
+        x, y, z = _survey()
+        gx, gy = np.meshgrid(
+            np.linspace(100, 900, 60), np.linspace(100, 700, 50)
+        )
+        res = LocalRbfInterpolator(x, y, z, neighbors=32)(gx, gy)
+        assert res.shape == gx.shape
+        exact = Rbf(x, y, z, function='linear')(gx, gy)
+        assert np.sqrt(((res - exact) ** 2).mean()) < 0.5
+
+    def test_multiple_metrics(self):
+        x, y, z = _survey()
+        values = np.column_stack([z, -z])
+        gx = np.linspace(0, 1000, 40)
+        gy = np.linspace(0, 800, 40)
+        res = LocalRbfInterpolator(x, y, values, neighbors=16)(gx, gy)
+        single = LocalRbfInterpolator(x, y, z, neighbors=16)(gx, gy)
+        assert res.shape == (40, 2)
+        assert np.allclose(res[:, 0], single)
+        assert np.allclose(res[:, 1], -single)
+
+    def test_duplicate_points(self):
+        x = np.array([0.0, 0.0, 10.0, 10.0, 5.0])
+        y = np.array([0.0, 0.0, 0.0, 10.0, 5.0])
+        z = np.array([1.0, 1.0, 2.0, 3.0, 2.0])
+        res = LocalRbfInterpolator(x, y, z, neighbors=5)(x, y)
+        assert np.all(np.isfinite(res))
+
+    def test_fewer_points_than_neighbors(self):
+        x, y, z = _survey(n=3)
+        res = LocalRbfInterpolator(x, y, z, neighbors=32)(x, y)
+        assert np.allclose(res, z)
+
+    def test_incremental_matches_refit(self):
+        x, y, z = _survey(n=300)
+        interp = LocalRbfInterpolator(x, y, z, neighbors=16)
+        spacing = interp._spacing
+        interp.add_point(500.5, 400.5, 3.0)
+        interp.remove_point(10)
+        interp.move_point(20, 300.0, 300.0)
+        x = np.delete(np.append(x, 500.5), 10)
+        y = np.delete(np.append(y, 400.5), 10)
+        z = np.delete(np.append(z, 3.0), 10)
+        x = np.append(np.delete(x, 20), 300.0)
+        y = np.append(np.delete(y, 20), 300.0)
+        z = np.append(np.delete(z, 20), z[20])
+        fresh = LocalRbfInterpolator(x, y, z, neighbors=16, spacing=spacing)
+        gx, gy = np.meshgrid(np.linspace(0, 1000, 40), np.linspace(0, 800, 30))
+        assert np.allclose(interp(gx, gy), fresh(gx, gy))
+
+    def test_add_point_returns_local_region(self):
+        x, y, z = _survey(n=300)
+        interp = LocalRbfInterpolator(x, y, z, neighbors=16)
+        xmin, ymin, xmax, ymax = interp.add_point(500.0, 400.0, 3.0)
+        assert xmin < 500.0 < xmax
+        assert ymin < 400.0 < ymax
+        assert xmax - xmin < 1000.0
+
+
+class TestLocalKrigingInterpolator(object):
+
+    def test_reproduces_measurements(self):
+        x, y, z = _survey()
+        res = LocalKrigingInterpolator(x, y, z, neighbors=32)(x, y)
+        assert np.abs(res - z).max() < 0.5
+
+    def test_uncertainty(self):
+        x, y, z = _survey()
+        values = np.column_stack([z, 2 * z])
+        interp = LocalKrigingInterpolator(
+            x, y, values, neighbors=32, uncertainty=True
+        )
+        gx, gy = np.meshgrid(
+            np.linspace(0, 1000, 60), np.linspace(0, 800, 50)
+        )
+        res = interp(gx, gy)
+        assert res.shape == gx.shape + (4,)
+        # the values are those without uncertainty
+        plain = LocalKrigingInterpolator(x, y, values, neighbors=32)
+        assert np.allclose(res[..., :2], plain(gx, gy))
+        # scaled by the spread of each metric
+        std = res[..., 2:]
+        assert (std >= 0).all()
+        assert np.allclose(std[..., 1], 2 * std[..., 0])
+        assert std[..., 0].max() < 1.5 * z.std()
+        # lower at the measurements than between them
+        at_points = interp(x, y)[:, 2]
+        assert np.median(at_points) < 0.5 * np.median(std[..., 0])
+
+    def test_far_from_measurements(self):
+        x = np.array([0.0, 10.0, 0.0, 10.0])
+        y = np.array([0.0, 0.0, 10.0, 10.0])
+        z = np.array([1.0, 2.0, 3.0, 4.0])
+        interp = LocalKrigingInterpolator(x, y, z, uncertainty=True)
+        near, far = interp(np.array([5.0, 1000.0]), np.array([5.0, 1000.0]))
+        assert near[1] < far[1]
+        # falls back to the estimated mean, with the spread of the values
+        # plus the uncertainty of that mean
+        assert far[0] == pytest.approx(2.5, abs=0.1)
+        assert z.std() < far[1] < 2 * z.std()
+
+    def test_duplicate_points(self):
+        x = np.array([0.0, 0.0, 10.0, 10.0, 5.0])
+        y = np.array([0.0, 0.0, 0.0, 10.0, 5.0])
+        z = np.array([1.0, 1.0, 2.0, 3.0, 2.0])
+        res = LocalKrigingInterpolator(
+            x, y, z, neighbors=5, uncertainty=True
+        )(x, y)
+        assert np.all(np.isfinite(res))
+        assert np.allclose(res[:, 0], z, atol=1e-3)
+
+    def test_incremental_matches_refit(self):
+        x, y, z = _survey(n=300)
+        interp = LocalKrigingInterpolator(
+            x, y, z, neighbors=16, uncertainty=True
+        )
+        interp.add_point(500.5, 400.5, 3.0)
+        interp.remove_point(10)
+        fresh = LocalKrigingInterpolator(
+            np.delete(np.append(x, 500.5), 10),
+            np.delete(np.append(y, 400.5), 10),
+            np.delete(np.append(z, 3.0), 10), neighbors=16,
+            spacing=interp._spacing, length=interp._length, uncertainty=True
+        )
+        gx, gy = np.meshgrid(np.linspace(0, 1000, 40), np.linspace(0, 800, 30))
+        assert np.allclose(interp(gx, gy), fresh(gx, gy))
+
+
+class TestCompareWithExact(object):
+
+    def test_exact_is_zero_error(self):
+        x, y, z = _survey(n=50)
+        gx, gy = np.meshgrid(np.linspace(0, 1000, 20), np.linspace(0, 800, 20))
+        exact = Rbf(x, y, z, function='linear')(gx, gy)
+        max_err, rms_err = compare_with_exact(x, y, z, gx, gy, exact)
+        assert max_err < 1e-6
+        assert rms_err < 1e-6
+
+
+class TestRbfInterpolator(object):
+
+    def test_matches_scipy_rbf(self):
+        x, y, z = _survey(n=100)
+        gx, gy = np.meshgrid(np.linspace(0, 1000, 30), np.linspace(0, 800, 20))
+        res = RbfInterpolator(x, y, z, chunk_size=100)(gx, gy)
+        exact = Rbf(x, y, z, function='linear')(gx, gy)
+        assert res.shape == gx.shape
+        assert np.allclose(res, exact)
+
+    def test_multiple_metrics(self):
+        x, y, z = _survey(n=100)
+        values = np.column_stack([z, 2 * z + 1])
+        gx = np.linspace(0, 1000, 25)
+        gy = np.linspace(0, 800, 25)
+        res = RbfInterpolator(x, y, values)(gx, gy)
+        assert res.shape == (25, 2)
+        for idx in range(2):
+            exact = Rbf(x, y, values[:, idx], function='linear')(gx, gy)
+            assert np.allclose(res[:, idx], exact)
+
+    def test_incremental_matches_scipy_rbf(self):
+        x, y, z = _survey(n=100)
+        interp = RbfInterpolator(x, y, z)
+        assert interp.add_point(123.0, 456.0, 7.0) is None
+        interp.remove_point(5)
+        interp.move_point(0, 10.0, 20.0)
+        x = np.delete(np.append(x, 123.0), 5)
+        y = np.delete(np.append(y, 456.0), 5)
+        z = np.delete(np.append(z, 7.0), 5)
+        x = np.append(x[1:], 10.0)
+        y = np.append(y[1:], 20.0)
+        z = np.append(z[1:], z[0])
+        gx, gy = np.meshgrid(np.linspace(0, 1000, 30), np.linspace(0, 800, 20))
+        exact = Rbf(x, y, z, function='linear')(gx, gy)
+        assert np.allclose(interp(gx, gy), exact)
+
+    def test_duplicate_points(self):
+        x, y, z = _survey(n=20)
+        x[1], y[1] = x[0], y[0]
+        with pytest.raises(np.linalg.LinAlgError):
+            RbfInterpolator(x, y, z)
+        x, y, z = _survey(n=4)
+        x[1], y[1] = x[0], y[0]
+        with pytest.raises(np.linalg.LinAlgError):
+            RbfInterpolator(x, y, z)
+
+    def test_add_duplicate_point(self):
+        x, y, z = _survey(n=20)
+        interp = RbfInterpolator(x, y, z)
+        with pytest.raises(ValueError):
+            interp.add_point(x[3], y[3], 1.0)
+
+
+class TestStackedInterpolator(object):
+
+    def test_concatenates_columns(self):
+        x, y, z = _survey(n=60)
+        first = RbfInterpolator(x, y, np.column_stack([z, -z]))
+        second = RbfInterpolator(x[:30], y[:30], z[:30, None])
+        gx, gy = np.meshgrid(np.linspace(0, 1000, 7), np.linspace(0, 800, 5))
+        res = StackedInterpolator([first, second])(gx, gy)
+        assert res.shape == gx.shape + (3,)
+        assert np.allclose(res[..., :2], first(gx, gy))
+        assert np.allclose(res[..., 2:], second(gx, gy))
+
+
+class TestInterpolatedGrid(object):
+
+    def test_updates_only_changed_region(self):
+        x, y, z = _survey(n=300)
+        grid = InterpolatedGrid(
+            LocalRbfInterpolator(x, y, z, neighbors=16),
+            np.linspace(0, 1000, 101), np.linspace(0, 800, 81)
+        )
+        before = grid.z.copy()
+        rows, cols = grid.add_point(500.0, 400.0, 100.0)
+        assert 0 < rows.start < rows.stop < 81
+        assert 0 < cols.start < cols.stop < 101
+        outside = np.ones(before.shape, dtype=bool)
+        outside[rows, cols] = False
+        assert np.array_equal(grid.z[outside], before[outside])
+        gx, gy = np.meshgrid(grid.x, grid.y)
+        assert np.allclose(grid.z, grid.interpolator(gx, gy))
+
+    def test_global_update(self):
+        x, y, z = _survey(n=50)
+        grid = InterpolatedGrid(
+            RbfInterpolator(x, y, z),
+            np.linspace(0, 1000, 21), np.linspace(0, 800, 11)
+        )
+        rows, cols = grid.remove_point(0)
+        assert (rows.start, rows.stop, cols.start, cols.stop) == (0, 11, 0, 21)
+        exact = Rbf(x[1:], y[1:], z[1:], function='linear')(
+            *np.meshgrid(grid.x, grid.y)
+        )
+        assert np.allclose(grid.z, exact)
@@ -0,0 +1,116 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+
+import numpy as np
+
+from wifi_survey_heatmap.profiling import NULL_PROFILER, Profiler
+
+
+class TestProfiler(object):
+
+    def test_nested(self):
+        p = Profiler()
+        for metric in ['a', 'b', 'a']:
+            with p.stage('plot', metric):
+                with p.stage('savefig'):
+                    data = np.ones(1024 ** 2)
+                del data
+        with p.stage('load'):
+            pass
+        assert list(p.records.keys()) == [
+            ('plot', 'a'), ('plot/savefig', 'a'),
+            ('plot', 'b'), ('plot/savefig', 'b'), ('load', None)
+        ]
+        rec = p.records[('plot', 'a')]
+        assert rec['calls'] == 2
+        assert rec['wall'] >= p.records[('plot/savefig', 'a')]['wall']
+        assert rec['cpu'] >= 0
+        # 8 MiB array
+        assert 7.9 < p.records[('plot/savefig', 'a')]['peak_mb'] < 9
+        assert 7.9 < rec['peak_mb'] < 9
+        assert p.records[('load', None)]['peak_mb'] < 1
+
+    def test_no_memory(self):
+        p = Profiler(memory=False)
+        with p.stage('x'):
+            np.ones(1024 ** 2)
+        assert p.records[('x', None)]['peak_mb'] == 0
+        assert p.format_table().splitlines()[1].split()[-1] == '-'
+
+    def test_merge_take(self):
+        a = Profiler(memory=False)
+        b = Profiler(memory=False)
+        for p in (a, b):
+            with p.stage('x', 'm'):
+                pass
+        with b.stage('y'):
+            pass
+        a.merge(b.take())
+        assert b.records == {}
+        assert a.records[('x', 'm')]['calls'] == 2
+        assert a.records[('y', None)]['calls'] == 1
+
+    def test_report(self, tmpdir):
+        p = Profiler(memory=False)
+        with p.stage('plot', 'signal_quality'):
+            with p.stage('savefig'):
+                pass
+        lines = p.format_table().splitlines()
+        assert lines[0].split() == [
+            'Stage', 'Metric', 'Calls', 'Wall', '[s]', 'CPU', '[s]', 'Peak',
+            '[MB]'
+        ]
+        assert lines[1].startswith('plot ')
+        assert lines[2].startswith('  savefig  signal_quality ')
+        path = str(tmpdir.join('profile.json'))
+        p.write_json(path)
+        with open(path) as fh:
+            report = json.load(fh)
+        assert report['memory'] is False
+        assert [(s['stage'], s['metric']) for s in report['stages']] == [
+            ('plot', 'signal_quality'), ('plot/savefig', 'signal_quality')
+        ]
+
+    def test_null(self):
+        with NULL_PROFILER.stage('x', 'm'):
+            pass
+        NULL_PROFILER.merge({('x', None): {}})
+        assert NULL_PROFILER.records == {}
+        assert NULL_PROFILER.take() == {}
+        assert NULL_PROFILER.enabled is False
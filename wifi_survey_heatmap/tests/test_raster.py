@@ -0,0 +1,123 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import numpy as np
+from matplotlib.image import imread
+from matplotlib.colors import ListedColormap
+
+from wifi_survey_heatmap.raster import (
+    PngWriter, RasterRenderer, colormap_lut, composite, halve, upsample
+)
+
+CMAP = ListedColormap([[0, 0, 1, 1], [1, 0, 0, 1]])
+
+
+class TestPngWriter(object):
+
+    def _roundtrip(self, tmpdir, threaded):
+        rng = np.random.RandomState(0)
+        img = rng.randint(0, 256, size=(37, 23, 4)).astype(np.uint8)
+        fname = str(tmpdir.join('out.png'))
+        writer = PngWriter(fname, 23, 37, compression=1, threaded=threaded)
+        for start in range(0, 37, 10):
+            writer.write(img[start:start + 10])
+        writer.close()
+        res = np.round(imread(fname) * 255).astype(np.uint8)
+        assert np.array_equal(res, img)
+
+    def test_roundtrip(self, tmpdir):
+        self._roundtrip(tmpdir, False)
+
+    def test_roundtrip_threaded(self, tmpdir):
+        self._roundtrip(tmpdir, True)
+
+
+class TestRaster(object):
+
+    def test_colormap_lut(self):
+        lut = colormap_lut(CMAP, size=4)
+        assert lut.shape == (4, 4)
+        assert lut.dtype == np.uint8
+        assert tuple(lut[0]) == (0, 0, 255, 255)
+        assert tuple(lut[-1]) == (255, 0, 0, 255)
+
+    def test_upsample_corners(self):
+        z = np.array([[0.0, 1.0], [2.0, 3.0]])
+        res = upsample(z, np.arange(11), np.arange(11), 10, 10)
+        assert res.shape == (11, 11)
+        assert res[0, 0] == 0.0
+        assert res[0, -1] == 1.0
+        assert res[-1, 0] == 2.0
+        assert res[-1, -1] == 3.0
+        assert np.isclose(res[5, 5], 1.5)
+
+    def test_upsample_nearest(self):
+        z = np.array([[0.0, 1.0], [2.0, 3.0]])
+        res = upsample(z, np.arange(11), np.arange(11), 10, 10, nearest=True)
+        assert set(np.unique(res)) == {0.0, 1.0, 2.0, 3.0}
+        assert res[4, 4] == 0.0
+        assert res[4, 6] == 1.0
+        assert res[6, 4] == 2.0
+
+    def test_halve(self):
+        img = np.arange(3 * 5 * 4, dtype=np.uint8).reshape((3, 5, 4))
+        res = halve(img)
+        assert res.shape == (2, 3, 4)
+        assert tuple(res[0, 0]) == tuple(
+            (img[:2, :2].astype(int).sum(axis=(0, 1)) + 2) // 4
+        )
+        assert tuple(res[-1, -1]) == tuple(img[-1, -1])
+
+    def test_composite(self):
+        values = np.array([[0.0, 10.0, np.nan]])
+        floorplan = np.full((1, 3, 4), 255, dtype=np.uint8)
+        res = composite(values, floorplan, colormap_lut(CMAP), 0, 10, 0.5)
+        assert tuple(res[0, 0]) == (128, 128, 255, 255)
+        assert tuple(res[0, 1]) == (255, 128, 128, 255)
+        assert tuple(res[0, 2]) == (255, 255, 255, 255)
+
+    def test_render(self, tmpdir):
+        fname = str(tmpdir.join('heatmap.png'))
+        floorplan = np.ones((30, 40, 4), dtype=np.float32)
+        z = np.linspace(0, 1, 20).reshape((4, 5))
+        RasterRenderer(CMAP, band_height=7).render(
+            fname, z, floorplan, 0, 1, 40, 29
+        )
+        res = imread(fname)
+        assert res.shape == (30, 40, 4)
+        assert res[0, 0, 2] > res[0, 0, 0]
+        assert res[-1, -1, 0] > res[-1, -1, 2]
@@ -0,0 +1,221 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import numpy as np
+import pytest
+from matplotlib import pyplot as pp
+
+from wifi_survey_heatmap.raster import PNG_SIGNATURE
+from wifi_survey_heatmap.server import HeatmapServer, HeatmapService, LRUCache
+
+
+class TestLRUCache(object):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(100, len)
+        cache.get('a', lambda: b'x' * 40)
+        cache.get('b', lambda: b'x' * 40)
+        cache.get('a', lambda: None)
+        cache.get('c', lambda: b'x' * 40)
+        assert 'a' in cache and 'c' in cache and 'b' not in cache
+        assert cache.size == 80
+        assert cache.get('huge', lambda: b'x' * 101) == b'x' * 101
+        assert 'huge' not in cache
+        assert cache.status()['hits'] == 1
+
+    def test_single_factory_call(self):
+        cache = LRUCache(100, lambda value: 1)
+        calls = []
+
+        def factory():
+            calls.append(1)
+            time.sleep(0.05)
+            return 'value'
+
+        threads = [
+            threading.Thread(target=cache.get, args=('k', factory))
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert calls == [1]
+        assert cache.get('k', None) == 'value'
+
+    def test_factory_error_not_cached(self):
+        cache = LRUCache(100, len)
+
+        def factory():
+            raise ValueError('nope')
+
+        with pytest.raises(ValueError):
+            cache.get('k', factory)
+        assert cache.get('k', lambda: 'ok') == 'ok'
+
+
+def _site(tmpdir):
+    pp.imsave(str(tmpdir.join('plan.png')), np.ones((40, 60, 3)))
+    points = [
+        {'x': x, 'y': y, 'result': {
+            'signal_mbm': -40 - x // 2 - y, 'channel': 6, 'frequency': 2437
+        }}
+        for x, y in [(5, 5), (50, 5), (5, 35), (50, 35), (30, 20)]
+    ]
+    tmpdir.join('site.json').write(
+        json.dumps({'img_path': 'plan.png', 'survey_points': points})
+    )
+
+
+class TestHeatmapService(object):
+
+    def test_render(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        _site(tmpdir)
+        service = HeatmapService(cache=False)
+        data = service.render('site', 'signal_quality')
+        assert data.startswith(PNG_SIGNATURE)
+        assert service.render('site.json', 'signal_quality') is data
+        assert service.render('site', 'channel') is not data
+        assert service.render(
+            'site', 'signal_quality', cmap='viridis', vmin=0, vmax=100
+        ) != data
+        status = service.status()
+        assert status['grids']['misses'] == 1
+        assert status['floorplans']['entries'] == 1
+        assert status['images']['entries'] == 3
+
+    def test_stepped_cmap(self, tmpdir, monkeypatch, capsys):
+        monkeypatch.chdir(tmpdir)
+        _site(tmpdir)
+        service = HeatmapService(cache=False)
+        data = service.render('site', 'signal_quality', cmap='viridis//5')
+        assert data != service.render('site', 'signal_quality', cmap='viridis')
+        # nothing is written to stdout per request
+        assert capsys.readouterr().out == ''
+        for cmap in ('viridis//0', 'viridis//-1', 'viridis//x'):
+            with pytest.raises(ValueError):
+                service.render('site', 'signal_quality', cmap=cmap)
+
+    def test_contours(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        _site(tmpdir)
+        service = HeatmapService(cache=False)
+        data = service.contours('site', 'signal_quality', 3)
+        assert service.contours('site', 'signal_quality', 3) is data
+        geojson = json.loads(data.decode())
+        assert geojson['bbox'] == [0, 0, 60, 40]
+        levels = [f['properties']['level'] for f in geojson['features']]
+        assert len(levels) > 0
+        assert levels[::2] == levels[1::2]
+        assert geojson['features'][0]['properties']['metric'] == (
+            'signal_quality'
+        )
+        with pytest.raises(LookupError):
+            service.contours('site', 'tcp_upload_Mbps')
+        with pytest.raises(ValueError):
+            service.contours('site', 'signal_quality', 0)
+
+    def test_not_found(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        _site(tmpdir)
+        service = HeatmapService(cache=False)
+        with pytest.raises(LookupError):
+            service.render('missing', 'signal_quality')
+        with pytest.raises(LookupError):
+            service.render('site', 'tcp_upload_Mbps')
+        with pytest.raises(LookupError):
+            service.render('../site', 'signal_quality')
+
+    def test_reloads_changed_survey(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        _site(tmpdir)
+        service = HeatmapService(cache=False)
+        data = service.render('site', 'signal_quality')
+        survey = json.loads(tmpdir.join('site.json').read())
+        survey['survey_points'][0]['result']['signal_mbm'] = -90
+        tmpdir.join('site.json').write(json.dumps(survey))
+        assert service.render('site', 'signal_quality') != data
+        assert service.status()['grids']['misses'] == 2
+
+
+class TestHeatmapServer(object):
+
+    def test_http(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        _site(tmpdir)
+        server = HeatmapServer(
+            ('127.0.0.1', 0), HeatmapService(cache=False), jobs=2
+        )
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        url = 'http://127.0.0.1:%d/' % server.server_address[1]
+        try:
+            with urlopen(url + 'site/signal_quality.png?min=0&max=100') as res:
+                assert res.headers['Content-Type'] == 'image/png'
+                assert res.read().startswith(PNG_SIGNATURE)
+            with urlopen(url + 'status') as res:
+                status = json.loads(res.read().decode())
+            assert status['images']['entries'] == 1
+            with urlopen(url + 'site/signal_quality.geojson?contours=4') as res:
+                assert res.headers['Content-Type'] == 'application/geo+json'
+                assert json.loads(res.read().decode())['type'] == (
+                    'FeatureCollection'
+                )
+            for path, code in [
+                ('site/nope.png', 404), ('site/signal_quality.png?min=x', 400),
+                ('site/signal_quality.geojson?contours=x', 400),
+                ('site/signal_quality.txt', 404),
+                ('site/signal_quality.png?cmap=nope', 400),
+                ('site/signal_quality.png?cmap=viridis//0', 400),
+                ('site/signal_quality.png?cmap=viridis//300', 400),
+                ('site', 404)
+            ]:
+                with pytest.raises(HTTPError) as excinfo:
+                    urlopen(url + path)
+                excinfo.value.close()
+                assert excinfo.value.code == code
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
@@ -0,0 +1,137 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+import os
+
+import numpy as np
+
+from wifi_survey_heatmap.sidecar import (
+    load_metrics, read_sidecar, sidecar_path, write_sidecar
+)
+from wifi_survey_heatmap.survey import SurveyMetrics
+
+
+def _survey(tmpdir, count=5):
+    points = []
+    for idx in range(count):
+        result = {
+            'channel': 6, 'frequency': 2437, 'signal_mbm': -40 - idx,
+            'ssid': 'net', 'tx_power': None if idx == 2 else 15,
+            'scan_results': {
+                'aa:bb': {
+                    'ssid': 'net', 'frequency': 2437000000.0,
+                    'signal_mbm': -40 - idx
+                }
+            }
+        }
+        if idx % 2 == 0:
+            result['scan_results']['cc:dd'] = {
+                'ssid': 'other', 'frequency': 5180000000.0,
+                'signal_mbm': -70
+            }
+        points.append({'x': idx, 'y': 2 * idx, 'result': result})
+    fpath = tmpdir.join('site.json')
+    fpath.write(json.dumps({'img_path': 'plan.png', 'survey_points': points}))
+    return str(fpath), points
+
+
+class TestSidecar(object):
+
+    def test_sidecar_path(self):
+        assert sidecar_path('foo/site.json') == 'foo/site.metrics'
+        assert sidecar_path('site') == 'site.metrics'
+
+    def test_round_trip(self, tmpdir):
+        fpath, points = _survey(tmpdir)
+        metrics = SurveyMetrics.from_points(points, {'img_path': 'plan.png'})
+        write_sidecar(fpath, metrics)
+        res = read_sidecar(fpath)
+        assert isinstance(res.x.base, np.memmap)
+        assert not res.x.flags.writeable
+        assert res.header == {'img_path': 'plan.png'}
+        assert np.array_equal(res.x, metrics.x)
+        assert np.array_equal(res.y, metrics.y)
+        for name in metrics.values:
+            assert np.array_equal(
+                res.values[name], metrics.values[name], equal_nan=True
+            )
+            assert np.array_equal(res.valid[name], metrics.valid[name])
+        assert not res.valid['tx_power'][2]
+        assert res.ssids == ['net']
+        assert np.array_equal(res.ssid_index, [0] * 5)
+        assert res.scanned.all()
+        assert res.scan_columns == [
+            ('aa:bb', 'net', 2437000000.0), ('cc:dd', 'other', 5180000000.0)
+        ]
+        assert np.array_equal(
+            res.scan_signal, metrics.scan_signal, equal_nan=True
+        )
+        assert np.array_equal(res.scan_signal[:, 0], -40 - np.arange(5))
+        assert np.isnan(res.scan_signal[1, 1])
+
+    def test_stale(self, tmpdir):
+        fpath, points = _survey(tmpdir)
+        write_sidecar(fpath, SurveyMetrics.from_points(points))
+        stat = os.stat(fpath)
+        os.utime(fpath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert read_sidecar(fpath) is None
+
+    def test_other_version(self, tmpdir, monkeypatch):
+        fpath, points = _survey(tmpdir)
+        write_sidecar(fpath, SurveyMetrics.from_points(points))
+        monkeypatch.setattr('wifi_survey_heatmap.sidecar.SIDECAR_VERSION', 2)
+        assert read_sidecar(fpath) is None
+
+    def test_missing_or_corrupt(self, tmpdir):
+        fpath, _ = _survey(tmpdir)
+        assert read_sidecar(fpath) is None
+        tmpdir.join('site.metrics').write('foo')
+        assert read_sidecar(fpath) is None
+
+    def test_load_metrics_rebuilds(self, tmpdir):
+        fpath, points = _survey(tmpdir)
+        metrics = load_metrics(fpath)
+        assert tmpdir.join('site.metrics').isfile()
+        assert metrics.header == {'img_path': 'plan.png'}
+        assert np.array_equal(metrics.x, np.arange(5))
+        assert isinstance(load_metrics(fpath).x.base, np.memmap)
+        fpath, _ = _survey(tmpdir, count=3)
+        stat = os.stat(fpath)
+        os.utime(fpath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert len(load_metrics(fpath)) == 3
+        assert len(read_sidecar(fpath)) == 3
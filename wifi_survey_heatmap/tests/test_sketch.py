@@ -0,0 +1,85 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+
+import numpy as np
+
+from wifi_survey_heatmap.sketch import KllSketch
+
+
+def _rank(values, x):
+    return np.searchsorted(np.sort(values), x, side='right') / len(values)
+
+
+class TestKllSketch(object):
+
+    def test_empty(self):
+        sketch = KllSketch().update([np.nan])
+        assert sketch.count == 0
+        assert sketch.quantile(0.5) is None
+
+    def test_exact_when_small(self):
+        sketch = KllSketch().update([5, 1, 4, 2, 3, np.nan])
+        assert sketch.count == 5
+        assert (sketch.min, sketch.max) == (1, 5)
+        assert [sketch.quantile(q) for q in (0, 0.2, 0.5, 1)] == [1, 1, 3, 5]
+
+    def test_accuracy_and_size(self):
+        values = np.random.RandomState(1).normal(-60, 10, 100000)
+        sketch = KllSketch()
+        for chunk in np.array_split(values, 10):
+            sketch.update(chunk)
+        assert sum(len(x) for x in sketch._levels) < 3 * sketch.k
+        for q in (0.02, 0.5, 0.98):
+            assert abs(_rank(values, sketch.quantile(q)) - q) < 0.01
+        assert sketch.quantile(1) == values.max()
+
+    def test_merge_round_trip(self):
+        rng = np.random.RandomState(2)
+        parts = [rng.uniform(0, 100, n) for n in (3, 5000, 20000, 1)]
+        merged = KllSketch()
+        for part in parts:
+            data = json.loads(json.dumps(KllSketch().update(part).to_dict()))
+            merged.merge(KllSketch.from_dict(data))
+        values = np.concatenate(parts)
+        assert merged.count == len(values)
+        assert merged.min == values.min()
+        assert merged.max == values.max()
+        for q in (0.02, 0.5, 0.98):
+            assert abs(_rank(values, merged.quantile(q)) - q) < 0.01
+        assert merged.merge(KllSketch()).count == len(values)
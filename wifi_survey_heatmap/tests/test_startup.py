@@ -0,0 +1,113 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+#: maximum wall time, in seconds, of each of the commands below; the
+#: ``WIFI_HEATMAP_STARTUP_BUDGET`` environment variable overrides it, e.g.
+#: on slow CI machines
+STARTUP_BUDGET = float(os.environ.get('WIFI_HEATMAP_STARTUP_BUDGET', 1.0))
+
+
+def _env():
+    """Return the environment of a subprocess importing this package."""
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__)
+    )))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [root] + [x for x in [env.get('PYTHONPATH')] if x]
+    )
+    return env
+
+
+def _run(args, cwd=None, repeat=3):
+    """
+    Run ``python args`` and return the fastest of ``repeat`` wall times.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        subprocess.check_call(
+            [sys.executable] + args, cwd=cwd, env=_env(),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        times.append(time.time() - start)
+    return min(times)
+
+
+class TestStartup(object):
+
+    def test_heavy_modules_not_imported(self):
+        out = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys\n'
+            'import wifi_survey_heatmap.heatmap\n'
+            'import wifi_survey_heatmap.thresholds\n'
+            'import wifi_survey_heatmap.scancli\n'
+            'print(sorted(set(m.split(".")[0] for m in sys.modules) & '
+            '{"matplotlib", "scipy", "libnl", "iperf3"}))'
+        ], env=_env())
+        assert out.decode().strip() == '[]'
+
+    @pytest.mark.parametrize('module', ['heatmap', 'thresholds', 'server'])
+    def test_help(self, module):
+        if module == 'server':
+            args = ['-m', 'wifi_survey_heatmap.heatmap', 'serve', '--help']
+        else:
+            args = ['-m', 'wifi_survey_heatmap.' + module, '--help']
+        assert _run(args) < STARTUP_BUDGET
+
+    def test_thresholds(self, tmpdir):
+        points = [
+            {'x': idx, 'y': idx, 'result': {'signal_mbm': -40 - idx}}
+            for idx in range(10)
+        ]
+        tmpdir.join('site.json').write(json.dumps({'survey_points': points}))
+        assert _run(
+            ['-m', 'wifi_survey_heatmap.thresholds', '--no-cache', '-j', '1',
+             'site'], cwd=str(tmpdir)
+        ) < STARTUP_BUDGET
+        assert 'signal_quality' in json.loads(
+            tmpdir.join('thresholds.json').read()
+        )
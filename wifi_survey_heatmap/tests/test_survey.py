@@ -0,0 +1,182 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from wifi_survey_heatmap.survey import SurveyFile, load_survey
+
+
+def _point(x, y, **kwargs):
+    result = {
+        'channel': 6, 'tx_power': 15, 'frequency': 2437,
+        'signal_mbm': -50, 'ssid': 'net'
+    }
+    result.update(kwargs)
+    return {'x': x, 'y': y, 'result': result}
+
+
+class TestLoadSurvey(object):
+
+    def test_columns(self):
+        data = load_survey([
+            _point(1, 2, tcp={'received_Mbps': 10.0}),
+            _point(3, 4, signal_mbm=-60),
+        ], ap_names={'NET': 'office'})
+        assert len(data) == 2
+        assert np.array_equal(data.x, [1.0, 3.0])
+        assert np.array_equal(data.y, [2.0, 4.0])
+        assert np.array_equal(data.values['signal_quality'], [80.0, 70.0])
+        assert np.allclose(data.values['frequency'], [2.437, 2.437])
+        assert data.ap == ['office (2.4 GHz)', 'office (2.4 GHz)']
+
+    def test_missing_values_masked(self):
+        data = load_survey([
+            _point(1, 2, tcp={'received_Mbps': 10.0}),
+            _point(3, 4, tx_power=None),
+            _point(5, 6, tcp={'received_Mbps': 30.0}),
+        ])
+        assert np.array_equal(
+            data.valid['tcp_upload_Mbps'], [True, False, True]
+        )
+        assert np.isnan(data.values['tcp_upload_Mbps'][1])
+        assert np.array_equal(data.valid['tx_power'], [True, False, True])
+        assert not data.has('udp_upload_Mbps')
+        x, y, values = data.metric('tcp_upload_Mbps')
+        assert np.array_equal(x, [1.0, 5.0])
+        assert np.array_equal(values, [10.0, 30.0])
+
+    def test_metric_corners(self):
+        data = load_survey([
+            _point(1, 2, tcp={'received_Mbps': 10.0}),
+            _point(3, 4),
+            _point(5, 6, tcp={'received_Mbps': 30.0}),
+        ])
+        x, y, values = data.metric(
+            'tcp_upload_Mbps', [(0, 0), (0, 10), (10, 0), (10, 10)]
+        )
+        assert np.array_equal(x, [1, 5, 0, 0, 10, 10])
+        assert np.array_equal(y, [2, 6, 0, 10, 0, 10])
+        assert np.array_equal(values, [10, 30, 10, 10, 10, 10])
+
+    def test_add_metric(self):
+        data = load_survey([_point(1, 2), _point(3, 4)])
+        data.add_metric('foo', np.array([np.nan, 5.0]))
+        assert data.has('foo')
+        assert np.array_equal(data.valid['foo'], [False, True])
+        assert np.array_equal(data.metric('foo')[2], [5.0])
+
+    def test_groups(self):
+        data = load_survey([
+            _point(1, 2, tcp={'received_Mbps': 10.0}),
+            _point(3, 4, udp={'Mbps': 5.0, 'jitter_ms': 1.0}),
+        ])
+        assert data.groups([
+            'channel', 'tcp_upload_Mbps', 'udp_download_Mbps',
+            'jitter_download', 'tx_power', 'udp_upload_Mbps'
+        ]) == [
+            ['channel', 'tx_power'], ['tcp_upload_Mbps'],
+            ['udp_download_Mbps', 'jitter_download']
+        ]
+
+
+class TestSurveyFile(object):
+
+    def _write(self, tmpdir, data, **kwargs):
+        fpath = tmpdir.join('survey.json')
+        fpath.write_binary(
+            json.dumps(data, ensure_ascii=False, **kwargs).encode('utf-8')
+        )
+        return str(fpath)
+
+    def test_index_and_read(self, tmpdir):
+        points = [
+            _point(idx, 2 * idx, ssid=u'caf\xe9 ]}"', scan_results={
+                'aa': {'ssid': '[{', 'signal_mbm': -40}
+            })
+            for idx in range(50)
+        ]
+        fpath = self._write(tmpdir, {
+            'img_path': u'pl\xe4n.png', 'survey_points': points,
+            'other': {'a': [1, 2]}, 'n': 12345
+        }, indent=2)
+        with SurveyFile(fpath) as survey:
+            assert survey.header == {
+                'img_path': u'pl\xe4n.png', 'other': {'a': [1, 2]},
+                'n': 12345
+            }
+            assert len(survey) == 50
+            assert survey[7] == points[7]
+            assert survey[49] == points[49]
+            assert list(survey) == points
+            start, end = survey.offsets[3]
+            with open(fpath, 'rb') as fh:
+                fh.seek(start)
+                assert json.loads(fh.read(end - start)) == points[3]
+
+    def test_small_blocks(self, tmpdir):
+        points = [_point(idx, idx) for idx in range(20)]
+        fpath = self._write(tmpdir, {'survey_points': points, 'n': 1234567})
+        with SurveyFile(fpath, blocksize=7) as survey:
+            assert survey.header == {'n': 1234567}
+            assert list(survey) == points
+
+    def test_load_survey(self, tmpdir):
+        points = [_point(idx, idx, signal_mbm=-idx) for idx in range(10)]
+        with SurveyFile(
+            self._write(tmpdir, {'survey_points': points})
+        ) as survey:
+            data = load_survey(survey)
+        assert np.array_equal(data.x, np.arange(10))
+        assert np.array_equal(
+            data.values['signal_quality'], 130 - np.arange(10)
+        )
+
+    @pytest.mark.parametrize('content', [
+        '', '[]', '{"img_path": "foo"}', '{"survey_points": [{"x": 1}',
+        '{"survey_points": [] "x": 1}',
+        '{"survey_points": [{"x": 1} {"x": 2}]}',
+        '{"survey_points": [{"x": 1}, {"x": 2},]}',
+        '{"survey_points": [,]}', '{"survey_points": [{"x": 1},'
+    ])
+    def test_invalid(self, tmpdir, content):
+        fpath = tmpdir.join('survey.json')
+        fpath.write(content)
+        with pytest.raises(ValueError):
+            SurveyFile(str(fpath))
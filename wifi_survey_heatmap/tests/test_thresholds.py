@@ -0,0 +1,164 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+import os
+
+from wifi_survey_heatmap import thresholds
+from wifi_survey_heatmap.sketch import KllSketch
+from wifi_survey_heatmap.thresholds import (
+    ThresholdGenerator, merge_summaries, summarize
+)
+
+
+def _survey(tmpdir, title, signals, tx_power=15):
+    points = [
+        {
+            'x': idx, 'y': idx,
+            'result': {
+                'channel': 6, 'frequency': 2437, 'signal_mbm': signal,
+                'ssid': 'net', 'tx_power': tx_power
+            }
+        } for idx, signal in enumerate(signals)
+    ]
+    fpath = tmpdir.join(title + '.json')
+    fpath.write(json.dumps({'img_path': 'plan.png', 'survey_points': points}))
+    return str(fpath)
+
+
+class TestSummaries(object):
+
+    def test_summarize(self, tmpdir):
+        res = summarize(_survey(tmpdir, 'a', [-40, -60, -50], tx_power=None))
+        assert res['signal_quality']['count'] == 3
+        assert res['signal_quality']['min'] == 70.0
+        assert res['signal_quality']['max'] == 90.0
+        assert res['frequency']['min'] == res['frequency']['max'] == 2.437
+        assert 'tx_power' not in res
+        assert 'tcp_upload_Mbps' not in res
+
+    def test_summarize_chunks(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(thresholds, 'SUMMARY_CHUNK_SIZE', 2)
+        res = summarize(_survey(tmpdir, 'a', [-40, -60, -50, -45, -55]))
+        assert res['signal_quality']['count'] == 5
+        assert KllSketch.from_dict(res['signal_quality']).quantile(0.5) == 80
+
+    def test_merge(self):
+        res = merge_summaries([
+            {'channel': KllSketch().update([1, 6]).to_dict()},
+            {
+                'channel': KllSketch().update([3, 11]).to_dict(),
+                'tx_power': KllSketch().update([15]).to_dict()
+            },
+        ])
+        assert res == {
+            'channel': {'min': 1.0, 'max': 11.0},
+            'tx_power': {'min': 15.0, 'max': 15.0}
+        }
+
+    def test_merge_percentiles(self):
+        res = merge_summaries([
+            {'channel': KllSketch().update(range(1, 51)).to_dict()},
+            {'channel': KllSketch().update(range(51, 101)).to_dict()},
+        ], percentiles=(10, 90))
+        assert res == {
+            'channel': {'min': 10.0, 'max': 90.0, 'p10': 10.0, 'p90': 90.0}
+        }
+
+
+class TestThresholdGenerator(object):
+
+    def _generate(self, tmpdir, titles, percentiles=None, **kwargs):
+        output = str(tmpdir.join('thresholds.json'))
+        ThresholdGenerator(
+            cache_path=str(tmpdir.join('cache')), **kwargs
+        ).generate(titles, output, percentiles)
+        with open(output) as fh:
+            return json.load(fh)
+
+    def test_generate(self, tmpdir):
+        a = _survey(tmpdir, 'a', [-40, -60])
+        b = _survey(tmpdir, 'b', [-30, -80], tx_power=None)
+        res = self._generate(tmpdir, [a, b[:-len('.json')]])
+        assert res['signal_quality'] == {'min': 50.0, 'max': 100.0}
+        assert res['tx_power'] == {'min': 15.0, 'max': 15.0}
+
+    def test_parallel(self, tmpdir):
+        paths = [
+            _survey(tmpdir, str(idx), [-40 - idx, -50]) for idx in range(4)
+        ]
+        res = self._generate(tmpdir, paths, jobs=2, cache=False)
+        assert res['signal_quality'] == {'min': 80.0, 'max': 90.0}
+
+    def test_cache(self, tmpdir, monkeypatch):
+        a = _survey(tmpdir, 'a', [-40, -60])
+        b = _survey(tmpdir, 'b', [-30, -80])
+        self._generate(tmpdir, [a, b])
+        summarized = []
+
+        def _summarize(json_path):
+            summarized.append(os.path.basename(json_path))
+            return summarize(json_path)
+
+        monkeypatch.setattr(thresholds, 'summarize', _summarize)
+        res = self._generate(tmpdir, [a, b])
+        assert summarized == []
+        assert res['signal_quality'] == {'min': 50.0, 'max': 100.0}
+        # touched but unchanged: re-hashed, not re-summarized
+        stat = os.stat(a)
+        os.utime(a, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self._generate(tmpdir, [a, b])
+        assert summarized == []
+        _survey(tmpdir, 'b', [-20, -80])
+        res = self._generate(tmpdir, [a, b])
+        assert summarized == ['b.json']
+        assert res['signal_quality'] == {'min': 50.0, 'max': 110.0}
+
+    def test_percentiles(self, tmpdir):
+        a = _survey(tmpdir, 'a', [-50] * 98 + [-10])
+        b = _survey(tmpdir, 'b', [-60] + [-55] * 99)
+        res = self._generate(tmpdir, [a, b], percentiles=(1, 99))
+        assert res['signal_quality']['min'] == 75.0
+        assert res['signal_quality']['max'] == 80.0
+        res = self._generate(tmpdir, [a, b])
+        assert res['signal_quality'] == {'min': 70.0, 'max': 120.0}
+
+    def test_unreadable_survey(self, tmpdir):
+        a = _survey(tmpdir, 'a', [-40, -60])
+        empty = _survey(tmpdir, 'empty', [])
+        res = self._generate(tmpdir, [a, empty, str(tmpdir.join('missing'))])
+        assert res['signal_quality'] == {'min': 70.0, 'max': 90.0}
@@ -0,0 +1,82 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+import os
+
+import numpy as np
+from matplotlib.image import imread
+from matplotlib.colors import ListedColormap
+
+from wifi_survey_heatmap.tiles import TilePyramidRenderer, max_zoom
+
+CMAP = ListedColormap([[0, 0, 1, 1], [1, 0, 0, 1]])
+
+
+class TestTilePyramidRenderer(object):
+
+    def test_max_zoom(self):
+        assert max_zoom(200, 100, 256) == 0
+        assert max_zoom(256, 256, 256) == 0
+        assert max_zoom(257, 100, 256) == 1
+        assert max_zoom(12000, 9000, 256) == 6
+
+    def test_render(self, tmpdir):
+        dirname = str(tmpdir.join('tiles'))
+        floorplan = np.ones((50, 70, 4), dtype=np.float32)
+        z = np.linspace(0, 1, 12).reshape((3, 4))
+        TilePyramidRenderer(CMAP, tile_size=32).render(
+            dirname, z, floorplan, 0, 1, 70, 49, metadata={'metric': 'foo'}
+        )
+        with open(os.path.join(dirname, 'manifest.json')) as fh:
+            manifest = json.load(fh)
+        assert manifest['metric'] == 'foo'
+        assert manifest['max_zoom'] == 2
+        assert [
+            (x['width'], x['height'], x['columns'], x['rows'])
+            for x in manifest['levels']
+        ] == [(18, 13, 1, 1), (35, 25, 2, 1), (70, 50, 3, 2)]
+        assert imread(os.path.join(dirname, '0', '0', '0.png')).shape == (
+            13, 18, 4
+        )
+        assert imread(os.path.join(dirname, '2', '2', '1.png')).shape == (
+            18, 6, 4
+        )
+        top_left = imread(os.path.join(dirname, '2', '0', '0.png'))[0, 0]
+        bottom_right = imread(os.path.join(dirname, '2', '2', '1.png'))[-1, -1]
+        assert top_left[2] > top_left[0]
+        assert bottom_right[0] > bottom_right[2]
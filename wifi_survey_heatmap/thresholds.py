@@ -36,33 +36,332 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 """
 
 import sys
+import os
 import argparse
 import logging
 import json
-from collections import defaultdict
+import multiprocessing
+import tempfile
+from collections import OrderedDict
 
-from wifi_survey_heatmap.heatmap import HeatMapGenerator
+from wifi_survey_heatmap.cache import cache_dir, file_hash
+from wifi_survey_heatmap.sidecar import load_metrics
+from wifi_survey_heatmap.sketch import KllSketch
+from wifi_survey_heatmap.survey import METRICS
 
 FORMAT = "[%(asctime)s %(levelname)s] %(message)s"
 logging.basicConfig(level=logging.WARNING, format=FORMAT)
 logger = logging.getLogger()
 
+#: version of the cached per-survey summaries; bump it whenever
+#: :py:func:`~.summarize` changes so that stale summaries are recomputed
+SUMMARY_VERSION = 2
+
+#: number of points added to a sketch at a time by :py:func:`~.summarize`
+SUMMARY_CHUNK_SIZE = 1 << 16
+
+
+def summarize(json_path):
+    """
+    Return the per-metric summary of a survey: for each metric measured at
+    one or more points, a :py:class:`~wifi_survey_heatmap.sketch.KllSketch`
+    of its values (serialized with
+    :py:meth:`~wifi_survey_heatmap.sketch.KllSketch.to_dict`), which also
+    holds their ``count``, ``min`` and ``max``.
+
+    :param json_path: path to the survey JSON file
+    :type json_path: str
+    :rtype: dict
+    :raises ValueError: if the survey file has no survey points
+    """
+    metrics = load_metrics(json_path)
+    res = {}
+    for name, _, _, _ in METRICS:
+        sketch = KllSketch()
+        for start in range(0, len(metrics), SUMMARY_CHUNK_SIZE):
+            chunk = slice(start, start + SUMMARY_CHUNK_SIZE)
+            sketch.update(
+                metrics.values[name][chunk][metrics.valid[name][chunk]]
+            )
+        if sketch.count > 0:
+            res[name] = sketch.to_dict()
+    return res
+
+
+def merge_summaries(summaries, percentiles=None):
+    """
+    Merge per-survey summaries (see :py:func:`~.summarize`) into the
+    thresholds of all of them. Summaries are merged one at a time, so memory
+    use doesn't grow with their number.
+
+    :param summaries: iterable of per-survey summaries
+    :type summaries: list
+    :param percentiles: ``(low, high)`` percentiles (0-100) used as the
+      ``min`` and ``max`` thresholds instead of the extreme values; they are
+      also stored under ``p<low>`` and ``p<high>``
+    :type percentiles: tuple
+    :return: dict of metric name to dict with ``min`` and ``max``
+    :rtype: collections.OrderedDict
+    """
+    sketches = {}
+    for summary in summaries:
+        for name, item in summary.items():
+            sketch = KllSketch.from_dict(item)
+            if name in sketches:
+                sketches[name].merge(sketch)
+            else:
+                sketches[name] = sketch
+    res = OrderedDict()
+    for name, _, _, _ in METRICS:
+        if name not in sketches:
+            continue
+        sketch = sketches[name]
+        if percentiles is None:
+            res[name] = {'min': sketch.min, 'max': sketch.max}
+            continue
+        low, high = [sketch.quantile(p / 100.0) for p in percentiles]
+        res[name] = OrderedDict([
+            ('min', low), ('max', high),
+            ('p%g' % percentiles[0], low), ('p%g' % percentiles[1], high)
+        ])
+    return res
+
+
+class SummaryCache(object):
+    """
+    On-disk cache of per-survey summaries, keyed by the SHA-256 of the
+    survey file's content.
+
+    An index of each survey's path, size and modification time to its hash
+    avoids re-reading unchanged files at all; a file that was touched but
+    not modified is re-hashed, but not re-summarized.
+
+    :param path: cache directory; defaults to the ``thresholds`` cache under
+      :py:func:`~wifi_survey_heatmap.cache.cache_dir`
+    :type path: str
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = cache_dir('thresholds')
+        elif not os.path.exists(path):
+            os.makedirs(path)
+        self.path = path
+        self._index_path = os.path.join(path, 'index.json')
+        self._index = {}
+        try:
+            with open(self._index_path, 'r') as fh:
+                self._index = json.load(fh)
+        except (IOError, OSError, ValueError):
+            pass
+        self._dirty = False
+
+    def _fpath(self, digest):
+        return os.path.join(
+            self.path, '%s-v%d.json' % (digest, SUMMARY_VERSION)
+        )
+
+    def _write(self, fpath, data):
+        fd, tmpname = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(data, fh)
+            os.replace(tmpname, fpath)
+        except Exception:
+            os.unlink(tmpname)
+            raise
+
+    def known_hash(self, json_path, stat):
+        """
+        Return the content hash of ``json_path`` if the file is unchanged
+        since it was last indexed, otherwise None.
+
+        :param json_path: path to the survey JSON file
+        :type json_path: str
+        :param stat: current ``(size, mtime_ns)`` of the file
+        :type stat: tuple
+        :rtype: str
+        """
+        entry = self._index.get(os.path.abspath(json_path))
+        if entry is None or tuple(entry[:2]) != tuple(stat):
+            return None
+        return entry[2]
+
+    def index(self, json_path, stat, digest):
+        """
+        Record ``digest`` as the content hash of ``json_path`` while its
+        ``(size, mtime_ns)`` is ``stat``.
+        """
+        self._index[os.path.abspath(json_path)] = list(stat) + [digest]
+        self._dirty = True
+
+    def save_index(self):
+        """
+        Write the path index, if it changed.
+        """
+        if self._dirty:
+            self._write(self._index_path, self._index)
+            self._dirty = False
+
+    def __contains__(self, digest):
+        return os.path.exists(self._fpath(digest))
+
+    def get(self, digest):
+        """
+        Return the cached summary of the survey with content hash
+        ``digest``, or None.
+
+        :rtype: dict
+        """
+        try:
+            with open(self._fpath(digest), 'r') as fh:
+                return json.load(fh)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def put(self, digest, summary):
+        """
+        Store the summary of the survey with content hash ``digest``.
+        """
+        self._write(self._fpath(digest), summary)
+
+
+def _summarize_worker(job):
+    """
+    Hash and summarize one survey file; runs in a worker process when
+    :py:class:`~.ThresholdGenerator` uses several.
+
+    :param job: tuple of survey path and cache directory (or None)
+    :type job: tuple
+    :return: tuple of survey path, ``(size, mtime_ns)`` of the file, content
+      hash, summary (None on error), and error message (or None)
+    :rtype: tuple
+    """
+    json_path, cache_path = job
+    try:
+        st = os.stat(json_path)
+        digest = file_hash(json_path)
+        summary = None
+        if cache_path is not None:
+            summary = SummaryCache(cache_path).get(digest)
+        if summary is None:
+            summary = summarize(json_path)
+        return (
+            json_path, (st.st_size, st.st_mtime_ns), digest, summary, None
+        )
+    except Exception as ex:
+        return json_path, None, None, None, str(ex) or type(ex).__name__
+
 
 class ThresholdGenerator(object):
+    """
+    Compute the thresholds (min and max, or percentiles) of every metric
+    across a set of surveys.
+
+    Per-survey summaries are cached (see :py:class:`~.SummaryCache`), so
+    that re-running over many surveys only reads the ones that changed;
+    those are summarized by a pool of ``jobs`` worker processes.
+
+    :param jobs: number of worker processes
+    :type jobs: int
+    :param cache: whether to read and write cached summaries
+    :type cache: bool
+    :param cache_path: summary cache directory (see :py:class:`~.SummaryCache`)
+    :type cache_path: str
+    """
+
+    def __init__(self, jobs=1, cache=True, cache_path=None):
+        self._jobs = jobs
+        self._cache = SummaryCache(cache_path) if cache else None
 
-    def generate(self, titles):
-        res = defaultdict(dict)
-        items = [HeatMapGenerator(None, t).load_data() for t in titles]
-        for key in HeatMapGenerator.graphs.keys():
-            res[key]['min'] = min([
-                min(x[key]) for x in items
-            ])
-            res[key]['max'] = max([
-                max(x[key]) for x in items
-            ])
-        with open('thresholds.json', 'w') as fh:
+    def _summarize(self, paths):
+        if self._cache is None:
+            cache_path = None
+        else:
+            cache_path = self._cache.path
+        jobs = [(p, cache_path) for p in paths]
+        if self._jobs < 2 or len(jobs) < 2:
+            for job in jobs:
+                yield _summarize_worker(job)
+            return
+        pool = multiprocessing.Pool(min(self._jobs, len(jobs)))
+        try:
+            for res in pool.imap_unordered(_summarize_worker, jobs):
+                yield res
+        finally:
+            pool.close()
+            pool.join()
+
+    def summaries(self, titles):
+        """
+        Generate the summary of each survey, reading cached summaries of
+        unchanged files and computing the others. Surveys that could not be
+        read are logged and skipped.
+
+        :param titles: survey titles or JSON file paths
+        :type titles: list
+        :return: generator of (survey JSON path, summary) tuples
+        :rtype: collections.abc.Iterator
+        """
+        paths = [t if t.endswith('.json') else t + '.json' for t in titles]
+        cached = []
+        todo = []
+        for path in paths:
+            digest = None
+            if self._cache is not None:
+                try:
+                    st = os.stat(path)
+                    digest = self._cache.known_hash(
+                        path, (st.st_size, st.st_mtime_ns)
+                    )
+                except OSError:
+                    pass
+            if digest is None or digest not in self._cache:
+                todo.append(path)
+            else:
+                cached.append((path, digest))
+        logger.info(
+            'Using cached summaries of %d of %d surveys; summarizing %d',
+            len(cached), len(paths), len(todo)
+        )
+        for path, digest in cached:
+            summary = self._cache.get(digest)
+            if summary is None:
+                todo.append(path)
+            else:
+                yield path, summary
+        for path, stat, digest, summary, error in self._summarize(todo):
+            if error is not None:
+                logger.error('Unable to summarize %s: %s', path, error)
+                continue
+            if self._cache is not None:
+                self._cache.put(digest, summary)
+                self._cache.index(path, stat, digest)
+            yield path, summary
+        if self._cache is not None:
+            self._cache.save_index()
+
+    def generate(self, titles, output='thresholds.json', percentiles=None):
+        """
+        Write the thresholds of the given surveys to ``output``.
+
+        :param titles: survey titles or JSON file paths
+        :type titles: list
+        :param output: path of the thresholds JSON file to write
+        :type output: str
+        :param percentiles: ``(low, high)`` percentiles to use as thresholds
+          instead of the extreme values; see :py:func:`~.merge_summaries`
+        :type percentiles: tuple
+        :return: the thresholds that were written
+        :rtype: collections.OrderedDict
+        """
+        res = merge_summaries(
+            (summary for _, summary in self.summaries(titles)), percentiles
+        )
+        with open(output, 'w') as fh:
             fh.write(json.dumps(res))
-        logger.info('Wrote: thresholds.json')
+        logger.info('Wrote: %s', output)
+        return res
 
 
 def parse_args(argv):
@@ -77,11 +376,29 @@ def parse_args(argv):
     )
     p.add_argument('-v', '--verbose', dest='verbose', action='count', default=0,
                    help='verbose output. specify twice for debug-level output.')
+    p.add_argument('-j', '--jobs', dest='jobs', action='store', type=int,
+                   default=multiprocessing.cpu_count(),
+                   help='Number of worker processes used to summarize '
+                        'surveys (default: number of CPUs)')
+    p.add_argument('--no-cache', dest='cache', action='store_false',
+                   default=True,
+                   help='Do not read or write cached per-survey summaries')
+    p.add_argument('-p', '--percentiles', dest='percentiles',
+                   action='store', type=float, nargs=2, default=None,
+                   metavar=('LOW', 'HIGH'),
+                   help='Use the LOW and HIGH percentiles of each metric '
+                        '(e.g. "2 98") as its thresholds instead of its '
+                        'minimum and maximum, so that outliers do not '
+                        'stretch the color scale')
     p.add_argument(
         'TITLE', type=str, help='Title for survey (and data filename)',
         nargs='+'
     )
     args = p.parse_args(argv)
+    if args.percentiles is not None and not (
+        0 <= args.percentiles[0] < args.percentiles[1] <= 100
+    ):
+        p.error('percentiles must satisfy 0 <= LOW < HIGH <= 100')
     return args
 
 
@@ -123,7 +440,9 @@ def main():
     elif args.verbose == 1:
         set_log_info()
 
-    ThresholdGenerator().generate(args.TITLE)
+    ThresholdGenerator(jobs=args.jobs, cache=args.cache).generate(
+        args.TITLE, percentiles=args.percentiles
+    )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,202 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+import logging
+import math
+import os
+
+import numpy as np
+
+from wifi_survey_heatmap.raster import (
+    PngWriter, _to_rgba8, colormap_lut, composite, halve, upsample
+)
+
+logger = logging.getLogger(__name__)
+
+#: version of the tile pyramid manifest format
+MANIFEST_VERSION = 1
+
+
+def max_zoom(width, height, tile_size):
+    """
+    Return the zoom level at which the floorplan is shown at full resolution;
+    at zoom 0 the whole floorplan fits in a single tile.
+    """
+    return max(0, int(math.ceil(
+        math.log(max(width, height) / float(tile_size), 2)
+    )))
+
+
+class TilePyramidRenderer(object):
+    """
+    Writes heatmaps as a pyramid of ``tile_size`` pixel PNG tiles, with the
+    floorplan at full resolution at the highest zoom level and halved at each
+    lower level, plus a small ``manifest.json`` describing the pyramid.
+
+    Every tile is composited on its own from the (small) interpolated grid and
+    the matching part of the floorplan, so the full-resolution heatmap is
+    never held in memory. The downscaled floorplan levels are built once and
+    reused for every metric.
+
+    Tiles are written to ``<dirname>/<zoom>/<x>/<y>.png``.
+
+    :param cmap: matplotlib colormap
+    :type cmap: matplotlib.colors.Colormap
+    :param tile_size: tile width and height in pixels
+    :type tile_size: int
+    :param alpha: opacity of the heatmap layer over the floorplan
+    :type alpha: float
+    :param compression: zlib compression level of the PNGs, 0-9
+    :type compression: int
+    """
+
+    def __init__(self, cmap, tile_size=256, alpha=0.5, compression=6):
+        self._lut = colormap_lut(cmap)
+        self._tile_size = tile_size
+        self._alpha = alpha
+        self._compression = compression
+        self._floorplan = None
+        self._levels = None
+
+    def _floorplan_levels(self, floorplan, levels=None):
+        """
+        Return the floorplan at each zoom level, highest zoom first; only
+        computed once per floorplan. Precomputed halved ``levels`` (such as
+        those of a cached :py:class:`~wifi_survey_heatmap.floorplan.Floorplan`)
+        are used where available.
+        """
+        if self._floorplan is floorplan:
+            return self._levels
+        rows, cols = floorplan.shape[:2]
+        count = max_zoom(cols, rows, self._tile_size) + 1
+        res = [floorplan] + list(levels or [])[1:count]
+        while len(res) < count:
+            res.append(halve(res[-1]))
+        self._floorplan = floorplan
+        self._levels = res
+        return res
+
+    def render(self, dirname, z, floorplan, vmin, vmax, width, height,
+               metadata=None, levels=None, cmap=None, nearest=False):
+        """
+        Write the tile pyramid of the heatmap of grid ``z`` over ``floorplan``
+        to ``dirname``.
+
+        :param dirname: output directory
+        :type dirname: str
+        :param z: interpolated grid of shape ``(num_y, num_x)``, spread over
+          ``[0, width] x [0, height]`` floorplan pixels
+        :type z: numpy.ndarray
+        :param floorplan: floorplan image as read by ``imread``
+        :type floorplan: numpy.ndarray
+        :param vmin: value mapped to the lowest color
+        :type vmin: float
+        :param vmax: value mapped to the highest color
+        :type vmax: float
+        :param metadata: additional items to store in the manifest
+        :type metadata: dict
+        :param levels: precomputed floorplan levels, each half the size of
+          the previous one, starting with ``floorplan``
+        :type levels: list
+        :param cmap: colormap to use instead of the renderer's own
+        :type cmap: matplotlib.colors.Colormap
+        :param nearest: whether to upsample ``z`` with nearest-neighbor
+          instead of bilinear interpolation
+        :type nearest: bool
+        """
+        lut = self._lut if cmap is None else colormap_lut(cmap)
+        levels = self._floorplan_levels(floorplan, levels)
+        top = len(levels) - 1
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'width': floorplan.shape[1],
+            'height': floorplan.shape[0],
+            'tile_size': self._tile_size,
+            'min_zoom': 0,
+            'max_zoom': top,
+            'path': '{z}/{x}/{y}.png',
+            'vmin': vmin,
+            'vmax': vmax,
+            'levels': []
+        }
+        manifest.update(metadata or {})
+        for zoom in range(top + 1):
+            level = levels[top - zoom]
+            scale = 2 ** (top - zoom)
+            columns = int(math.ceil(level.shape[1] / float(self._tile_size)))
+            rows = int(math.ceil(level.shape[0] / float(self._tile_size)))
+            manifest['levels'].append({
+                'zoom': zoom, 'width': level.shape[1],
+                'height': level.shape[0], 'columns': columns, 'rows': rows
+            })
+            for tx in range(columns):
+                path = os.path.join(dirname, str(zoom), str(tx))
+                if not os.path.exists(path):
+                    os.makedirs(path)
+                for ty in range(rows):
+                    self._render_tile(
+                        os.path.join(path, '%d.png' % ty), z, level, scale,
+                        tx, ty, vmin, vmax, width, height, lut, nearest
+                    )
+        with open(os.path.join(dirname, 'manifest.json'), 'w') as fh:
+            fh.write(json.dumps(manifest, indent=2))
+        logger.debug(
+            'Wrote %d zoom levels of tiles to %s', top + 1, dirname
+        )
+
+    def _render_tile(self, fname, z, level, scale, tx, ty, vmin, vmax,
+                     width, height, lut, nearest):
+        x0 = tx * self._tile_size
+        y0 = ty * self._tile_size
+        base = _to_rgba8(
+            level[y0:y0 + self._tile_size, x0:x0 + self._tile_size]
+        )
+        # centers of this level's pixels, in full-resolution pixels
+        rows = (np.arange(base.shape[0]) + y0 + 0.5) * scale - 0.5
+        cols = (np.arange(base.shape[1]) + x0 + 0.5) * scale - 0.5
+        values = upsample(z, rows, cols, width, height, nearest=nearest)
+        writer = PngWriter(
+            fname, base.shape[1], base.shape[0],
+            compression=self._compression
+        )
+        try:
+            writer.write(composite(
+                values, base, lut, vmin, vmax, self._alpha
+            ))
+        finally:
+            writer.close()
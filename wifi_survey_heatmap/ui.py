@@ -43,8 +43,9 @@ import json
 import os
 import subprocess
 
-from wifi_survey_heatmap.collector import Collector
-from wifi_survey_heatmap.libnl import Scanner
+from wifi_survey_heatmap.floorplan import FloorplanCache
+from wifi_survey_heatmap.sidecar import write_sidecar
+from wifi_survey_heatmap.survey import SurveyFile, SurveyMetricsBuilder
 
 FORMAT = "[%(asctime)s %(levelname)s] %(message)s"
 logging.basicConfig(level=logging.WARNING, format=FORMAT)
@@ -89,7 +90,7 @@ RESULT_FIELDS = [
 
 class SurveyPoint(object):
 
-    def __init__(self, parent, x, y):
+    def __init__(self, parent, x, y, source=None):
         self.parent = parent
         self.x = x
         self.y = y
@@ -97,10 +98,21 @@ class SurveyPoint(object):
         self.is_failed = False
         self.progress = 0
         self.dotSize = 20
-        self.result = {}
+        self._result = {}
+        # (SurveyFile, index) to read the result from when it's needed,
+        # for points loaded from an existing survey file
+        self._source = source
+
+    @property
+    def result(self):
+        if self._source is not None:
+            survey, idx = self._source
+            return survey[idx]['result']
+        return self._result
 
     def set_result(self, res):
-        self.result = res
+        self._result = res
+        self._source = None
 
     @property
     def as_dict(self):
@@ -177,6 +189,9 @@ class FloorplanPanel(wx.Panel):
         super(FloorplanPanel, self).__init__(parent)
         self.parent = parent
         self.img_path = parent.img_path
+        self._floorplan = FloorplanCache().get(self.img_path)
+        # (window size, floorplan bitmap scaled to it)
+        self._background = None
         self.Bind(wx.EVT_ERASE_BACKGROUND, self.OnEraseBackground)
         self.Bind(wx.EVT_LEFT_UP, self.onLeftUp)
         self.Bind(wx.EVT_LEFT_DOWN, self.onLeftDown)
@@ -184,6 +199,7 @@ class FloorplanPanel(wx.Panel):
         self.Bind(wx.EVT_RIGHT_UP, self.onRightClick)
         self.Bind(wx.EVT_PAINT, self.on_paint)
         self.survey_points = []
+        self._survey_file = None
         self._moving_point = None
         self._moving_x = None
         self._moving_y = None
@@ -193,20 +209,25 @@ class FloorplanPanel(wx.Panel):
         if os.path.exists(self.data_filename):
             self._load_file(self.data_filename)
         self._duration = self.parent.duration
+        # imported here, as importing libnl and iperf3 is slow
+        from wifi_survey_heatmap.collector import Collector
         self.collector = Collector(
             self.parent.server, self._duration, self.parent.scanner)
         self.parent.SetStatusText("Ready.")
 
     def _load_file(self, fpath):
-        with open(fpath, 'r') as fh:
-            raw = fh.read()
-        data = json.loads(raw)
-        if 'survey_points' not in data:
+        # results are read back from the file only when saving, so that
+        # large surveys (with scan results) aren't held in memory
+        try:
+            self._survey_file = SurveyFile(fpath)
+        except ValueError:
             logger.error('Trying to load incompatible JSON file')
             exit(1)
-        for point in data['survey_points']:
-            p = SurveyPoint(self, point['x'], point['y'])
-            p.set_result(point['result'])
+        for idx, point in enumerate(self._survey_file):
+            p = SurveyPoint(
+                self, point['x'], point['y'],
+                source=(self._survey_file, idx)
+            )
             p.set_is_finished()
             self.survey_points.append(p)
 
@@ -222,21 +243,30 @@ class FloorplanPanel(wx.Panel):
         # Get window size
         W, H = self.GetSize()
 
-        # Load floorplan
-        bmp = wx.Bitmap(self.img_path)
-        image = wx.Bitmap.ConvertToImage(bmp)
-
         # Store scaling factors for pixel corrections
-        self.scale_x = image.GetWidth() / W
-        self.scale_y = image.GetHeight() / H
+        self.scale_x = self._floorplan.width / W
+        self.scale_y = self._floorplan.height / H
 
-        # Scale image to window size
-        logger.debug("Scaling image to {} x {}".format(W, H))
-        image = image.Scale(W, H, wx.IMAGE_QUALITY_HIGH)
+        # Scale image to window size, only when the window size changed
+        if self._background is None or self._background[0] != (W, H):
+            logger.debug("Scaling image to {} x {}".format(W, H))
+            self._background = ((W, H), self._scaled_floorplan(W, H))
 
         # Draw image
-        scaled_bmp = wx.Bitmap(image)
-        dc.DrawBitmap(scaled_bmp, 0, 0)
+        dc.DrawBitmap(self._background[1], 0, 0)
+
+    def _scaled_floorplan(self, W, H):
+        """
+        Return the floorplan scaled to W x H as a bitmap, starting from the
+        smallest cached level that is still at least that large.
+        """
+        level = self._floorplan.level_for(W, H)
+        h, w = level.shape[:2]
+        image = wx.Image(
+            w, h, level[:, :, :3].tobytes(), level[:, :, 3].tobytes()
+        )
+        image = image.Scale(W, H, wx.IMAGE_QUALITY_HIGH)
+        return wx.Bitmap(image)
 
     # Get X and Y coordinated scaled to ABSOLUTE coordinates of the floorplan
     def get_xy(self, event):
@@ -427,15 +457,35 @@ class FloorplanPanel(wx.Panel):
         subprocess.call([self.parent.ding_command, self.parent.ding_path])
 
     def _write_json(self):
-        # Only store finished survey points
-        survey_points = [p.as_dict for p in self.survey_points if p.is_finished]
-
-        res = json.dumps(
-            {'img_path': self.img_path, 'survey_points': survey_points},
-            cls=SafeEncoder, indent=2
-        )
-        with open(self.data_filename, 'w') as fh:
-            fh.write(res)
+        # Only store finished survey points. Points are serialized one at a
+        # time (with the same layout as dumping the whole survey at once)
+        # into a temporary file that then replaces the old one, which points
+        # loaded from it may still be reading their results from.
+        # The flattened metrics are collected at the same time, for the
+        # sidecar file read by wifi-heatmap.
+        survey_points = [p for p in self.survey_points if p.is_finished]
+        metrics = SurveyMetricsBuilder()
+        tmpname = self.data_filename + '.tmp'
+        with open(tmpname, 'w') as fh:
+            fh.write('{\n  "img_path": %s,\n  "survey_points": [' % (
+                json.dumps(self.img_path, cls=SafeEncoder)
+            ))
+            for idx, p in enumerate(survey_points):
+                point = p.as_dict
+                metrics.add(point)
+                point = json.dumps(point, cls=SafeEncoder, indent=2)
+                fh.write('%s\n    %s' % (
+                    ',' if idx > 0 else '', point.replace('\n', '\n    ')
+                ))
+            fh.write('\n  ]\n}' if len(survey_points) > 0 else ']\n}')
+        os.replace(tmpname, self.data_filename)
+        try:
+            write_sidecar(
+                self.data_filename,
+                metrics.build({'img_path': self.img_path})
+            )
+        except (IOError, OSError):
+            logger.warning('Unable to write metrics sidecar', exc_info=True)
         self.parent.SetStatusText(
             'Saved to %s; ready...' % self.data_filename
         )
@@ -657,6 +707,7 @@ def main():
 
     app = wx.App()
 
+    from wifi_survey_heatmap.libnl import Scanner
     scanner = Scanner(scan=args.scan)
 
     # Ask for possibly missing fields